@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
-import math
 import os
 import pickle
+from typing import Any, Dict, List, Tuple
 
 import numpy as np
 import pandas as pd
@@ -13,15 +13,31 @@ from xgboost import XGBClassifier
 import dash
 import dash_core_components as dcc
 import dash_html_components as html
-import search_google.api
+from bout_features import NO_OF_ROUNDS, WEIGHT_CLASS_COLUMNS, BoutFeatures
 from dash.dependencies import Input, Output, State
+from flask import jsonify, request
+from image_cache import FighterImageCache, search_fighter_image
 
-GOOGLE_API_DEVELOPER_KEY = "enter_key_here"
-CSE_ID = "enter_id_here"
+# Most bouts `predict_bouts` scores in one request
+MAX_BOUTS_PER_REQUEST = 100000
 
-fighter_df = pd.read_csv("app_data/latest_fighter_stats.csv", index_col="index")
+fighter_df = pd.read_csv(
+    "app_data/latest_fighter_stats.csv", index_col="index", parse_dates=["DOB"]
+)
 weight_classes = pd.read_csv("app_data/weight_classes.csv")
 
+
+def get_fighter_options(weight_classes: pd.DataFrame) -> Dict[str, List[dict]]:
+    """The dropdown options of the fighters of every weight class, by name."""
+    return {
+        weightclass: [{"label": i, "value": i} for i in fighters.sort_values()]
+        for weightclass, fighters in weight_classes.groupby("weight_class")["fighter"]
+    }
+
+
+# built once, the fighter dropdowns are filled on every interaction
+fighter_options = get_fighter_options(weight_classes)
+
 with open("app_data/model.sav", "rb") as mdl:
     model = pickle.load(mdl)
 
@@ -31,80 +47,13 @@ with open("app_data/cols.list", "rb") as c:
 with open("app_data/standard.scaler", "rb") as ss:
     scaler = pickle.load(ss)
 
-df_weight_classes = {
-    "Flyweight": "weight_class_Flyweight",
-    "Bantamweight": "weight_class_Bantamweight",
-    "Featherweight": "weight_class_Featherweight",
-    "Lightweight": "weight_class_Lightweight",
-    "Welterweight": "weight_class_Welterweight",
-    "Middleweight": "weight_class_Middleweight",
-    "Light Heavyweight": "weight_class_LightHeavyweight",
-    "Heavyweight": "weight_class_Heavyweight",
-    "Women's Strawweight": "weight_class_Women_Strawweight",
-    "Women's Flyweight": "weight_class_Women_Flyweight",
-    "Women's Bantamweight": "weight_class_Women_Bantamweight",
-    "Women's Featherweight": "weight_class_Women_Featherweight",
-    "Catch Weight": "weight_class_CatchWeight",
-    "Open Weight": "weight_class_OpenWeight",
-}
-
-
-def normalize(df: pd.DataFrame, scaler) -> pd.DataFrame:
-    df_num = df.select_dtypes(include=[np.float, np.int])
-    df[list(df_num.columns)] = scaler.transform(df[list(df_num.columns)])
-    return df
-
+bout_features = BoutFeatures(fighter_df, cols, scaler)
 
-def get_age(X):
-
-    median_age = 29
-
-    DOB = pd.to_datetime(X)
-    today = pd.to_datetime("today")
-
-    if pd.isnull(DOB):
-        return median_age
-    else:
-        age = math.floor((today - DOB).days / 365.25)
-        return age
-
-
-def get_fighter_url(fighter):
-    buildargs = {
-        "serviceName": "customsearch",
-        "version": "v1",
-        "developerKey": GOOGLE_API_DEVELOPER_KEY,
-    }
-
-    cseargs = {
-        "q": fighter + " " + "Official Fighter Profile",
-        "cx": CSE_ID,
-        "num": 1,
-        "imgSize": "large",
-        "searchType": "image",
-        "fileType": "png",
-        "safe": "off",
-    }
-
-    cseargs2 = {
-        "q": "Not found",
-        "cx": "015743272077172593992:pfwmvxoiylc",
-        "num": 1,
-        "imgSize": "large",
-        "searchType": "image",
-        "fileType": "png",
-        "safe": "off",
-    }
-
-    results = search_google.api.results(buildargs, cseargs)
-    url = results.links[0]
-
-    if url:
-        return url
-    else:
-        return (
-            "https://pngimage.net/wp-content/uploads/2018/06/image-not-found-png-9.png"
-        )
+# the images of the fighters are only ever served from the cache, warmed by
+# `python image_cache.py`, the fighters missing from it are looked up in the
+# background
+image_cache = FighterImageCache(search_fighter_image)
+image_cache.start()
 
 
 colors = {"background": "#FAFBFC", "text": "#34495E"}
@@ -140,7 +89,7 @@ app.layout = html.Div(
                             id="weightclass",
                             options=[
                                 {"label": wt.upper(), "value": wt}
-                                for wt in df_weight_classes.keys()
+                                for wt in WEIGHT_CLASS_COLUMNS.keys()
                             ],
                             value="Lightweight",
                         ),
@@ -151,8 +100,8 @@ app.layout = html.Div(
                         dcc.Dropdown(
                             id="no_of_rounds",
                             options=[
-                                {"label": "5 Rounds", "value": 5},
-                                {"label": "3 Rounds", "value": 3},
+                                {"label": f"{rounds} Rounds", "value": rounds}
+                                for rounds in sorted(NO_OF_ROUNDS, reverse=True)
                             ],
                             value=3,
                         ),
@@ -330,12 +279,7 @@ def set_no_of_rounds(no_of_rounds):
 @app.callback(Output("red-fighter", "options"), [Input("weightclass", "value")])
 def set_red_fighter(weightclass):
 
-    return [
-        {"label": i, "value": i}
-        for i in weight_classes[weight_classes["weight_class"] == weightclass][
-            "fighter"
-        ].sort_values()
-    ]
+    return fighter_options.get(weightclass, [])
 
 
 @app.callback(Output("red-fighter", "value"), [Input("red-fighter", "options")])
@@ -350,17 +294,11 @@ def set_red_fighter_value(options):
     [Input("weightclass", "value"), Input("red-fighter", "value")],
 )
 def set_blue_fighter(weightclass, red_fighter):
-    blue_weight_classes = weight_classes.copy()
-
-    if red_fighter in list(blue_weight_classes["fighter"]):
-        blue_weight_classes = blue_weight_classes.set_index("fighter")
-        blue_weight_classes = blue_weight_classes.drop(index=red_fighter).reset_index()
 
     return [
-        {"label": i, "value": i}
-        for i in blue_weight_classes[
-            blue_weight_classes["weight_class"] == weightclass
-        ]["fighter"].sort_values()
+        option
+        for option in fighter_options.get(weightclass, [])
+        if option["value"] != red_fighter
     ]
 
 
@@ -375,14 +313,14 @@ def set_blue_fighter_value(options):
 def set_image_red(fighter1):
     # return
     if fighter1:
-        return get_fighter_url(fighter1)
+        return image_cache.get(fighter1)
 
 
 @app.callback(Output("blue-image", "src"), [Input("blue-fighter", "value")])
 def set_image_blue(fighter2):
     # return
     if fighter2:
-        return get_fighter_url(fighter2)
+        return image_cache.get(fighter2)
 
 
 @app.callback(
@@ -415,26 +353,16 @@ def update_proba(nclicks, red, blue, weightclass, no_of_rounds, fight_type):
                 "Error: Select different fighters",
             )
 
-        df = fighter_df.copy()
-
         title_bout = {"Non Title": False, "Title": True}
 
-        cols_dict = {
-            df_weight_classes[k]: (1 if weightclass == k else 0)
-            for k in df_weight_classes.keys()
-        }
-        cols_dict.update(
-            {"title_bout": title_bout[fight_type], "no_of_rounds": no_of_rounds}
+        features = bout_features.features(
+            [bout_features.fighter_ids[red]],
+            [bout_features.fighter_ids[blue]],
+            [weightclass],
+            [no_of_rounds],
+            [title_bout[fight_type]],
         )
-        extra_cols = pd.DataFrame([list(cols_dict.values())], columns=cols_dict.keys())
-        df["age"] = df["DOB"].apply(get_age)
-        df.drop(columns=["DOB"], inplace=True)
-        r = df.loc[[red]].add_prefix("R_").reset_index(drop=True)
-        b = df.loc[[blue]].add_prefix("B_").reset_index(drop=True)
-        final = pd.concat([r, b, extra_cols], axis=1)[cols]
-        [blue_proba, red_proba] = model.predict_proba(
-            np.array(normalize(final, scaler))
-        )[0]
+        [blue_proba, red_proba] = model.predict_proba(features)[0]
 
         return (f"{red_proba*100:.2f}" + "%", f"{blue_proba*100:.2f}" + "%")
 
@@ -442,6 +370,86 @@ def update_proba(nclicks, red, blue, weightclass, no_of_rounds, fight_type):
         return ("Click Predict", "Click Predict")
 
 
+# Red and blue fighter IDs, weight classes, rounds and title bouts of bouts
+Bouts = Tuple[List[int], List[int], List[str], List[int], List[bool]]
+
+
+def parse_bouts(bouts: Any) -> Bouts:
+    """
+    The fighter IDs, weight classes, rounds and title bouts of `bouts`, a
+    list of {"red", "blue", "weightclass", "no_of_rounds", "title_bout"}.
+    Raises a ValueError for the first bout that isn't valid.
+    """
+    if not isinstance(bouts, list) or not bouts:
+        raise ValueError("Expected a non empty list of bouts")
+    if len(bouts) > MAX_BOUTS_PER_REQUEST:
+        raise ValueError(f"At most {MAX_BOUTS_PER_REQUEST} bouts per request")
+
+    fighter_ids = bout_features.fighter_ids
+    red_ids, blue_ids, weightclasses, no_of_rounds, title_bouts = [], [], [], [], []
+    for i, bout in enumerate(bouts):
+        try:
+            red, blue = bout["red"], bout["blue"]
+            weightclass = bout["weightclass"]
+            rounds = bout["no_of_rounds"]
+            title_bout = bout.get("title_bout", False)
+        except (KeyError, TypeError):
+            raise ValueError(
+                f"Bout {i}: expected red, blue, weightclass and no_of_rounds"
+            )
+        if not all(isinstance(value, str) for value in (red, blue, weightclass)):
+            raise ValueError(f"Bout {i}: red, blue and weightclass must be strings")
+        if red not in fighter_ids or blue not in fighter_ids:
+            raise ValueError(f"Bout {i}: unknown fighter {red!r} or {blue!r}")
+        if red == blue:
+            raise ValueError(f"Bout {i}: select different fighters")
+        if weightclass not in WEIGHT_CLASS_COLUMNS:
+            raise ValueError(f"Bout {i}: unknown weight class {weightclass!r}")
+        if type(rounds) is not int or rounds not in NO_OF_ROUNDS:
+            raise ValueError(f"Bout {i}: no_of_rounds must be one of {NO_OF_ROUNDS}")
+        if not isinstance(title_bout, bool):
+            raise ValueError(f"Bout {i}: title_bout must be true or false")
+
+        red_ids.append(fighter_ids[red])
+        blue_ids.append(fighter_ids[blue])
+        weightclasses.append(weightclass)
+        no_of_rounds.append(rounds)
+        title_bouts.append(title_bout)
+
+    return red_ids, blue_ids, weightclasses, no_of_rounds, title_bouts
+
+
+@server.route("/api/predict", methods=["POST"])
+def predict_bouts():
+    """
+    Scores a batch of bouts posted as {"bouts": [...]}, see `parse_bouts`,
+    with a single model call. Answers {"predictions": [...]} with the
+    probabilities of both corners, in the order of the bouts.
+    """
+    payload = request.get_json(silent=True)
+    try:
+        if not isinstance(payload, dict):
+            raise ValueError('Expected a JSON object with "bouts"')
+        red_ids, blue_ids, weightclasses, no_of_rounds, title_bouts = parse_bouts(
+            payload.get("bouts")
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    features = bout_features.features(
+        red_ids, blue_ids, weightclasses, no_of_rounds, title_bouts
+    )
+    probas = model.predict_proba(features)
+    return jsonify(
+        {
+            "predictions": [
+                {"red_proba": red_proba, "blue_proba": blue_proba}
+                for blue_proba, red_proba in probas.tolist()
+            ]
+        }
+    )
+
+
 app.title = "UFC Predictions"
 
 if __name__ == "__main__":
@@ -0,0 +1,219 @@
+"""
+The features the model takes for a bout, made from rows precomputed for every
+fighter instead of from `fighter_df` on every prediction.
+"""
+import sys
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    # added next to the app when it is deployed, see the Dockerfile
+    from ages import age_in_years
+except ImportError:
+    # run from the repository, the module lives with the preprocessing
+    sys.path.append(Path(__file__).resolve().parents[2].as_posix())
+    from src.createdata.ages import age_in_years
+
+# Age of the fighters whose date of birth is unknown
+MEDIAN_AGE = 29
+
+# The one-hot column of every weight class the app offers, by its name
+WEIGHT_CLASS_COLUMNS = {
+    "Flyweight": "weight_class_Flyweight",
+    "Bantamweight": "weight_class_Bantamweight",
+    "Featherweight": "weight_class_Featherweight",
+    "Lightweight": "weight_class_Lightweight",
+    "Welterweight": "weight_class_Welterweight",
+    "Middleweight": "weight_class_Middleweight",
+    "Light Heavyweight": "weight_class_LightHeavyweight",
+    "Heavyweight": "weight_class_Heavyweight",
+    "Women's Strawweight": "weight_class_Women_Strawweight",
+    "Women's Flyweight": "weight_class_Women_Flyweight",
+    "Women's Bantamweight": "weight_class_Women_Bantamweight",
+    "Women's Featherweight": "weight_class_Women_Featherweight",
+    "Catch Weight": "weight_class_CatchWeight",
+    "Open Weight": "weight_class_OpenWeight",
+}
+
+# The numbers of rounds a bout can be scheduled for
+NO_OF_ROUNDS = (3, 5)
+
+
+def get_age(DOB: pd.Series, today: pd.Timestamp) -> pd.Series:
+    return age_in_years(today, DOB).fillna(MEDIAN_AGE).astype("int64")
+
+
+def normalize(df: pd.DataFrame, scaler) -> pd.DataFrame:
+    df_num = df.select_dtypes(include=[float, int])
+    df[list(df_num.columns)] = scaler.transform(df[list(df_num.columns)])
+    return df
+
+
+class BoutFeatures:
+    """
+    The scaled model input of bouts, in `cols` order, as float32 like the
+    model reads it.
+
+    The scaler works column by column, so the R_ and B_ columns of every
+    fighter are scaled once, in a matrix with a row per fighter, and the
+    columns of the bout (weight class, title bout and rounds) once per kind
+    of bout. The input of a bout is then the rows of its two fighters and of
+    its kind put together. The rows of the fighters are made again when the
+    day changes, for their ages.
+    """
+
+    def __init__(
+        self,
+        fighter_df: pd.DataFrame,
+        cols: List[str],
+        scaler,
+        weight_class_columns: Dict[str, str] = WEIGHT_CLASS_COLUMNS,
+    ):
+        """
+        `fighter_df` has the latest stats and the DOB of every fighter, by
+        name, `weight_class_columns` the one-hot column of every weight class.
+        """
+        self.fighter_df = fighter_df
+        self.cols = list(cols)
+        self.scaler = scaler
+        self.weight_class_columns = weight_class_columns
+        # fighter IDs, the positions of the fighters in `fighter_df`
+        self.fighter_ids = {
+            name: fighter_id for fighter_id, name in enumerate(fighter_df.index)
+        }
+
+        self._red_columns = [col for col in self.cols if col.startswith("R_")]
+        self._blue_columns = [col for col in self.cols if col.startswith("B_")]
+        self._bout_columns = [
+            col for col in self.cols if not col.startswith(("R_", "B_"))
+        ]
+        # positions of the red, blue and bout columns in `cols`
+        positions = {col: position for position, col in enumerate(self.cols)}
+        self._red_positions, self._blue_positions, self._bout_positions = [
+            np.array([positions[col] for col in columns], dtype="int64")
+            for columns in [self._red_columns, self._blue_columns, self._bout_columns]
+        ]
+
+        self._bout_rows: Dict[Tuple[str, int, bool], np.ndarray] = {}
+        self._rows = None
+        self._fighter_rows()
+
+    def _frame(
+        self,
+        fighters: pd.DataFrame,
+        weightclass: str,
+        no_of_rounds: int,
+        title_bout: bool,
+    ) -> pd.DataFrame:
+        """
+        The unscaled model input of `fighters` against themselves, in bouts
+        of the same kind, with the dtypes `normalize` picks the columns by.
+        """
+        cols_dict = {
+            self.weight_class_columns[k]: (1 if weightclass == k else 0)
+            for k in self.weight_class_columns.keys()
+        }
+        cols_dict.update({"title_bout": title_bout, "no_of_rounds": no_of_rounds})
+        extra_cols = pd.DataFrame(
+            [list(cols_dict.values())] * len(fighters), columns=cols_dict.keys()
+        )
+        fighters = fighters.reset_index(drop=True)
+        return pd.concat(
+            [fighters.add_prefix("R_"), fighters.add_prefix("B_"), extra_cols], axis=1
+        )[self.cols]
+
+    def _fighter_rows(self) -> Tuple[np.ndarray, np.ndarray]:
+        """The scaled R_ and B_ columns of every fighter, for today."""
+        today = pd.to_datetime("today").normalize()
+        if self._rows is not None and self._rows[0] == today:
+            return self._rows[1:]
+
+        fighters = self.fighter_df.copy()
+        fighters["age"] = get_age(fighters["DOB"], today)
+        fighters.drop(columns=["DOB"], inplace=True)
+        # any kind of bout, its columns are thrown away
+        weightclass = next(iter(self.weight_class_columns))
+        frame = normalize(self._frame(fighters, weightclass, 3, False), self.scaler)
+        red_rows = frame[self._red_columns].to_numpy(dtype="float32")
+        blue_rows = frame[self._blue_columns].to_numpy(dtype="float32")
+
+        # swapped in at once, predictions running meanwhile keep the old rows
+        self._rows = (today, red_rows, blue_rows)
+        return red_rows, blue_rows
+
+    def _bout_row(
+        self, weightclass: str, no_of_rounds: int, title_bout: bool
+    ) -> np.ndarray:
+        """The scaled columns of a kind of bout, scaled the first time only."""
+        key = (weightclass, no_of_rounds, title_bout)
+        row = self._bout_rows.get(key)
+        if row is None:
+            fighters = self.fighter_df.iloc[:1].drop(columns=["DOB"])
+            fighters["age"] = MEDIAN_AGE
+            frame = normalize(
+                self._frame(fighters, weightclass, no_of_rounds, title_bout),
+                self.scaler,
+            )
+            row = self._bout_rows[key] = frame[self._bout_columns].to_numpy(
+                dtype="float32"
+            )[0]
+        return row
+
+    def features(
+        self,
+        red_ids: Sequence[int],
+        blue_ids: Sequence[int],
+        weightclasses: Sequence[str],
+        no_of_rounds: Sequence[int],
+        title_bouts: Sequence[bool],
+    ) -> np.ndarray:
+        """The model input of the bouts, a row per bout."""
+        red_rows, blue_rows = self._fighter_rows()
+        # the kinds of the bouts, a card only has a few
+        kinds: Dict[Tuple[str, int, bool], int] = {}
+        kind_ids = [
+            kinds.setdefault(bout, len(kinds))
+            for bout in zip(weightclasses, no_of_rounds, title_bouts)
+        ]
+        kind_rows = np.array(
+            [self._bout_row(*kind) for kind in kinds], dtype="float32"
+        ).reshape(len(kinds), len(self._bout_columns))
+
+        features = np.empty((len(kind_ids), len(self.cols)), dtype="float32")
+        features[:, self._red_positions] = red_rows[np.asarray(red_ids, dtype="int64")]
+        features[:, self._blue_positions] = blue_rows[
+            np.asarray(blue_ids, dtype="int64")
+        ]
+        features[:, self._bout_positions] = kind_rows[
+            np.asarray(kind_ids, dtype="int64")
+        ]
+        return features
+
+    def pair_features(
+        self,
+        red_ids: Sequence[int],
+        blue_ids: Sequence[int],
+        weightclass: str,
+        no_of_rounds: int,
+        title_bout: bool,
+    ) -> np.ndarray:
+        """
+        The model input of every red fighter against every blue fighter in
+        the same kind of bout, features[i, j] for red_ids[i] against
+        blue_ids[j].
+        """
+        red_rows, blue_rows = self._fighter_rows()
+        features = np.empty((len(red_ids), len(blue_ids), len(self.cols)), "float32")
+        features[:, :, self._red_positions] = red_rows[
+            np.asarray(red_ids, dtype="int64")
+        ][:, None, :]
+        features[:, :, self._blue_positions] = blue_rows[
+            np.asarray(blue_ids, dtype="int64")
+        ][None, :, :]
+        features[:, :, self._bout_positions] = self._bout_row(
+            weightclass, no_of_rounds, title_bout
+        )
+        return features
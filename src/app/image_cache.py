@@ -0,0 +1,229 @@
+"""
+Image URLs of the fighters, kept in a sqlite file so that the app never waits
+for the search API. Warm the cache of every fighter of the app with
+
+    python image_cache.py
+
+from this directory, from cron or by hand. The app only looks up, in the
+background, the fighters it is asked for that aren't cached.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+import traceback
+from pathlib import Path
+from typing import Callable, Iterable, Optional, Set
+
+import pandas as pd
+
+GOOGLE_API_DEVELOPER_KEY = "enter_key_here"
+CSE_ID = "enter_id_here"
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+IMAGE_CACHE = Path("app_data/fighter_images.sqlite3")
+# Shown for the fighters without an image, or whose image isn't cached yet
+PLACEHOLDER_IMAGE_URL = (
+    "https://pngimage.net/wp-content/uploads/2018/06/image-not-found-png-9.png"
+)
+
+
+def search_fighter_image(fighter: str) -> Optional[str]:
+    """The URL of the first image Google finds of the fighter, if any."""
+    # only needed to search, not to read the cache
+    import search_google.api
+
+    buildargs = {
+        "serviceName": "customsearch",
+        "version": "v1",
+        "developerKey": GOOGLE_API_DEVELOPER_KEY,
+    }
+
+    cseargs = {
+        "q": fighter + " " + "Official Fighter Profile",
+        "cx": CSE_ID,
+        "num": 1,
+        "imgSize": "large",
+        "searchType": "image",
+        "fileType": "png",
+        "safe": "off",
+    }
+
+    results = search_google.api.results(buildargs, cseargs)
+    return results.links[0] if results.links else None
+
+
+class FighterImageCache:
+    """
+    URL of the image of every fighter, as found by `lookup`, which returns
+    None when there is no image of a fighter and raises when the search
+    fails.
+
+    `get` only ever reads the cache. Fighters that aren't cached yet, or
+    whose entry is older than `ttl`, are queued and looked up by a
+    background thread, started by `start`. Fighters without an image are
+    cached too, for `negative_ttl`, so they aren't searched on every
+    request. Failed searches, when the quota is used up for instance, aren't
+    retried for `failure_ttl`, the entry of the fighter, if any, is kept.
+    """
+
+    def __init__(
+        self,
+        lookup: Callable[[str], Optional[str]],
+        path: Path = IMAGE_CACHE,
+        ttl: float = 30 * DAY,
+        negative_ttl: float = DAY,
+        failure_ttl: float = HOUR,
+    ):
+        self.lookup = lookup
+        self.path = Path(path)
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.failure_ttl = failure_ttl
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        # shared by the threads of the app, the worker processes of the app
+        # have their own connection to the same file
+        self._db = sqlite3.connect(self.path.as_posix(), check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        with self._db:
+            self._db.execute("""CREATE TABLE IF NOT EXISTS images (
+                    fighter TEXT PRIMARY KEY,
+                    url TEXT,
+                    fetched_at REAL NOT NULL
+                )""")
+            self._db.execute("""CREATE TABLE IF NOT EXISTS failures (
+                    fighter TEXT PRIMARY KEY,
+                    failed_at REAL NOT NULL
+                )""")
+
+        self._queue: "queue.Queue[str]" = queue.Queue()
+        # fighters in the queue, so that they are queued once
+        self._queued: Set[str] = set()
+        self._worker: Optional[threading.Thread] = None
+
+    def _entry(self, fighter: str):
+        """
+        The (url, fetched_at) of the fighter, None when not cached, and when
+        their last search failed, if it did.
+        """
+        with self._lock:
+            entry = self._db.execute(
+                "SELECT url, fetched_at FROM images WHERE fighter = ?", (fighter,)
+            ).fetchone()
+            failure = self._db.execute(
+                "SELECT failed_at FROM failures WHERE fighter = ?", (fighter,)
+            ).fetchone()
+        return entry, failure[0] if failure is not None else None
+
+    def _is_fresh(self, url: Optional[str], fetched_at: float) -> bool:
+        ttl = self.ttl if url is not None else self.negative_ttl
+        return time.time() - fetched_at < ttl
+
+    def _is_due(self, entry, failed_at: Optional[float]) -> bool:
+        """Whether the fighter should be looked up."""
+        if failed_at is not None and time.time() - failed_at < self.failure_ttl:
+            return False
+        return entry is None or not self._is_fresh(*entry)
+
+    def get(self, fighter: str) -> str:
+        """
+        The cached image URL of the fighter, `PLACEHOLDER_IMAGE_URL` when
+        they have no image or aren't cached yet. Queues a lookup when the
+        fighter isn't cached or their entry has expired, the expired URL is
+        still served meanwhile, unless their last search failed less than
+        `failure_ttl` ago.
+        """
+        entry, failed_at = self._entry(fighter)
+        if self._is_due(entry, failed_at):
+            self.enqueue(fighter)
+        if entry is None or entry[0] is None:
+            return PLACEHOLDER_IMAGE_URL
+        return entry[0]
+
+    def enqueue(self, fighter: str) -> None:
+        with self._lock:
+            if fighter in self._queued:
+                return
+            self._queued.add(fighter)
+        self._queue.put(fighter)
+
+    def warm(self, fighters: Iterable[str]) -> int:
+        """Queues the fighters that `get` would look up, returns how many."""
+        queued = 0
+        for fighter in fighters:
+            if self._is_due(*self._entry(fighter)):
+                self.enqueue(fighter)
+                queued += 1
+        return queued
+
+    def refresh(self, fighter: str) -> Optional[str]:
+        """
+        Looks the fighter up now and caches the result, see `lookup`. A
+        failed search is recorded, then raised.
+        """
+        try:
+            url = self.lookup(fighter)
+        except Exception:
+            with self._lock:
+                with self._db:
+                    self._db.execute(
+                        "INSERT OR REPLACE INTO failures VALUES (?, ?)",
+                        (fighter, time.time()),
+                    )
+            raise
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO images VALUES (?, ?, ?)",
+                    (fighter, url, time.time()),
+                )
+                self._db.execute("DELETE FROM failures WHERE fighter = ?", (fighter,))
+        return url
+
+    def _next(self, block: bool = True) -> Optional[str]:
+        try:
+            fighter = self._queue.get(block=block)
+        except queue.Empty:
+            return None
+        with self._lock:
+            self._queued.discard(fighter)
+        return fighter
+
+    def run_queued(self, block: bool = True) -> None:
+        """
+        Looks up the queued fighters, forever when `block`, else until the
+        queue is empty.
+        """
+        while True:
+            fighter = self._next(block)
+            if fighter is None:
+                return
+            try:
+                self.refresh(fighter)
+            except Exception:
+                print(f"Image search of {fighter} failed")
+                traceback.print_exc()
+
+    def start(self) -> None:
+        """Starts looking up the queued fighters in a background thread."""
+        if self._worker is None:
+            self._worker = threading.Thread(
+                target=self.run_queued, name="fighter-image-cache", daemon=True
+            )
+            self._worker.start()
+
+    def close(self) -> None:
+        self._db.close()
+
+
+if __name__ == "__main__":
+    fighters = pd.read_csv("app_data/latest_fighter_stats.csv", index_col="index")
+    image_cache = FighterImageCache(search_fighter_image)
+    print(f"Looking up {image_cache.warm(fighters.index)} fighters")
+    image_cache.run_queued(block=False)
+    image_cache.close()
@@ -0,0 +1,187 @@
+"""
+Writes the win probability of every pair of fighters of a weight class, as
+listed in app_data/weight_classes.csv, for matchmaking. Run it from this
+directory, like the app:
+
+    python matchups.py [WEIGHTCLASS ...] [--roster] [--no-of-rounds N] [--title]
+
+Every weight class (all of them by default) gets a float32 matrix in
+app_data/matchups/<name>.npy, <name> being its one-hot column without
+"weight_class_". Row i, column j is the probability that the red fighter i
+beats the blue fighter j, NaN on the diagonal, and <name>.json has the names
+of the fighters of the rows and columns. Open the matrix with
+`np.load(path, mmap_mode="r")` to read only the rows needed.
+
+`--roster` pairs every fighter of the roster instead, in bouts of the weight
+class given (Open Weight by default), in roster_<name>.npy. The matrix is
+scored and written a chunk of rows at a time, so the memory used doesn't grow
+with the roster.
+"""
+import argparse
+import inspect
+import json
+import pickle
+import time
+from pathlib import Path
+from typing import Callable, List
+
+import numpy as np
+import pandas as pd
+
+from bout_features import NO_OF_ROUNDS, WEIGHT_CLASS_COLUMNS, BoutFeatures
+
+MATCHUPS_DIR = Path("app_data/matchups")
+# Most bouts scored by one model call
+CHUNK_BOUTS = 2 ** 16
+
+
+def red_win_probability(model) -> Callable[[np.ndarray], np.ndarray]:
+    """
+    The probabilities that the red fighters win the bouts of a feature
+    matrix, from the booster of `model` without the checks of predict_proba,
+    with the trees predict_proba uses, up to the best iteration when the
+    model was trained with early stopping.
+    """
+    booster = model.get_booster()
+    # inplace_predict was added in xgboost 1.1, it takes iteration_range from 1.4
+    inplace_predict = getattr(booster, "inplace_predict", None)
+    if (
+        inplace_predict is not None
+        and "iteration_range" in inspect.signature(inplace_predict).parameters
+    ):
+        try:
+            iteration_range = (0, model.best_iteration + 1)
+        except AttributeError:
+            # every tree
+            iteration_range = (0, 0)
+
+        def booster_predict(features):
+            return booster.inplace_predict(features, iteration_range=iteration_range)
+
+    else:
+        import xgboost
+
+        ntree_limit = getattr(model, "best_ntree_limit", 0)
+
+        def booster_predict(features):
+            return booster.predict(xgboost.DMatrix(features), ntree_limit=ntree_limit)
+
+    def predict(features: np.ndarray) -> np.ndarray:
+        probabilities = booster_predict(features)
+        # a probability per bout, as the model is a binary classifier
+        assert probabilities.ndim == 1, f"{probabilities.shape} isn't 1-D"
+        return probabilities
+
+    return predict
+
+
+def write_matchups(
+    bout_features: BoutFeatures,
+    predict: Callable[[np.ndarray], np.ndarray],
+    fighters: List[str],
+    weightclass: str,
+    no_of_rounds: int,
+    title_bout: bool,
+    path: Path,
+    chunk_bouts: int = CHUNK_BOUTS,
+) -> None:
+    """
+    Writes the matrix of the `fighters` to `path` (.npy) and their names
+    next to it (.json), scoring at most `chunk_bouts` bouts at a time.
+    """
+    fighter_ids = np.array([bout_features.fighter_ids[name] for name in fighters])
+    n_fighters = len(fighter_ids)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    matrix = np.lib.format.open_memmap(
+        path.as_posix(), mode="w+", dtype="float32", shape=(n_fighters, n_fighters)
+    )
+
+    rows_per_chunk = max(1, chunk_bouts // max(1, n_fighters))
+    for start in range(0, n_fighters, rows_per_chunk):
+        red_ids = fighter_ids[start : start + rows_per_chunk]
+        features = bout_features.pair_features(
+            red_ids, fighter_ids, weightclass, no_of_rounds, title_bout
+        )
+        matrix[start : start + len(red_ids)] = predict(
+            features.reshape(-1, features.shape[-1])
+        ).reshape(len(red_ids), n_fighters)
+    matrix[np.arange(n_fighters), np.arange(n_fighters)] = np.NaN
+    matrix.flush()
+    del matrix
+
+    with open(path.with_suffix(".json").as_posix(), "w") as f:
+        json.dump(fighters, f)
+
+
+def main(weightclasses: List[str], roster: bool, no_of_rounds: int, title_bout: bool):
+    fighter_df = pd.read_csv(
+        "app_data/latest_fighter_stats.csv", index_col="index", parse_dates=["DOB"]
+    )
+    weight_classes = pd.read_csv("app_data/weight_classes.csv")
+
+    with open("app_data/model.sav", "rb") as mdl:
+        model = pickle.load(mdl)
+
+    with open("app_data/cols.list", "rb") as c:
+        cols = pickle.load(c)
+
+    with open("app_data/standard.scaler", "rb") as ss:
+        scaler = pickle.load(ss)
+
+    bout_features = BoutFeatures(fighter_df, cols, scaler)
+    predict = red_win_probability(model)
+
+    if roster:
+        weightclasses = weightclasses or ["Open Weight"]
+    else:
+        weightclasses = weightclasses or list(WEIGHT_CLASS_COLUMNS)
+    for weightclass in weightclasses:
+        if weightclass not in WEIGHT_CLASS_COLUMNS:
+            raise ValueError(
+                f"Unknown weight class {weightclass!r}, "
+                f"expected one of {list(WEIGHT_CLASS_COLUMNS)}"
+            )
+
+        name = WEIGHT_CLASS_COLUMNS[weightclass][len("weight_class_") :]
+        if roster:
+            fighters = list(fighter_df.index)
+            name = f"roster_{name}"
+        else:
+            fighters = sorted(
+                fighter
+                for fighter in weight_classes.loc[
+                    weight_classes["weight_class"] == weightclass, "fighter"
+                ].unique()
+                if fighter in bout_features.fighter_ids
+            )
+        if len(fighters) < 2:
+            print(f"{weightclass}: fewer than 2 fighters, skipped")
+            continue
+
+        path = MATCHUPS_DIR / f"{name}.npy"
+        start = time.perf_counter()
+        write_matchups(
+            bout_features,
+            predict,
+            fighters,
+            weightclass,
+            no_of_rounds,
+            title_bout,
+            path,
+        )
+        print(
+            f"{weightclass}: {len(fighters)} fighters written to {path} "
+            f"in {time.perf_counter() - start:.1f}s"
+        )
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    arg_parser.add_argument("weightclasses", nargs="*", metavar="WEIGHTCLASS")
+    arg_parser.add_argument("--roster", action="store_true")
+    arg_parser.add_argument("--no-of-rounds", type=int, choices=NO_OF_ROUNDS, default=3)
+    arg_parser.add_argument("--title", action="store_true")
+    args = arg_parser.parse_args()
+    main(args.weightclasses, args.roster, args.no_of_rounds, args.title)
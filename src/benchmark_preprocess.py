@@ -0,0 +1,176 @@
+"""
+Times the vectorized conversions of `Preprocessor` against the per value
+`apply` calls they replaced, on data/total_fight_data.csv, and checks that
+both give the exact same columns.
+
+    python -m src.benchmark_preprocess [--copies N]
+
+`--copies` stacks the fights N times to benchmark a larger dataset.
+"""
+import argparse
+import time
+
+import pandas as pd
+
+from src.createdata.conversions import (
+    EXCEPTION_FORMAT_TIME,
+    TIME_IN_FIRST_ROUND,
+    clock_to_seconds,
+    contains,
+    landed_and_attempted,
+    percent_to_fraction,
+    total_time_fought,
+    winner_corner,
+)
+from src.createdata.data_files_path import TOTAL_EVENT_AND_FIGHTS
+
+
+def apply_landed_and_attempted(column):
+    return (
+        column.apply(lambda X: int(X.split("of")[0])),
+        column.apply(lambda X: int(X.split("of")[1])),
+    )
+
+
+def apply_pct_to_frac(column):
+    def pct_to_frac(X):
+        if X != "---":
+            return float(X.replace("%", "")) / 100
+        else:
+            return 0
+
+    return column.apply(pct_to_frac)
+
+
+def apply_clock_to_seconds(column):
+    def conv_to_sec(X):
+        if X != "--":
+            return int(X.split(":")[0]) * 60 + int(X.split(":")[1])
+        else:
+            return 0
+
+    return column.apply(conv_to_sec)
+
+
+def apply_title_bout(column):
+    return column.apply(lambda X: True if "Title Bout" in X else False)
+
+
+def apply_total_time_fought(fights):
+    def get_total_time(row):
+        if row["Format"] in TIME_IN_FIRST_ROUND.keys():
+            return (row["last_round"] - 1) * TIME_IN_FIRST_ROUND[
+                row["Format"]
+            ] + row["last_round_time"]
+
+        elif row["Format"] in EXCEPTION_FORMAT_TIME.keys():
+
+            if (row["last_round"] - 1) >= 2:
+                return (
+                    EXCEPTION_FORMAT_TIME[row["Format"]][0]
+                    + (row["last_round"] - 2) * EXCEPTION_FORMAT_TIME[row["Format"]][1]
+                    + row["last_round_time"]
+                )
+            else:
+                return (row["last_round"] - 1) * EXCEPTION_FORMAT_TIME[
+                    row["Format"]
+                ][0] + row["last_round_time"]
+
+    return fights.apply(get_total_time, axis=1)
+
+
+def apply_winner_corner(fights):
+    def get_renamed_winner(row):
+        if row["R_fighter"] == row["Winner"]:
+            return "Red"
+
+        elif row["B_fighter"] == row["Winner"]:
+            return "Blue"
+
+        elif row["Winner"] == "Draw":
+            return "Draw"
+
+    return fights[["R_fighter", "B_fighter", "Winner"]].apply(
+        get_renamed_winner, axis=1
+    )
+
+
+def benchmark(name, apply_version, vectorized_version):
+    start = time.perf_counter()
+    expected = apply_version()
+    apply_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    result = vectorized_version()
+    vectorized_seconds = time.perf_counter() - start
+
+    if isinstance(expected, pd.Series):
+        result, expected = [result], [expected]
+    for result_column, expected_column in zip(result, expected):
+        pd.testing.assert_series_equal(
+            result_column, expected_column, check_exact=True, check_names=False
+        )
+    print(
+        f"{name:<20} {apply_seconds:>9.3f}s {vectorized_seconds:>11.3f}s "
+        f"{apply_seconds / vectorized_seconds:>8.1f}x"
+    )
+    return apply_seconds, vectorized_seconds
+
+
+def main(copies):
+    fights = pd.read_csv(TOTAL_EVENT_AND_FIGHTS, sep=";")
+    fights = pd.concat([fights] * copies, ignore_index=True)
+    fights["Winner"].fillna("Draw", inplace=True)
+    fights["last_round_time"] = clock_to_seconds(fights["last_round_time"])
+    print(f"{len(fights)} fights\n")
+    print(f"{'conversion':<20} {'apply':>10} {'vectorized':>12} {'speedup':>9}")
+
+    timings = [
+        benchmark(
+            "landed of attempted",
+            lambda: apply_landed_and_attempted(fights["R_SIG_STR."]),
+            lambda: landed_and_attempted(fights["R_SIG_STR."]),
+        ),
+        benchmark(
+            "percentages",
+            lambda: apply_pct_to_frac(fights["R_TD_pct"]),
+            lambda: percent_to_fraction(fights["R_TD_pct"], "---"),
+        ),
+        benchmark(
+            "control time",
+            lambda: apply_clock_to_seconds(fights["R_CTRL"]),
+            lambda: clock_to_seconds(fights["R_CTRL"], "--"),
+        ),
+        benchmark(
+            "title bout",
+            lambda: apply_title_bout(fights["Fight_type"]),
+            lambda: contains(fights["Fight_type"], "Title Bout"),
+        ),
+        benchmark(
+            "total time fought",
+            lambda: apply_total_time_fought(fights),
+            lambda: total_time_fought(
+                fights["Format"], fights["last_round"], fights["last_round_time"]
+            ),
+        ),
+        benchmark(
+            "winner",
+            lambda: apply_winner_corner(fights),
+            lambda: winner_corner(
+                fights["R_fighter"], fights["B_fighter"], fights["Winner"]
+            ),
+        ),
+    ]
+
+    apply_total = sum(apply_seconds for apply_seconds, _ in timings)
+    vectorized_total = sum(vectorized_seconds for _, vectorized_seconds in timings)
+    print(
+        f"{'total':<20} {apply_total:>9.3f}s {vectorized_total:>11.3f}s "
+        f"{apply_total / vectorized_total:>8.1f}x"
+    )
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument("--copies", type=int, default=1)
+    main(arg_parser.parse_args().copies)
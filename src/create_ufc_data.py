@@ -1,15 +1,43 @@
+from src.createdata.fetcher import Fetcher
+from src.createdata.http_cache import HTTPCache
+from src.createdata.parsers import LxmlParser, ParsePool
 from src.createdata.preprocess import Preprocessor
 from src.createdata.scrape_fight_data import FightDataScraper
 from src.createdata.scrape_fighter_details import FighterDetailsScraper
 
-print("Creating fight data \n")
-fight_data_scraper = FightDataScraper()
-fight_data_scraper.create_fight_data_csv()  # Scrapes raw ufc fight data from website
 
-print("Creating fighter data \n")
-fighter_details_scraper = FighterDetailsScraper()
-fighter_details_scraper.create_fighter_data_csv()  # Scrapes raw ufc fighter data from website
+def main():
+    # Pass `offline=True` to HTTPCache to re-parse cached pages without any network access
+    fetcher = Fetcher(max_workers=8, requests_per_second=10.0, cache=HTTPCache())
+    parser = LxmlParser()
+    parse_pool = ParsePool()  # parses on all cores while the fetcher threads download
 
-print("Starting Preprocessing \n")
-preprocessor = Preprocessor()
-preprocessor.process_raw_data()  # Preprocesses the raw data and saves the csv files in data folder
+    try:
+        print("Creating fight data \n")
+        fight_data_scraper = FightDataScraper(
+            fetcher=fetcher, parser=parser, parse_pool=parse_pool
+        )
+        fight_data_scraper.create_fight_data_csv()  # Scrapes raw ufc fight data from website
+
+        print("Creating fighter data \n")
+        fighter_details_scraper = FighterDetailsScraper(
+            fetcher=fetcher, parser=parser, parse_pool=parse_pool
+        )
+        fighter_details_scraper.create_fighter_data_csv()  # Scrapes raw ufc fighter data from website
+    finally:
+        parse_pool.close()
+
+    print("Starting Preprocessing \n")
+    preprocessor = Preprocessor()
+    # Preprocesses the raw data and saves the csv files in data folder, only the new
+    # fights when an earlier run was saved. `incremental=False` rebuilds everything.
+    # For fights that don't fit in memory, `ChunkedPreprocessor(chunk_size=...)` from
+    # src.createdata.chunked_preprocess rebuilds everything in batches instead.
+    # `report_memory=True` prints the memory used after every step.
+    preprocessor.process_raw_data(incremental=True)
+
+
+# The worker processes of the parse pool and of the "parallel" features import
+# this module again where they are spawned (macOS, Windows), they must not run it
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,18 @@
+"""
+Fighter ages, shared by the preprocessing (`src.createdata.preprocess`) and the
+app. The app is deployed on its own from src/app, its Dockerfile adds this
+module next to it.
+"""
+import numpy as np
+import pandas as pd
+
+DAYS_IN_YEAR = 365.25
+
+
+def age_in_years(on: pd.Series, dob: pd.Series) -> pd.Series:
+    """
+    Age in whole years on the dates `on` of the fighters born on `dob`, both
+    datetime64 columns (`on` can also be a single timestamp). NaN when the
+    date of birth is unknown.
+    """
+    return np.floor((on - dob).dt.days / DAYS_IN_YEAR)
@@ -0,0 +1,114 @@
+import asyncio
+from typing import Optional
+from urllib.parse import urlparse
+
+from src.createdata.fetcher import RateLimiter
+from src.createdata.http_cache import HTTPCache, OfflineCacheMiss
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+
+class AsyncFetcher:
+    """
+    asyncio counterpart of `Fetcher` built on aiohttp.
+
+    `max_in_flight` caps the number of concurrent requests over the whole
+    session, `max_in_flight_per_event` is the cap callers should apply to the
+    fight pages of a single event (see `event_limiter`). Failed requests are
+    retried with exponential backoff. An optional `cache` is used the same
+    way as in `Fetcher`.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        max_in_flight: int = 200,
+        max_in_flight_per_event: int = 16,
+        requests_per_second: Optional[float] = None,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 30.0,
+        cache: Optional[HTTPCache] = None,
+    ):
+        if aiohttp is None:
+            raise ImportError(
+                "aiohttp is required for async scraping, install it with `pip install aiohttp`"
+            )
+
+        self.max_in_flight = max_in_flight
+        self.max_in_flight_per_event = max_in_flight_per_event
+        self.rate_limiter = RateLimiter(
+            1.0 / requests_per_second if requests_per_second else 0.0
+        )
+        self.retries = retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.cache = cache
+        self.session: Optional["aiohttp.ClientSession"] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        # Created here rather than in __init__ so that they bind to the
+        # running event loop.
+        self._semaphore = asyncio.Semaphore(self.max_in_flight)
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.max_in_flight),
+            timeout=aiohttp.ClientTimeout(total=self.timeout),
+        )
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.session.close()
+        self.session = None
+
+    def event_limiter(self) -> asyncio.Semaphore:
+        return asyncio.Semaphore(self.max_in_flight_per_event)
+
+    async def fetch(self, url: str) -> bytes:
+        return (await self.fetch_text(url)).encode("ascii", "replace")
+
+    async def fetch_text(self, url: str) -> str:
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached is not None and (cached.fresh or self.cache.offline):
+            return cached.text
+        if self.cache is not None and self.cache.offline:
+            raise OfflineCacheMiss(url)
+
+        headers = cached.validators() if cached is not None else None
+        host = urlparse(url).netloc
+        attempt = 0
+
+        while True:
+            async with self._semaphore:
+                await asyncio.sleep(self.rate_limiter.reserve(host))
+                try:
+                    async with self.session.get(
+                        url, headers=headers, allow_redirects=False
+                    ) as response:
+                        if cached is not None and response.status == 304:
+                            self.cache.revalidated(url)
+                            return cached.text
+
+                        if (
+                            response.status not in self.RETRY_STATUSES
+                            or attempt >= self.retries
+                        ):
+                            text = await response.text()
+                            if self.cache is not None and response.status == 200:
+                                self.cache.put(
+                                    url,
+                                    text,
+                                    etag=response.headers.get("ETag"),
+                                    last_modified=response.headers.get("Last-Modified"),
+                                )
+                            return text
+                except (aiohttp.ClientError, asyncio.TimeoutError):
+                    if attempt >= self.retries:
+                        raise
+
+            await asyncio.sleep(self.backoff_factor * (2**attempt))
+            attempt += 1
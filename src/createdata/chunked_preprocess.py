@@ -0,0 +1,336 @@
+import shutil
+import struct
+from pathlib import Path
+from typing import Dict, List, Set
+
+import numpy as np
+import pandas as pd
+
+from src.createdata.data_files_path import PREPROCESSING_CHUNKS_DIR
+from src.createdata.fight_records import sort_newest_first
+from src.createdata.fighter_history import FighterHistory
+from src.createdata.preprocess import ONE_HOT_COLUMNS, Preprocessor
+from src.createdata.schema import COMPARED_COLUMNS, apply_schema
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+DEFAULT_CHUNK_SIZE = 5000
+_SIGN_BIT = 1 << 63
+
+
+def _float_to_key(value: float) -> int:
+    """An integer that sorts like `value`, between those of -inf and inf."""
+    bits = struct.unpack("<q", struct.pack("<d", value))[0]
+    return bits if bits >= 0 else -(bits & (_SIGN_BIT - 1))
+
+
+def _key_to_float(key: int) -> float:
+    bits = key if key >= 0 else -key | _SIGN_BIT
+    return struct.unpack("<d", struct.pack("<Q", bits))[0]
+
+
+def _kth_smallest(runs: List[np.ndarray], k: int) -> float:
+    """
+    The `k`-th smallest value, counting from 0, of the sorted `runs`, whose
+    NaNs come last. Bisects on the values, the runs are only searched, so
+    they can stay on disk.
+    """
+    low, high = _float_to_key(-np.inf), _float_to_key(np.inf)
+    while low < high:
+        middle = (low + high) // 2
+        value = _key_to_float(middle)
+        if sum(np.searchsorted(run, value, side="right") for run in runs) > k:
+            high = middle
+        else:
+            low = middle + 1
+    return _key_to_float(low)
+
+
+def _unified_type(types: List["pa.DataType"]) -> "pa.DataType":
+    """A type the values of all `types` can be stored as without any loss."""
+    if all(data_type == types[0] for data_type in types):
+        return types[0]
+    if any(pa.types.is_dictionary(data_type) for data_type in types):
+        return pa.dictionary(pa.int32(), pa.string())
+    if all(pa.types.is_integer(data_type) for data_type in types):
+        return pa.int64()
+    return pa.float64()
+
+
+def _unified_schema(part_files: List[Path]) -> "pa.Schema":
+    """
+    The schema of the part files, the same column can have a narrower dtype
+    in some of them, see `apply_schema`.
+    """
+    schemas = [pq.read_schema(part_file.as_posix()) for part_file in part_files]
+    return pa.schema(
+        [
+            (name, _unified_type([schema.field(name).type for schema in schemas]))
+            for name in schemas[0].names
+        ],
+        metadata=schemas[0].metadata,
+    )
+
+
+class ChunkedPreprocessor(Preprocessor):
+    """
+    Runs the steps of `Preprocessor` on batches of at most `chunk_size`
+    fights, so that the memory used doesn't grow with the number of fights.
+    Only the states of the fighters and the dates of the fights of one year
+    are held for all of them.
+
+    The fights are first split into batches on disk, newest first like they
+    are read, then the batches are processed from the oldest to the newest,
+    the states of the fighters being carried from one batch to the next in
+    a `FighterHistory`. Filling the NaNs needs the medians of all the fights,
+    which are looked up in the sorted values of every batch, so the
+    preprocessed data is made in a second pass over the batches. Both passes
+    write their batches to `work_dir`, they are put together in the usual
+    files at the end.
+
+    Gives the same files as `Preprocessor`, which is faster when the fights
+    fit in memory.
+    """
+
+    def __init__(
+        self,
+        chunk_size=DEFAULT_CHUNK_SIZE,
+        work_dir=PREPROCESSING_CHUNKS_DIR,
+        report_memory=False,
+    ):
+        if pa is None:
+            raise ImportError(
+                "pyarrow is required for ChunkedPreprocessor, install it with `pip install pyarrow`"
+            )
+
+        super().__init__(report_memory)
+        self.chunk_size = chunk_size
+        self.work_dir = Path(work_dir)
+
+    def process_raw_data(self, incremental=False):
+        """Preprocesses all the fights, `incremental` isn't supported."""
+        if incremental:
+            raise ValueError("ChunkedPreprocessor always preprocesses all fights")
+
+        if self.work_dir.exists():
+            shutil.rmtree(self.work_dir.as_posix())
+        self._start_rebuild()
+        self.history = FighterHistory()
+
+        print("Reading Files")
+        fighter_details = self._read_fighter_details()
+        n_chunks = self._split_fights()
+        self._record_memory("read files")
+        if n_chunks == 0:
+            print("No fights to preprocess\n")
+            return
+
+        print(f"Creating fighter data in {n_chunks} batches")
+        one_hot_values = {column: set() for column in ONE_HOT_COLUMNS}
+        sorted_columns = [None] * n_chunks
+        for chunk in reversed(range(n_chunks)):
+            self.fights = pd.read_pickle(self._chunk_path("fights", chunk).as_posix())
+            # `FighterDetailProcessor` changes the details it is given
+            self.fighter_details = fighter_details.copy()
+            self._create_data()
+            apply_schema(self.store)
+            self._add_one_hot_values(one_hot_values)
+            sorted_columns[chunk] = self._save_sorted_values(chunk)
+            self.store.to_parquet(self._chunk_path("data", chunk), index=False)
+        self._record_memory("fighter features")
+
+        print("Fill NaNs and Dropping Non Essential Columns")
+        medians = self._medians(sorted_columns)
+        one_hot_categories = {
+            column: sorted(values) for column, values in one_hot_values.items()
+        }
+        for chunk in range(n_chunks):
+            self.store = pd.read_parquet(self._chunk_path("data", chunk))
+            self._fill_nas(medians)
+            self._drop_non_essential_cols(one_hot_categories)
+            apply_schema(self.store)
+            self.store.to_parquet(self._chunk_path("preprocessed", chunk), index=False)
+
+        self._join_chunks(
+            "data", n_chunks, self.UFC_DATA_PATH, self.UFC_DATA_PARQUET_PATH
+        )
+        self._join_chunks(
+            "preprocessed",
+            n_chunks,
+            self.PREPROCESSED_DATA_PATH,
+            self.PREPROCESSED_DATA_PARQUET_PATH,
+        )
+        # saved last, like `Preprocessor` does
+        self.history.save(self.FIGHTER_HISTORY_PATH)
+        shutil.rmtree(self.work_dir.as_posix())
+        self._record_memory("preprocessed data")
+        print("Successfully preprocessed and saved ufc data!\n")
+        self._print_memory_report()
+
+    def _chunk_path(self, kind: str, chunk: int) -> Path:
+        directory = self.work_dir / kind
+        directory.mkdir(parents=True, exist_ok=True)
+        suffix = {"fights": ".pickle", "sorted": ".npy"}.get(kind, ".parquet")
+        return directory / f"chunk-{chunk:06d}{suffix}"
+
+    def _split_fights(self) -> int:
+        """
+        Writes the fights to `work_dir` in batches of `chunk_size`, newest
+        first, and returns the number of batches. The fight records are read
+        a row group at a time, total_fight_data.csv a batch at a time.
+        """
+        if self.fight_records.exists():
+            self.typed = True
+            return self._split_fight_records()
+
+        self.typed = False
+        try:
+            chunks = pd.read_csv(
+                self.TOTAL_EVENT_AND_FIGHTS_PATH, sep=";", chunksize=self.chunk_size
+            )
+        except Exception as e:
+            raise FileNotFoundError("Cannot find the data/total_fight_data.csv")
+        n_chunks = 0
+        for n_chunks, fights in enumerate(chunks, start=1):
+            fights = self._prepare_chunk(fights)
+            fights.to_pickle(self._chunk_path("fights", n_chunks - 1).as_posix())
+        return n_chunks
+
+    def _split_fight_records(self) -> int:
+        """
+        The rows of a row group can go to any batch, they are written to the
+        pieces of the batches they go to, which are put together at the end.
+        """
+        pieces_dir = self.work_dir / "pieces"
+        n_fights = n_pieces = 0
+        # fights without a date are in year 0, they come last
+        for year in sorted(self.fight_records.partitions(), key=int, reverse=True):
+            positions = n_fights + self._newest_first_positions(year)
+            start = 0
+            for fights in self.fight_records.read_row_groups(partitions=[year]):
+                fights["position"] = positions[start : start + len(fights)]
+                start += len(fights)
+                for chunk, piece in fights.groupby(
+                    fights["position"] // self.chunk_size
+                ):
+                    chunk_dir = pieces_dir / f"chunk-{chunk:06d}"
+                    chunk_dir.mkdir(parents=True, exist_ok=True)
+                    piece.to_pickle((chunk_dir / f"{n_pieces:06d}.pickle").as_posix())
+                    n_pieces += 1
+            n_fights += len(positions)
+
+        n_chunks = -(-n_fights // self.chunk_size)
+        for chunk in range(n_chunks):
+            chunk_dir = pieces_dir / f"chunk-{chunk:06d}"
+            fights = pd.concat(
+                [pd.read_pickle(piece.as_posix()) for piece in chunk_dir.iterdir()]
+            )
+            fights = fights.sort_values("position").drop(columns="position")
+            self._prepare_chunk(fights).to_pickle(
+                self._chunk_path("fights", chunk).as_posix()
+            )
+            shutil.rmtree(chunk_dir.as_posix())
+        return n_chunks
+
+    def _newest_first_positions(self, year: str) -> np.ndarray:
+        """
+        The position of every fight of `year` among them once sorted like
+        `FightRecordStore.read` does, in the order `read_row_groups` gives
+        them. Only their dates are read.
+        """
+        dates = pd.concat(
+            self.fight_records.read_row_groups(columns=["date"], partitions=[year]),
+            ignore_index=True,
+        )
+        positions = np.empty(len(dates), dtype=np.int64)
+        positions[sort_newest_first(dates).index] = np.arange(len(dates))
+        return positions
+
+    @staticmethod
+    def _prepare_chunk(fights: pd.DataFrame) -> pd.DataFrame:
+        return apply_schema(fights.reset_index(drop=True), skip=COMPARED_COLUMNS)
+
+    def _add_one_hot_values(self, one_hot_values: Dict[str, Set[str]]):
+        """Adds the values `_drop_non_essential_cols` one-hot encodes."""
+        kept = self.store[self.store["Winner"] != "Draw"]
+        for column, values in one_hot_values.items():
+            values.update(kept[column].dropna())
+            if column.endswith("_Stance") and kept[column].isna().any():
+                values.add("Orthodox")
+
+    def _save_sorted_values(self, chunk: int) -> Dict[str, np.dtype]:
+        """
+        Saves the values of the numerical columns of the store, after the
+        reaches are filled, each column sorted on a row of its own. Returns
+        the columns, in the order of the rows, with their dtypes.
+        """
+        columns = self.store.select_dtypes(include="number")
+        values = columns.astype("float64")
+        self._fill_reach_with_height(values)
+        np.save(
+            self._chunk_path("sorted", chunk).as_posix(),
+            np.sort(values.to_numpy().T, axis=1),
+        )
+        return columns.dtypes.to_dict()
+
+    def _medians(self, sorted_columns: List[Dict[str, np.dtype]]) -> pd.Series:
+        """
+        The medians of the numerical columns of data.csv, after the reaches
+        are filled, the same as `Preprocessor` takes them. Their middle
+        values are searched in the sorted values of the batches, which are
+        only mapped in memory.
+        """
+        runs = [
+            np.load(self._chunk_path("sorted", chunk).as_posix(), mmap_mode="r")
+            for chunk in range(len(sorted_columns))
+        ]
+        names = list(
+            dict.fromkeys(name for dtypes in sorted_columns for name in dtypes)
+        )
+
+        medians = {}
+        for name in names:
+            column_runs = [
+                run[list(dtypes).index(name)]
+                for run, dtypes in zip(runs, sorted_columns)
+                if name in dtypes
+            ]
+            dtype = np.result_type(
+                *[dtypes[name] for dtypes in sorted_columns if name in dtypes]
+            )
+            # pandas takes the median of float32 values in float32
+            dtype = dtype if dtype == np.float32 else np.float64
+            n_values = sum(
+                np.searchsorted(run, np.inf, side="right") for run in column_runs
+            )
+            if n_values == 0:
+                medians[name] = np.NaN
+                continue
+            middle = [
+                _kth_smallest(column_runs, (n_values - 1) // 2),
+                _kth_smallest(column_runs, n_values // 2),
+            ]
+            medians[name] = np.array(middle, dtype=dtype).mean()
+        return pd.Series(medians)
+
+    def _join_chunks(
+        self, kind: str, n_chunks: int, filepath: Path, parquet_filepath: Path
+    ):
+        """
+        Writes the batches newest first to the csv file and the first part of
+        the parquet directory.
+        """
+        part_files = [self._chunk_path(kind, chunk) for chunk in range(n_chunks)]
+        schema = _unified_schema(part_files)
+        self._clear_parquet(parquet_filepath)
+        with open(filepath.as_posix(), "w") as f, pq.ParquetWriter(
+            (parquet_filepath / "part-000000.parquet").as_posix(), schema
+        ) as writer:
+            for chunk, part_file in enumerate(part_files):
+                table = pq.read_table(part_file.as_posix())
+                table.to_pandas().to_csv(f, index=False, header=chunk == 0)
+                writer.write_table(table.cast(schema))
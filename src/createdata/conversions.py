@@ -0,0 +1,141 @@
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+# Time of the first round of every fight format, in seconds.
+# '1 Rnd + 2OT (15-3-3)' and '1 Rnd + 2OT (24-3-3)' is not included because it has 3 uneven timed rounds.
+# We'll have to deal with it separately
+TIME_IN_FIRST_ROUND = {
+    "3 Rnd (5-5-5)": 5 * 60,
+    "5 Rnd (5-5-5-5-5)": 5 * 60,
+    "1 Rnd + OT (12-3)": 12 * 60,
+    "No Time Limit": 1,
+    "3 Rnd + OT (5-5-5-5)": 5 * 60,
+    "1 Rnd (20)": 1 * 20,
+    "2 Rnd (5-5)": 5 * 60,
+    "1 Rnd (15)": 15 * 60,
+    "1 Rnd (10)": 10 * 60,
+    "1 Rnd (12)": 12 * 60,
+    "1 Rnd + OT (30-5)": 30 * 60,
+    "1 Rnd (18)": 18 * 60,
+    "1 Rnd + OT (15-3)": 15 * 60,
+    "1 Rnd (30)": 30 * 60,
+    "1 Rnd + OT (31-5)": 31 * 5,
+    "1 Rnd + OT (27-3)": 27 * 60,
+    "1 Rnd + OT (30-3)": 30 * 60,
+}
+
+# Time of the first round and of the overtime rounds
+EXCEPTION_FORMAT_TIME = {
+    "1 Rnd + 2OT (15-3-3)": [15 * 60, 3 * 60],
+    "1 Rnd + 2OT (24-3-3)": [24 * 60, 3 * 60],
+}
+
+
+def landed_and_attempted(column: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """Splits "12 of 30" into 12 landed and 30 attempted."""
+    parts = column.str.split("of", n=1, expand=True)
+    return parts[0].astype("int64"), parts[1].astype("int64")
+
+
+def percent_to_fraction(column: pd.Series, missing: str = "---") -> pd.Series:
+    """
+    Converts "40%" to 0.4 and `missing`, when nothing was attempted, to 0.
+
+    The strings are converted by `float` like they used to be, so the
+    fractions are the exact same floats.
+    """
+    is_missing = column == missing
+    fractions = (
+        column.where(~is_missing, "0")
+        .str.replace("%", "", regex=False)
+        .astype("float64")
+        / 100
+    )
+    return fractions.where(~is_missing, 0)
+
+
+def clock_to_seconds(column: pd.Series, missing: Optional[str] = None) -> pd.Series:
+    """Converts "4:14" to 254 seconds, `missing` to 0."""
+    is_missing = column == missing
+    parts = (
+        column.where(~is_missing, "0:0")
+        .str.split(":", n=1, expand=True)
+        .astype("int64")
+    )
+    return parts[0] * 60 + parts[1]
+
+
+def contains(column: pd.Series, text: str) -> pd.Series:
+    return column.str.contains(text, regex=False, na=False)
+
+
+def first_match(column: pd.Series, candidates: List[str], default: str) -> pd.Series:
+    """The first of the `candidates` found in each value, or `default`."""
+    return pd.Series(
+        np.select(
+            [contains(column, candidate) for candidate in candidates],
+            candidates,
+            default,
+        ),
+        index=column.index,
+        dtype=object,
+    )
+
+
+def total_time_fought(
+    fight_format: pd.Series, last_round: pd.Series, last_round_time: pd.Series
+) -> pd.Series:
+    """
+    Seconds fought, from the format, the last round and the time into that
+    round. NaN for formats the time can't be worked out for.
+    """
+    first_round = fight_format.map(TIME_IN_FIRST_ROUND)
+    exception_first_round = fight_format.map(
+        {name: times[0] for name, times in EXCEPTION_FORMAT_TIME.items()}
+    )
+    exception_overtime = fight_format.map(
+        {name: times[1] for name, times in EXCEPTION_FORMAT_TIME.items()}
+    )
+
+    total_time = pd.Series(
+        np.select(
+            [
+                first_round.notna(),
+                exception_first_round.notna() & (last_round - 1 >= 2),
+                exception_first_round.notna(),
+            ],
+            [
+                (last_round - 1) * first_round + last_round_time,
+                exception_first_round
+                + (last_round - 2) * exception_overtime
+                + last_round_time,
+                (last_round - 1) * exception_first_round + last_round_time,
+            ],
+            np.NaN,
+        ),
+        index=fight_format.index,
+    )
+    if total_time.notna().all():
+        # whole seconds, stored as integers when every format is known
+        total_time = total_time.astype("int64")
+    return total_time
+
+
+def winner_corner(
+    red_fighter: pd.Series, blue_fighter: pd.Series, winner: pd.Series
+) -> pd.Series:
+    """
+    The corner of the winner, "Red" or "Blue", or "Draw". None when the
+    winner is none of these.
+    """
+    return pd.Series(
+        np.select(
+            [red_fighter == winner, blue_fighter == winner, winner == "Draw"],
+            ["Red", "Blue", "Draw"],
+            None,
+        ),
+        index=winner.index,
+        dtype=object,
+    )
@@ -8,6 +8,16 @@ PAST_FIGHTER_LINKS_PICKLE = BASE_PATH / "past_fighter_links.pickle"
 SCRAPED_FIGHTER_DATA_DICT_PICKLE = BASE_PATH / "scraped_fighter_data_dict.pickle"
 NEW_EVENT_AND_FIGHTS = BASE_PATH / "new_fight_data.csv"
 TOTAL_EVENT_AND_FIGHTS = BASE_PATH / "total_fight_data.csv"
+TOTAL_FIGHT_RECORDS = BASE_PATH / "total_fight_data.parquet"
 PREPROCESSED_DATA = BASE_PATH / "preprocessed_data.csv"
+PREPROCESSED_DATA_PARQUET = BASE_PATH / "preprocessed_data.parquet"
 FIGHTER_DETAILS = BASE_PATH / "fighter_details.csv"
+FIGHTER_DETAILS_RECORDS = BASE_PATH / "fighter_details.parquet"
+FIGHTER_INDEX_PICKLE = BASE_PATH / "fighter_index.pickle"
 UFC_DATA = BASE_PATH / "data.csv"
+UFC_DATA_PARQUET = BASE_PATH / "data.parquet"
+FIGHTER_HISTORY_PICKLE = BASE_PATH / "fighter_history.pickle"
+PREPROCESSING_APPEND_PICKLE = BASE_PATH / "preprocessing_append.pickle"
+PREPROCESSING_CHUNKS_DIR = BASE_PATH / "preprocessing_chunks"
+HTTP_CACHE_DIR = BASE_PATH / "http_cache"
+SCRAPE_JOURNAL = BASE_PATH / "scrape_journal.sqlite3"
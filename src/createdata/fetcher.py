@@ -0,0 +1,164 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Iterator, Optional
+from urllib.parse import urlparse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from src.createdata.http_cache import HTTPCache, OfflineCacheMiss
+
+
+class RateLimiter:
+    """
+    Spaces out requests to the same host by at least `min_interval` seconds.
+    Slots are reserved under a lock so that concurrent workers queue up
+    behind each other instead of bursting.
+    """
+
+    def __init__(self, min_interval: float):
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._next_slot: Dict[str, float] = {}
+
+    def reserve(self, host: str) -> float:
+        """
+        Reserves the next free slot for `host` and returns how many seconds
+        the caller has to wait before using it.
+        """
+        if self.min_interval <= 0:
+            return 0.0
+
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, now))
+            self._next_slot[host] = slot + self.min_interval
+
+        return slot - now
+
+    def wait(self, host: str) -> None:
+        delay = self.reserve(host)
+        if delay > 0:
+            time.sleep(delay)
+
+
+class Fetcher:
+    """
+    Shared fetch layer for the scrapers.
+
+    A single keep-alive `requests.Session` is shared by a pool of worker
+    threads. Failed requests are retried with exponential backoff and every
+    host is rate limited to `requests_per_second`. When a `cache` is given,
+    pages are served from it while fresh and revalidated with the server's
+    ETag / Last-Modified once they expire.
+    """
+
+    def __init__(
+        self,
+        max_workers: int = 8,
+        requests_per_second: float = 10.0,
+        retries: int = 3,
+        backoff_factor: float = 0.5,
+        timeout: float = 30.0,
+        cache: Optional[HTTPCache] = None,
+    ):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.cache = cache
+        self.rate_limiter = RateLimiter(
+            1.0 / requests_per_second if requests_per_second else 0.0
+        )
+
+        retry = Retry(
+            total=retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=(429, 500, 502, 503, 504),
+        )
+        adapter = HTTPAdapter(
+            pool_connections=max_workers, pool_maxsize=max_workers, max_retries=retry
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def fetch(self, url: str) -> bytes:
+        return self.fetch_text(url).encode("ascii", "replace")
+
+    def fetch_text(self, url: str) -> str:
+        cached = self.cache.get(url) if self.cache is not None else None
+        if cached is not None and (cached.fresh or self.cache.offline):
+            return cached.text
+        if self.cache is not None and self.cache.offline:
+            raise OfflineCacheMiss(url)
+
+        self.rate_limiter.wait(urlparse(url).netloc)
+        response = self.session.get(
+            url,
+            headers=cached.validators() if cached is not None else None,
+            allow_redirects=False,
+            timeout=self.timeout,
+        )
+
+        if cached is not None and response.status_code == 304:
+            self.cache.revalidated(url)
+            return cached.text
+
+        if self.cache is not None and response.status_code == 200:
+            self.cache.put(
+                url,
+                response.text,
+                etag=response.headers.get("ETag"),
+                last_modified=response.headers.get("Last-Modified"),
+            )
+        return response.text
+
+    def soup(self, url: str) -> BeautifulSoup:
+        return BeautifulSoup(self.fetch(url), "html.parser")
+
+    def map(self, fn: Callable, items: Iterable) -> Iterator:
+        """
+        Runs `fn` over `items` on the worker pool and yields the results in
+        the same order as `items`. At most `2 * max_workers` calls are in
+        flight at a time, so results are never buffered for the whole input.
+        """
+        window = 2 * self.max_workers
+        pending = deque()
+
+        for item in items:
+            pending.append(self.executor.submit(fn, item))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+
+        while pending:
+            yield pending.popleft().result()
+
+    def close(self) -> None:
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
+        self.session.close()
+
+
+_default_fetcher: Optional[Fetcher] = None
+
+
+def get_default_fetcher() -> Fetcher:
+    global _default_fetcher
+    if _default_fetcher is None:
+        _default_fetcher = Fetcher()
+    return _default_fetcher
@@ -0,0 +1,274 @@
+import csv
+import os
+from pathlib import Path
+from typing import Any, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+import pandas as pd
+
+from src.createdata.data_files_path import TOTAL_FIGHT_RECORDS
+from src.createdata.parquet_store import ParquetStore
+
+# Kinds of values found in total_fight_data.csv
+TEXT = "text"  # plain text, empty when missing
+COUNT = "count"  # a whole number
+LANDED_OF_ATTEMPTED = "landed_of_attempted"  # "12 of 30"
+PERCENT = "percent"  # "40%", "---" when nothing was attempted
+CLOCK = "clock"  # "4:14", "--" when it wasn't recorded
+
+# The columns of total_fight_data.csv, in order, with the kind of their values
+LEGACY_COLUMNS: List[Tuple[str, str]] = [
+    ("R_fighter", TEXT),
+    ("B_fighter", TEXT),
+    ("R_KD", COUNT),
+    ("B_KD", COUNT),
+    ("R_SIG_STR.", LANDED_OF_ATTEMPTED),
+    ("B_SIG_STR.", LANDED_OF_ATTEMPTED),
+    ("R_SIG_STR_pct", PERCENT),
+    ("B_SIG_STR_pct", PERCENT),
+    ("R_TOTAL_STR.", LANDED_OF_ATTEMPTED),
+    ("B_TOTAL_STR.", LANDED_OF_ATTEMPTED),
+    ("R_TD", LANDED_OF_ATTEMPTED),
+    ("B_TD", LANDED_OF_ATTEMPTED),
+    ("R_TD_pct", PERCENT),
+    ("B_TD_pct", PERCENT),
+    ("R_SUB_ATT", COUNT),
+    ("B_SUB_ATT", COUNT),
+    ("R_REV", COUNT),
+    ("B_REV", COUNT),
+    ("R_CTRL", CLOCK),
+    ("B_CTRL", CLOCK),
+    ("R_HEAD", LANDED_OF_ATTEMPTED),
+    ("B_HEAD", LANDED_OF_ATTEMPTED),
+    ("R_BODY", LANDED_OF_ATTEMPTED),
+    ("B_BODY", LANDED_OF_ATTEMPTED),
+    ("R_LEG", LANDED_OF_ATTEMPTED),
+    ("B_LEG", LANDED_OF_ATTEMPTED),
+    ("R_DISTANCE", LANDED_OF_ATTEMPTED),
+    ("B_DISTANCE", LANDED_OF_ATTEMPTED),
+    ("R_CLINCH", LANDED_OF_ATTEMPTED),
+    ("B_CLINCH", LANDED_OF_ATTEMPTED),
+    ("R_GROUND", LANDED_OF_ATTEMPTED),
+    ("B_GROUND", LANDED_OF_ATTEMPTED),
+    ("win_by", TEXT),
+    ("last_round", COUNT),
+    ("last_round_time", CLOCK),
+    ("Format", TEXT),
+    ("Referee", TEXT),
+    ("date", TEXT),
+    ("location", TEXT),
+    ("Fight_type", TEXT),
+    ("Winner", TEXT),
+]
+
+LANDED_SUFFIX = "_landed"
+ATTEMPTED_SUFFIX = "_att"
+
+FRAME_DTYPES = {TEXT: object, COUNT: "int64", PERCENT: "float64", CLOCK: "Int64"}
+
+
+def _record_fields() -> List[Tuple[str, str, Any]]:
+    """(field name, frame column, type) of every value of a `FightRecord`."""
+    fields = []
+    for column, kind in LEGACY_COLUMNS:
+        if kind == LANDED_OF_ATTEMPTED:
+            name = column.rstrip(".")
+            fields.append((name + LANDED_SUFFIX, column + LANDED_SUFFIX, int))
+            fields.append((name + ATTEMPTED_SUFFIX, column + ATTEMPTED_SUFFIX, int))
+        elif kind == TEXT:
+            fields.append((column, column, Optional[str]))
+        elif kind == COUNT:
+            fields.append((column, column, int))
+        elif kind == PERCENT:
+            # a fraction, `None` for "---"
+            fields.append((column, column, Optional[float]))
+        else:
+            # seconds, `None` for "--"
+            fields.append((column, column, Optional[int]))
+    return fields
+
+
+RECORD_FIELDS = _record_fields()
+FRAME_COLUMNS = [column for _, column, _ in RECORD_FIELDS]
+COLUMN_DTYPES = {
+    column: FRAME_DTYPES.get(dict(LEGACY_COLUMNS).get(column), "int64")
+    for column in FRAME_COLUMNS
+}
+
+
+def _parse_clock(text: str) -> Optional[int]:
+    if text == "--":
+        return None
+    minutes, seconds = text.split(":")
+    return int(minutes) * 60 + int(seconds)
+
+
+def _format_clock(seconds: Optional[int]) -> str:
+    if seconds is None:
+        return "--"
+    return f"{seconds // 60}:{seconds % 60:02d}"
+
+
+def _parse_percent(text: str) -> Optional[float]:
+    if text == "---":
+        return None
+    return float(text.replace("%", "")) / 100
+
+
+def _format_percent(fraction: Optional[float]) -> str:
+    if fraction is None:
+        return "---"
+    return f"{fraction * 100:g}%"
+
+
+class EventInfo(NamedTuple):
+    date: Optional[str]
+    location: Optional[str]
+
+
+class FightRecord(NamedTuple("FightRecord", [(f, t) for f, _, t in RECORD_FIELDS])):
+    """
+    One row of fight data with its values already parsed: strike counts are
+    split into landed and attempted, percentages are fractions and clock
+    times are seconds. `to_row` gives back the row of total_fight_data.csv.
+    """
+
+    __slots__ = ()
+
+    @classmethod
+    def from_fields(cls, fields: List[Optional[str]]) -> "FightRecord":
+        """Builds a record from the texts of the `LEGACY_COLUMNS`."""
+        if len(fields) != len(LEGACY_COLUMNS):
+            raise ValueError(
+                f"Expected {len(LEGACY_COLUMNS)} fields, got {len(fields)}: {fields}"
+            )
+
+        values = []
+        for (_, kind), text in zip(LEGACY_COLUMNS, fields):
+            if kind == TEXT:
+                values.append(text or None)
+            elif kind == COUNT:
+                values.append(int(text))
+            elif kind == LANDED_OF_ATTEMPTED:
+                landed, attempted = text.split("of")
+                values.append(int(landed))
+                values.append(int(attempted))
+            elif kind == PERCENT:
+                values.append(_parse_percent(text))
+            else:
+                values.append(_parse_clock(text))
+        return cls(*values)
+
+    def with_event(self, event_info: EventInfo) -> "FightRecord":
+        return self._replace(date=event_info.date, location=event_info.location)
+
+    def to_fields(self) -> List[str]:
+        fields = []
+        values = iter(self)
+        for _, kind in LEGACY_COLUMNS:
+            value = next(values)
+            if kind == TEXT:
+                fields.append(value or "")
+            elif kind == COUNT:
+                fields.append(str(value))
+            elif kind == LANDED_OF_ATTEMPTED:
+                fields.append(f"{value} of {next(values)}")
+            elif kind == PERCENT:
+                fields.append(_format_percent(value))
+            else:
+                fields.append(_format_clock(value))
+        return fields
+
+    def to_row(self) -> str:
+        return ";".join(self.to_fields())
+
+
+def to_frame(records: Iterable[FightRecord]) -> pd.DataFrame:
+    """
+    Lays the records out column by column. Strike counts become the
+    `<column>_landed` and `<column>_att` columns `Preprocessor` works with.
+    """
+    frame = pd.DataFrame.from_records(list(records), columns=FRAME_COLUMNS)
+    return frame.astype(COLUMN_DTYPES)
+
+
+def from_frame(frame: pd.DataFrame) -> Iterator[FightRecord]:
+    values = frame[FRAME_COLUMNS].astype(object)
+    values = values.where(values.notna(), None)
+    for row in values.itertuples(index=False, name=None):
+        yield FightRecord(*row)
+
+
+def write_legacy_csv(frame: pd.DataFrame, filepath: Path, header: str) -> None:
+    """Exports the records in `frame` as total_fight_data.csv."""
+    tmp_path = filepath.with_suffix(".tmp")
+    with open(tmp_path.as_posix(), "wb") as f:
+        f.write(bytes(header, encoding="ascii", errors="ignore"))
+        for record in from_frame(frame):
+            f.write(bytes(record.to_row() + "\n", encoding="ascii", errors="ignore"))
+    os.replace(tmp_path.as_posix(), filepath.as_posix())
+
+
+def read_legacy_csv(filepath: Path) -> List[FightRecord]:
+    """
+    Parses an existing total_fight_data.csv back into records. It is written
+    with `;`, files rewritten by older updates use `,`.
+    """
+    with open(filepath.as_posix(), newline="") as f:
+        header = next(csv.reader(f, delimiter=";"))
+        rows = csv.reader(f, delimiter=";" if len(header) > 1 else ",")
+        return [FightRecord.from_fields(row) for row in rows]
+
+
+def sort_newest_first(fight_data: pd.DataFrame) -> pd.DataFrame:
+    # Retried fights of older events have to go back to their place,
+    # the rest of the pipeline relies on the newest-first order.
+    event_dates = pd.to_datetime(fight_data["date"])
+    return fight_data.loc[
+        event_dates.sort_values(ascending=False, kind="mergesort").index
+    ]
+
+
+# The columns a stored fight is recognized by
+FIGHT_KEY_COLUMNS = ["date", "R_fighter", "B_fighter"]
+
+
+def _event_year(fight_data: pd.DataFrame) -> pd.Series:
+    return (
+        pd.to_datetime(fight_data["date"]).dt.year.fillna(0).astype(int).rename("year")
+    )
+
+
+class FightRecordStore(ParquetStore):
+    """
+    The fight records as parquet, partitioned by the year of the event. New
+    events are appended, the fights stored earlier are never rewritten.
+    """
+
+    def __init__(self, path: Path = TOTAL_FIGHT_RECORDS):
+        super().__init__(path, COLUMN_DTYPES, partition_by=_event_year)
+
+    def append_new(self, frame: pd.DataFrame) -> None:
+        """
+        Appends the fights of `frame` that aren't stored yet. Fights appended
+        by a run that was interrupted before the journal could mark them as
+        committed are scraped again, they aren't stored twice.
+        """
+        if self.exists() and len(frame):
+            stored = super().read(
+                columns=FIGHT_KEY_COLUMNS, partitions=_event_year(frame).unique()
+            )
+            is_stored = pd.MultiIndex.from_frame(frame[FIGHT_KEY_COLUMNS]).isin(
+                pd.MultiIndex.from_frame(stored)
+            )
+            frame = frame[~is_stored]
+        self.append(frame)
+
+    def read(
+        self, columns: Optional[List[str]] = None, partitions: Optional[Iterable] = None
+    ) -> pd.DataFrame:
+        """Reads the fights newest event first, like total_fight_data.csv."""
+        columns = FRAME_COLUMNS if columns is None else columns
+        fight_data = super().read(
+            columns if "date" in columns else columns + ["date"], partitions
+        )
+        return sort_newest_first(fight_data).reset_index(drop=True)[columns]
@@ -0,0 +1,459 @@
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+RESULT_STATS = [
+    "current_win_streak",
+    "current_lose_streak",
+    "longest_win_streak",
+    "wins",
+    "losses",
+    "draw",
+]
+
+WIN_BY_COLUMNS = [
+    "win_by_Decision - Majority",
+    "win_by_Decision - Split",
+    "win_by_Decision - Unanimous",
+    "win_by_KO/TKO",
+    "win_by_Submission",
+    "win_by_TKO - Doctor's Stoppage",
+]
+
+NUMERICAL_COLUMNS = [
+    "hero_KD",
+    "opp_KD",
+    "hero_SIG_STR_pct",
+    "opp_SIG_STR_pct",
+    "hero_TD_pct",
+    "opp_TD_pct",
+    "hero_SUB_ATT",
+    "opp_SUB_ATT",
+    "hero_REV",
+    "opp_REV",
+    "hero_SIG_STR._att",
+    "hero_SIG_STR._landed",
+    "opp_SIG_STR._att",
+    "opp_SIG_STR._landed",
+    "hero_TOTAL_STR._att",
+    "hero_TOTAL_STR._landed",
+    "opp_TOTAL_STR._att",
+    "opp_TOTAL_STR._landed",
+    "hero_TD_att",
+    "hero_TD_landed",
+    "opp_TD_att",
+    "opp_TD_landed",
+    "hero_HEAD_att",
+    "hero_HEAD_landed",
+    "opp_HEAD_att",
+    "opp_HEAD_landed",
+    "hero_BODY_att",
+    "hero_BODY_landed",
+    "opp_BODY_att",
+    "opp_BODY_landed",
+    "hero_LEG_att",
+    "hero_LEG_landed",
+    "opp_LEG_att",
+    "opp_LEG_landed",
+    "hero_DISTANCE_att",
+    "hero_DISTANCE_landed",
+    "opp_DISTANCE_att",
+    "opp_DISTANCE_landed",
+    "hero_CLINCH_att",
+    "hero_CLINCH_landed",
+    "opp_CLINCH_att",
+    "opp_CLINCH_landed",
+    "hero_GROUND_att",
+    "hero_GROUND_landed",
+    "opp_GROUND_att",
+    "opp_GROUND_landed",
+    "hero_CTRL_time(seconds)",
+    "opp_CTRL_time(seconds)",
+    "total_time_fought(seconds)",
+]
+
+# Columns of the frames made for the red and the blue corner, in order
+FEATURE_COLUMNS = (
+    NUMERICAL_COLUMNS
+    + ["total_rounds_fought", "total_title_bouts", "hero_fighter"]
+    + RESULT_STATS
+    + WIN_BY_COLUMNS
+)
+FEATURE_DTYPES = {
+    **{column: "float64" for column in NUMERICAL_COLUMNS + WIN_BY_COLUMNS},
+    **{column: "int64" for column in ["total_rounds_fought", "total_title_bouts"]},
+    "hero_fighter": object,
+    **{column: "int64" for column in RESULT_STATS},
+}
+
+# Columns of the frames counting the fights of the fighters, in order
+COUNT_COLUMNS = ["total_rounds_fought", "total_title_bouts"] + RESULT_STATS
+
+EWM_SPAN = 3
+# same weights as `ewm(span=EWM_SPAN, adjust=False)`
+EWM_ALPHA = 1.0 / (1.0 + (EWM_SPAN - 1) / 2.0)
+
+
+def ewm_step(
+    ewm: np.ndarray, weight: np.ndarray, stats: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    One step of the recursion pandas runs for `ewm(adjust=False).mean()`,
+    operation for operation so that the averages come out bit for bit the
+    same. A missing stat only decays the weight of the average. Returns the
+    new averages and weights.
+    """
+    started = ewm == ewm
+    observed = stats == stats
+
+    weight = np.where(started, weight * (1.0 - EWM_ALPHA), weight)
+    blended = (weight * ewm + EWM_ALPHA * stats) / (weight + EWM_ALPHA)
+
+    ewm = np.where(
+        started,
+        np.where(observed & (ewm != stats), blended, ewm),
+        np.where(observed, stats, ewm),
+    )
+    return ewm, np.where(started & observed, 1.0, weight)
+
+
+def fight_keys(fights: pd.DataFrame) -> List[Tuple[str, str, str]]:
+    """(date, red fighter, blue fighter) of every fight."""
+    return list(zip(fights["date"], fights["R_fighter"], fights["B_fighter"]))
+
+
+def corner_columns(columns: List[str], corner: str) -> List[str]:
+    """
+    The columns of the fights holding the `hero_` and `opp_` values of the
+    fighter in the "R" or the "B" corner.
+    """
+    opponent = "B" if corner == "R" else "R"
+    corner_columns = []
+    for column in columns:
+        if column.startswith("hero_"):
+            column = corner + "_" + column[len("hero_") :]
+        elif column.startswith("opp_"):
+            column = opponent + "_" + column[len("opp_") :]
+        corner_columns.append(column)
+    return corner_columns
+
+
+class FighterState:
+    """
+    Everything known about a fighter after their latest fight: the running
+    EWM of their stats, their streaks and their totals.
+    """
+
+    __slots__ = (
+        "ewm",
+        "ewm_weight",
+        "total_rounds_fought",
+        "total_title_bouts",
+        "current_win_streak",
+        "current_lose_streak",
+        "longest_win_streak",
+        "wins",
+        "losses",
+        "draw",
+        "win_by",
+        "win_streak",
+        "opening_streak",
+    )
+
+    def __init__(self):
+        self.ewm = np.full(len(NUMERICAL_COLUMNS), np.NaN)
+        self.ewm_weight = np.ones(len(NUMERICAL_COLUMNS))
+        self.total_rounds_fought = 0
+        self.total_title_bouts = 0
+        self.current_win_streak = 0
+        self.current_lose_streak = 0
+        self.longest_win_streak = 0
+        self.wins = 0
+        self.losses = 0
+        # Draws are counted as losses, like they always have been
+        self.draw = 0
+        self.win_by = np.zeros(len(WIN_BY_COLUMNS))
+        self.win_streak = 0
+        self.opening_streak = True
+
+    def write_features(
+        self, ewm: np.ndarray, counts: np.ndarray, win_by: np.ndarray
+    ) -> None:
+        """
+        Writes the features of the fighter going into their next fight to
+        rows of the NUMERICAL_COLUMNS, COUNT_COLUMNS and WIN_BY_COLUMNS.
+        """
+        ewm[:] = self.ewm
+        counts[:] = (
+            self.total_rounds_fought,
+            self.total_title_bouts,
+            self.current_win_streak,
+            self.current_lose_streak,
+            self.longest_win_streak,
+            self.wins,
+            self.losses,
+            self.draw,
+        )
+        win_by[:] = self.win_by
+
+    def update(
+        self,
+        stats: np.ndarray,
+        last_round: int,
+        title_bout: bool,
+        won: bool,
+        win_by: np.ndarray,
+    ) -> None:
+        self.ewm, self.ewm_weight = ewm_step(self.ewm, self.ewm_weight, stats)
+        self.total_rounds_fought += last_round
+        self.total_title_bouts += int(title_bout)
+
+        if won:
+            self.wins += 1
+            self.win_streak += 1
+            self.longest_win_streak = max(self.longest_win_streak, self.win_streak)
+            self.win_by = self.win_by + win_by
+        else:
+            self.losses += 1
+            self.win_streak = 0
+
+        # The original loop walks the results newest first, so what ends up
+        # as the current streaks is the streak the fighter opened with.
+        if self.opening_streak:
+            if won and self.current_lose_streak == 0:
+                self.current_win_streak += 1
+            elif not won and self.current_win_streak == 0:
+                self.current_lose_streak += 1
+            else:
+                self.opening_streak = False
+
+
+class FighterHistory:
+    """
+    Computes the features every fighter brings into each of their fights
+    from their earlier fights, in a single pass over the fights from oldest
+    to newest. Gives the same frames as the per fighter loop of
+    `FighterDetailProcessor` in time linear in the number of fights.
+
+    The states of the fighters are kept between calls, so newer fights can
+    be processed later on, also after a `save` and `load`.
+    """
+
+    def __init__(self):
+        self.states: Dict[str, FighterState] = {}
+        # The fights processed so far and the date of the latest of them
+        self.fight_keys: Set[Tuple[str, str, str]] = set()
+        self.latest_date: Optional[pd.Timestamp] = None
+
+    @classmethod
+    def load(cls, path: Path) -> "FighterHistory":
+        with open(path.as_posix(), "rb") as f:
+            return pickle.load(f)
+
+    def save(self, path: Path) -> None:
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path.as_posix(), "wb") as f:
+            pickle.dump(self, f)
+        os.replace(tmp_path.as_posix(), path.as_posix())
+
+    def process(self, fights: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Returns the features of the red and of the blue fighters indexed like
+        `fights`, which are ordered newest first. The fights have to be newer
+        than the ones processed before.
+        """
+        fights = fights.sort_index(ascending=False)
+        corners = {}
+        for corner in ["R", "B"]:
+            corners[corner] = (
+                fights[corner + "_fighter"].to_numpy(),
+                fights[corner_columns(NUMERICAL_COLUMNS, corner)].to_numpy(
+                    dtype="float64"
+                ),
+            )
+        last_rounds = fights["last_round"].to_numpy()
+        title_bouts = fights["title_bout"].to_numpy() == True
+        winners = fights["Winner"].to_numpy()
+        # a batch of new fights may not have every kind of win
+        win_bys = fights.reindex(columns=WIN_BY_COLUMNS, fill_value=0).to_numpy(
+            dtype="float64"
+        )
+
+        # the features of every corner written row by row to arrays, a row
+        # of Python objects per fighter and fight used many times the memory
+        n_fights = len(fights)
+        rows = {
+            corner: (
+                [],
+                np.empty((n_fights, len(NUMERICAL_COLUMNS))),
+                np.empty((n_fights, len(COUNT_COLUMNS)), dtype="int64"),
+                np.empty((n_fights, len(WIN_BY_COLUMNS))),
+            )
+            for corner in corners
+        }
+        print("Creating Fighter Level Features")
+        for i in tqdm(range(n_fights)):
+            for corner, (fighters, stats) in corners.items():
+                fighter_name = fighters[i]
+                if pd.isna(fighter_name):
+                    continue
+
+                state = self.states.get(fighter_name)
+                if state is None:
+                    state = self.states[fighter_name] = FighterState()
+
+                positions, ewm, counts, win_by = rows[corner]
+                row = len(positions)
+                positions.append(i)
+                state.write_features(ewm[row], counts[row], win_by[row])
+
+                state.update(
+                    stats[i],
+                    int(last_rounds[i]),
+                    title_bouts[i],
+                    winners[i] == fighter_name,
+                    win_bys[i],
+                )
+
+        self.fight_keys.update(fight_keys(fights))
+        dates = pd.to_datetime(fights["date"])
+        if dates.notna().any():
+            latest_date = dates.max()
+            if self.latest_date is None or latest_date > self.latest_date:
+                self.latest_date = latest_date
+
+        red_frame, blue_frame = [
+            self._frame(fights, corners[corner][0], *rows[corner])
+            for corner in ["R", "B"]
+        ]
+        return red_frame, blue_frame
+
+    @staticmethod
+    def _frame(
+        fights: pd.DataFrame,
+        fighters: np.ndarray,
+        positions: List[int],
+        ewm: np.ndarray,
+        counts: np.ndarray,
+        win_by: np.ndarray,
+    ) -> pd.DataFrame:
+        """The features of the fighters of a corner, from the rows written."""
+        n_rows = len(positions)
+        columns = {"hero_fighter": fighters[positions]}
+        for names, values in [
+            (NUMERICAL_COLUMNS, ewm),
+            (COUNT_COLUMNS, counts),
+            (WIN_BY_COLUMNS, win_by),
+        ]:
+            columns.update(zip(names, values[:n_rows].T))
+        return (
+            pd.DataFrame(
+                columns,
+                index=fights.index[positions].to_numpy(),
+                columns=FEATURE_COLUMNS,
+            )
+            .astype(FEATURE_DTYPES)
+            .sort_index()
+        )
+
+
+def stack_corners(fights: pd.DataFrame) -> pd.DataFrame:
+    """
+    Stacks the fights into one row per fighter per fight, with the stats of
+    the fighter as the `hero_` and those of their opponent as the `opp_`
+    columns. The rows of every fighter go from their oldest fight to their
+    newest, the index of the fight is kept in the "fight" column.
+    """
+    corners = []
+    for corner in ["R", "B"]:
+        stacked = fights[corner_columns(NUMERICAL_COLUMNS, corner)].astype("float64")
+        stacked.columns = NUMERICAL_COLUMNS
+        stacked["hero_fighter"] = fights[corner + "_fighter"]
+        stacked["corner"] = corner
+        stacked["last_round"] = fights["last_round"]
+        stacked["title_bout"] = fights["title_bout"] == True
+        stacked["won"] = fights["Winner"] == fights[corner + "_fighter"]
+        stacked[WIN_BY_COLUMNS] = fights[WIN_BY_COLUMNS].astype("float64")
+        corners.append(stacked)
+
+    stacked = pd.concat(corners).rename_axis("fight").reset_index()
+    stacked = stacked[stacked["hero_fighter"].notna()]
+    return stacked.sort_values(
+        ["hero_fighter", "fight"], ascending=[True, False], kind="mergesort"
+    ).reset_index(drop=True)
+
+
+def split_corners(
+    features: pd.DataFrame, stacked: pd.DataFrame
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Splits features computed for the rows of `stack_corners` back into the
+    frames of the red and of the blue fighters, indexed like the fights.
+    """
+    features = features[FEATURE_COLUMNS].astype(FEATURE_DTYPES)
+    features.index = stacked["fight"].rename(None)
+    red_frame, blue_frame = [
+        features[(stacked["corner"] == corner).to_numpy()].sort_index()
+        for corner in ["R", "B"]
+    ]
+    return red_frame, blue_frame
+
+
+def _sum_before(values: pd.Series, fighters: pd.Series) -> pd.Series:
+    """Sum of the values of the earlier fights of each fighter."""
+    return values.groupby(fighters).cumsum() - values
+
+
+def vectorized_features(fights: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Same frames as `FighterHistory.process`, computed with grouped pandas
+    operations over all fighters at once instead of fight by fight.
+    """
+    stacked = stack_corners(fights)
+    fighters = stacked["hero_fighter"]
+    won = stacked["won"]
+
+    # `groupby().ewm()` needs pandas 1.2, the EWM of every fighter is taken
+    # on their own rows instead
+    features = (
+        stacked.groupby("hero_fighter")[NUMERICAL_COLUMNS]
+        .transform(lambda stats: stats.ewm(span=EWM_SPAN, adjust=False).mean())
+        .groupby(fighters)
+        .shift()
+    )
+    features["total_rounds_fought"] = _sum_before(stacked["last_round"], fighters)
+    features["total_title_bouts"] = _sum_before(
+        stacked["title_bout"].astype("int64"), fighters
+    )
+    features["hero_fighter"] = fighters
+
+    # Every loss starts a new run of wins
+    runs = (~won).groupby(fighters).cumsum()
+    win_streaks = won.astype("int64").groupby([fighters, runs]).cumsum()
+    longest_win_streaks = win_streaks.groupby(fighters).cummax()
+
+    # The "current" streaks of the original loop are the streak the fighter
+    # opened with, see `FighterState.update`.
+    opened_with_win = won.groupby(fighters).transform("first")
+    opening_streaks = _sum_before(
+        (won == opened_with_win).astype("int64").groupby(fighters).cummin(),
+        fighters,
+    )
+
+    features["current_win_streak"] = opening_streaks.where(opened_with_win, 0)
+    features["current_lose_streak"] = opening_streaks.where(~opened_with_win, 0)
+    features["longest_win_streak"] = longest_win_streaks.groupby(fighters).shift(
+        fill_value=0
+    )
+    features["wins"] = _sum_before(won.astype("int64"), fighters)
+    features["losses"] = _sum_before((~won).astype("int64"), fighters)
+    features["draw"] = 0
+    for column in WIN_BY_COLUMNS:
+        features[column] = _sum_before(stacked[column].where(won, 0.0), fighters)
+
+    return split_corners(features, stacked)
@@ -0,0 +1,132 @@
+import os
+import pickle
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+# ID of the fighters `FighterIndex.ids` doesn't know
+MISSING_ID = -1
+
+
+class FighterIndex:
+    """
+    Interns fighters to integer IDs, kept from run to run with `save` and
+    `load`. IDs are given in the order the fighters are first seen, from 0,
+    and never change.
+
+    Every fighter link gets its own ID, also when fighters share a name.
+    The fights only have the names of the fighters, a name resolves to the
+    fighter whose details are stored under it, see `resolve`.
+    """
+
+    def __init__(self):
+        # name and link (None when unknown) of every ID
+        self.names: List[str] = []
+        self.links: List[Optional[str]] = []
+        self._ids_by_link: Dict[str, int] = {}
+        self._ids_by_name: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    @classmethod
+    def from_names(cls, names: Iterable[str]) -> "FighterIndex":
+        fighter_index = cls()
+        for name in names:
+            fighter_index.add(name)
+        return fighter_index
+
+    @classmethod
+    def load(cls, path: Path) -> "FighterIndex":
+        with open(path.as_posix(), "rb") as f:
+            return pickle.load(f)
+
+    def save(self, path: Path) -> None:
+        tmp_path = path.with_suffix(".tmp")
+        with open(tmp_path.as_posix(), "wb") as f:
+            pickle.dump(self, f)
+        os.replace(tmp_path.as_posix(), path.as_posix())
+
+    def add(self, name: str, link: Optional[str] = None) -> int:
+        """
+        The ID of the fighter, a new one for a link not seen before. Without
+        a link, the ID `name` resolves to or a new one.
+        """
+        if link is not None and link in self._ids_by_link:
+            return self._ids_by_link[link]
+
+        fighter_id = self._ids_by_name.get(name)
+        if fighter_id is not None and (link is None or self.links[fighter_id] is None):
+            if link is not None:
+                # the link of a fighter only known by name so far
+                self.links[fighter_id] = link
+                self._ids_by_link[link] = fighter_id
+            return fighter_id
+
+        fighter_id = len(self.names)
+        self.names.append(name)
+        self.links.append(link)
+        if link is not None:
+            self._ids_by_link[link] = fighter_id
+        self._ids_by_name.setdefault(name, fighter_id)
+        return fighter_id
+
+    def resolve(self, name: str, link: str) -> int:
+        """Makes `name` resolve to the fighter of `link`, returns their ID."""
+        fighter_id = self._ids_by_name[name] = self.add(name, link)
+        return fighter_id
+
+    def ids(self, names: Iterable[str]) -> np.ndarray:
+        """The IDs the `names` resolve to, `MISSING_ID` for unknown names."""
+        ids_by_name = pd.Series(self._ids_by_name, dtype="int64")
+        return (
+            ids_by_name.reindex(pd.Index(names, dtype=object))
+            .fillna(MISSING_ID)
+            .to_numpy(dtype="int64")
+        )
+
+    def collisions(self) -> Dict[str, List[int]]:
+        """The names shared by more than one fighter, with their IDs."""
+        ids_by_name: Dict[str, List[int]] = {}
+        for fighter_id, name in enumerate(self.names):
+            ids_by_name.setdefault(name, []).append(fighter_id)
+        return {name: ids for name, ids in ids_by_name.items() if len(ids) > 1}
+
+
+class ProfileTable:
+    """
+    The details of the fighters as an array per column, row `i` holding the
+    details of the fighter with ID `i`. Joining the details to rows of
+    fighters is gathering their rows, fighters without details get NaNs.
+    """
+
+    def __init__(self, details: pd.DataFrame, ids: np.ndarray, n_ids: int):
+        """`ids` are the IDs of the rows of `details`."""
+        # the row of `details` of every ID, and of one more ID for unknown
+        # fighters, the NaNs appended after the last row when there is none
+        rows = np.full(n_ids + 1, len(details), dtype="int64")
+        known = ids != MISSING_ID
+        # the first details of a fighter are kept, like the first match
+        known_ids, first_rows = np.unique(ids[known], return_index=True)
+        rows[known_ids] = np.flatnonzero(known)[first_rows]
+
+        self.n_ids = n_ids
+        self.columns: Dict[str, np.ndarray] = {}
+        for column in details.columns:
+            values = details[column].to_numpy()
+            if values.dtype.kind not in "fO":
+                values = values.astype(
+                    "float64" if values.dtype.kind in "iub" else object
+                )
+            missing = np.array([np.NaN], dtype=values.dtype)
+            self.columns[column] = np.concatenate([values, missing])[rows]
+
+    def gather(self, ids: np.ndarray, index: Optional[pd.Index] = None) -> pd.DataFrame:
+        """The details of the fighters with the `ids`, one row per ID."""
+        ids = np.where(ids == MISSING_ID, self.n_ids, ids)
+        return pd.DataFrame(
+            {column: values[ids] for column, values in self.columns.items()},
+            index=index,
+        )
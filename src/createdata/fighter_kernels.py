@@ -0,0 +1,298 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from src.createdata.fighter_history import (
+    COUNT_COLUMNS,
+    EWM_ALPHA,
+    NUMERICAL_COLUMNS,
+    WIN_BY_COLUMNS,
+    ewm_step,
+    split_corners,
+    stack_corners,
+)
+
+try:
+    from numba import njit
+except ImportError:  # pragma: no cover - optional dependency
+    njit = None
+
+# Result codes, draws are counted as losses like everywhere else
+LOSS = 0
+WIN = 1
+
+# The count matrix returned by `fighter_history` has the COUNT_COLUMNS
+N_COUNTS = len(COUNT_COLUMNS)
+
+# Shards per worker of `parallel_fighter_history`, more shards than workers
+# keep every worker busy when some shards take longer than others
+SHARDS_PER_WORKER = 4
+
+
+def segment_offsets(fighters: np.ndarray) -> np.ndarray:
+    """
+    Offsets of the rows of every fighter in `fighters`, which has the rows of
+    a fighter next to each other: the rows of the i-th fighter are
+    `offsets[i]:offsets[i + 1]`.
+    """
+    starts = np.flatnonzero(fighters[1:] != fighters[:-1]) + 1
+    return np.concatenate([[0], starts, [len(fighters)]]).astype("int64")
+
+
+def _history_loops(offsets, results, stats, last_rounds, title_bouts, win_by):
+    """
+    `fighter_history` as plain loops over the fights of every fighter, meant
+    to be compiled by numba.
+    """
+    n_rows, n_stats = stats.shape
+    ewm = np.empty((n_rows, n_stats))
+    counts = np.zeros((n_rows, N_COUNTS), dtype=np.int64)
+    win_by_sums = np.zeros((n_rows, win_by.shape[1]))
+
+    weighted = np.empty(n_stats)
+    weight = np.empty(n_stats)
+    sums = np.empty(win_by.shape[1])
+    for segment in range(len(offsets) - 1):
+        weighted[:] = np.nan
+        weight[:] = 1.0
+        sums[:] = 0.0
+        rounds = bouts = current_win = current_lose = longest = wins = losses = 0
+        win_streak = 0
+        opening_streak = True
+
+        for row in range(offsets[segment], offsets[segment + 1]):
+            ewm[row] = weighted
+            counts[row, 0] = rounds
+            counts[row, 1] = bouts
+            counts[row, 2] = current_win
+            counts[row, 3] = current_lose
+            counts[row, 4] = longest
+            counts[row, 5] = wins
+            counts[row, 6] = losses
+            win_by_sums[row] = sums
+
+            # same steps as `ewm_step`
+            for j in range(n_stats):
+                cur = stats[row, j]
+                if weighted[j] == weighted[j]:
+                    weight[j] *= 1.0 - EWM_ALPHA
+                    if cur == cur:
+                        if weighted[j] != cur:
+                            weighted[j] = weight[j] * weighted[j] + EWM_ALPHA * cur
+                            weighted[j] /= weight[j] + EWM_ALPHA
+                        weight[j] = 1.0
+                elif cur == cur:
+                    weighted[j] = cur
+
+            rounds += last_rounds[row]
+            bouts += title_bouts[row]
+            won = results[row] == WIN
+            if won:
+                wins += 1
+                win_streak += 1
+                longest = max(longest, win_streak)
+                sums += win_by[row]
+            else:
+                losses += 1
+                win_streak = 0
+
+            # see `FighterState.update`
+            if opening_streak:
+                if won and current_lose == 0:
+                    current_win += 1
+                elif not won and current_win == 0:
+                    current_lose += 1
+                else:
+                    opening_streak = False
+
+    return ewm, counts, win_by_sums
+
+
+def _history_numpy(offsets, results, stats, last_rounds, title_bouts, win_by):
+    """
+    `fighter_history` with NumPy only: takes the first fight of every
+    fighter at once, then their second fight and so on, so it loops as many
+    times as the most fights anyone had.
+    """
+    n_rows, n_stats = stats.shape
+    ewm = np.empty((n_rows, n_stats))
+    counts = np.zeros((n_rows, N_COUNTS), dtype=np.int64)
+    win_by_sums = np.zeros((n_rows, win_by.shape[1]))
+
+    starts = offsets[:-1]
+    lengths = np.diff(offsets)
+    n_fighters = len(starts)
+    weighted = np.full((n_fighters, n_stats), np.nan)
+    weight = np.ones((n_fighters, n_stats))
+    state = np.zeros((n_fighters, N_COUNTS), dtype=np.int64)
+    sums = np.zeros((n_fighters, win_by.shape[1]))
+    win_streak = np.zeros(n_fighters, dtype=np.int64)
+    opening_streak = np.ones(n_fighters, dtype=bool)
+
+    for fight in range(lengths.max(initial=0)):
+        fighters = np.flatnonzero(lengths > fight)
+        rows = starts[fighters] + fight
+        ewm[rows] = weighted[fighters]
+        counts[rows] = state[fighters]
+        win_by_sums[rows] = sums[fighters]
+
+        weighted[fighters], weight[fighters] = ewm_step(
+            weighted[fighters], weight[fighters], stats[rows]
+        )
+
+        won = results[rows] == WIN
+        fighter_state = state[fighters]
+        fighter_state[:, 0] += last_rounds[rows]
+        fighter_state[:, 1] += title_bouts[rows]
+        fighter_state[:, 5] += won
+        fighter_state[:, 6] += ~won
+        win_streak[fighters] = np.where(won, win_streak[fighters] + 1, 0)
+        fighter_state[:, 4] = np.maximum(fighter_state[:, 4], win_streak[fighters])
+        sums[fighters] = np.where(
+            won[:, None], sums[fighters] + win_by[rows], sums[fighters]
+        )
+
+        # see `FighterState.update`
+        opening = opening_streak[fighters]
+        extends_win = opening & won & (fighter_state[:, 3] == 0)
+        extends_lose = opening & ~won & (fighter_state[:, 2] == 0)
+        fighter_state[:, 2] += extends_win
+        fighter_state[:, 3] += extends_lose
+        opening_streak[fighters] = extends_win | extends_lose
+        state[fighters] = fighter_state
+
+    return ewm, counts, win_by_sums
+
+
+_compiled_history = None
+
+
+def fighter_history(
+    offsets: np.ndarray,
+    results: np.ndarray,
+    stats: np.ndarray,
+    last_rounds: np.ndarray,
+    title_bouts: np.ndarray,
+    win_by: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Computes what every fighter brings into each of their fights, for all
+    fighters at once. The rows of the i-th fighter are
+    `offsets[i]:offsets[i + 1]`, from their oldest fight to their newest.
+
+    `results` holds the `WIN`/`LOSS` code of every row, `stats` the
+    `NUMERICAL_COLUMNS` and `win_by` the `WIN_BY_COLUMNS`. Returns the EWM of
+    the stats, the `COUNT_COLUMNS` and the sums of the win_by columns over
+    the earlier fights of every row.
+
+    Compiled with numba when it is installed, NumPy is used otherwise.
+    """
+    global _compiled_history
+
+    arguments = (
+        np.ascontiguousarray(offsets, dtype=np.int64),
+        np.ascontiguousarray(results, dtype=np.int8),
+        np.ascontiguousarray(stats, dtype=np.float64),
+        np.ascontiguousarray(last_rounds, dtype=np.int64),
+        np.ascontiguousarray(title_bouts, dtype=np.int64),
+        np.ascontiguousarray(win_by, dtype=np.float64),
+    )
+    if njit is None:
+        return _history_numpy(*arguments)
+
+    if _compiled_history is None:
+        _compiled_history = njit(cache=True)(_history_loops)
+    return _compiled_history(*arguments)
+
+
+def _shards(offsets: np.ndarray, n_shards: int) -> List[Tuple[int, int]]:
+    """
+    Splits the fighters into at most `n_shards` runs of fighters with about
+    the same number of fights. Returns the first and the end fighter of each.
+    """
+    n_fighters = len(offsets) - 1
+    bounds = np.searchsorted(
+        offsets, np.linspace(0, offsets[-1], n_shards + 1)[1:-1], side="right"
+    )
+    bounds = np.unique(np.concatenate([[0], bounds, [n_fighters]]).clip(0, n_fighters))
+    return list(zip(bounds[:-1], bounds[1:]))
+
+
+def _fighter_history_shard(arguments: tuple) -> Tuple[np.ndarray, ...]:
+    return fighter_history(*arguments)
+
+
+def parallel_fighter_history(
+    offsets: np.ndarray,
+    results: np.ndarray,
+    stats: np.ndarray,
+    last_rounds: np.ndarray,
+    title_bouts: np.ndarray,
+    win_by: np.ndarray,
+    max_workers: Optional[int] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    `fighter_history` on a pool of worker processes. The fighters are
+    sharded, every worker is only sent the rows of the fighters of its
+    shard, and the results are put back together in the order of the rows.
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_workers == 1 or offsets[-1] == 0:
+        return fighter_history(
+            offsets, results, stats, last_rounds, title_bouts, win_by
+        )
+
+    shards = []
+    for first, end in _shards(offsets, SHARDS_PER_WORKER * max_workers):
+        start, stop = offsets[first], offsets[end]
+        shards.append(
+            (
+                offsets[first : end + 1] - start,
+                results[start:stop],
+                stats[start:stop],
+                last_rounds[start:stop],
+                title_bouts[start:stop],
+                win_by[start:stop],
+            )
+        )
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        parts = list(executor.map(_fighter_history_shard, shards))
+    ewm, counts, win_by_sums = [np.concatenate(part) for part in zip(*parts)]
+    return ewm, counts, win_by_sums
+
+
+def kernel_features(
+    fights: pd.DataFrame, max_workers: Optional[int] = 1
+) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Same frames as `FighterHistory.process`, computed by `fighter_history`.
+    With `max_workers` other than 1 the fighters are spread over that many
+    processes, None uses every core.
+    """
+    stacked = stack_corners(fights)
+    fighters = stacked["hero_fighter"]
+
+    ewm, counts, win_by_sums = parallel_fighter_history(
+        segment_offsets(fighters.to_numpy()),
+        np.where(stacked["won"], WIN, LOSS),
+        stacked[NUMERICAL_COLUMNS].to_numpy(),
+        stacked["last_round"].to_numpy(),
+        stacked["title_bout"].to_numpy(),
+        stacked[WIN_BY_COLUMNS].to_numpy(),
+        max_workers=max_workers,
+    )
+
+    features = pd.concat(
+        [
+            pd.DataFrame(ewm, columns=NUMERICAL_COLUMNS),
+            pd.DataFrame(counts, columns=COUNT_COLUMNS),
+            pd.DataFrame(win_by_sums, columns=WIN_BY_COLUMNS),
+        ],
+        axis=1,
+    )
+    features["hero_fighter"] = fighters
+    return split_corners(features, stacked)
@@ -0,0 +1,193 @@
+import gzip
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, NamedTuple, Optional, Pattern, Tuple
+
+from src.createdata.data_files_path import HTTP_CACHE_DIR
+
+HOUR = 60 * 60
+DAY = 24 * HOUR
+
+# (url pattern, ttl in seconds). `None` means the page never changes once it
+# has been published.
+DEFAULT_TTLS: List[Tuple[str, Optional[float]]] = [
+    (r"/fight-details/", None),
+    (r"/event-details/", None),
+    (r"/fighter-details/", DAY),
+    (r"/statistics/events/completed", HOUR),
+    (r"/statistics/fighters", HOUR),
+]
+
+
+class OfflineCacheMiss(Exception):
+    pass
+
+
+class CachedResponse(NamedTuple):
+    text: str
+    fresh: bool
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+    def validators(self) -> Dict[str, str]:
+        headers = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class HTTPCache:
+    """
+    On-disk cache of raw ufcstats pages.
+
+    Page bodies are stored gzipped under a name derived from the sha256 of
+    the URL, the bookkeeping (validators, fetch and access times, sizes)
+    lives in a sqlite index next to them. Entries expire according to the
+    first matching pattern in `ttls`; once `max_size` bytes are exceeded the
+    least recently used entries are evicted. In `offline` mode callers must
+    never go to the network, stale entries are served as they are.
+    """
+
+    def __init__(
+        self,
+        cache_dir: Path = HTTP_CACHE_DIR,
+        max_size: int = 2 * 1024 ** 3,
+        ttls: Optional[List[Tuple[str, Optional[float]]]] = None,
+        default_ttl: Optional[float] = DAY,
+        offline: bool = False,
+    ):
+        self.cache_dir = Path(cache_dir)
+        self.max_size = max_size
+        self.ttls: List[Tuple[Pattern, Optional[float]]] = [
+            (re.compile(pattern), ttl)
+            for pattern, ttl in (DEFAULT_TTLS if ttls is None else ttls)
+        ]
+        self.default_ttl = default_ttl
+        self.offline = offline
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(
+            (self.cache_dir / "index.sqlite3").as_posix(), check_same_thread=False
+        )
+        with self._db:
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS entries (
+                    url TEXT PRIMARY KEY,
+                    size INTEGER NOT NULL,
+                    fetched_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL,
+                    etag TEXT,
+                    last_modified TEXT
+                )"""
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS entries_accessed_at ON entries (accessed_at)"
+            )
+
+    def ttl_for(self, url: str) -> Optional[float]:
+        for pattern, ttl in self.ttls:
+            if pattern.search(url):
+                return ttl
+        return self.default_ttl
+
+    def _body_path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.html.gz"
+
+    def get(self, url: str) -> Optional[CachedResponse]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT fetched_at, etag, last_modified FROM entries WHERE url = ?",
+                (url,),
+            ).fetchone()
+            if row is None:
+                return None
+            fetched_at, etag, last_modified = row
+
+            try:
+                with gzip.open(self._body_path(url).as_posix(), "rb") as f:
+                    text = f.read().decode("utf-8")
+            except FileNotFoundError:
+                with self._db:
+                    self._db.execute("DELETE FROM entries WHERE url = ?", (url,))
+                return None
+
+            with self._db:
+                self._db.execute(
+                    "UPDATE entries SET accessed_at = ? WHERE url = ?",
+                    (time.time(), url),
+                )
+
+        ttl = self.ttl_for(url)
+        fresh = ttl is None or time.time() - fetched_at < ttl
+        return CachedResponse(text, fresh, etag, last_modified)
+
+    def put(
+        self,
+        url: str,
+        text: str,
+        etag: Optional[str] = None,
+        last_modified: Optional[str] = None,
+    ) -> None:
+        body_path = self._body_path(url)
+        body_path.parent.mkdir(exist_ok=True)
+        tmp_path = body_path.with_name(f"{body_path.name}.{threading.get_ident()}.tmp")
+        with gzip.open(tmp_path.as_posix(), "wb") as f:
+            f.write(text.encode("utf-8"))
+        os.replace(tmp_path.as_posix(), body_path.as_posix())
+
+        now = time.time()
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?)",
+                    (url, body_path.stat().st_size, now, now, etag, last_modified),
+                )
+            self._evict()
+
+    def revalidated(self, url: str) -> None:
+        """Marks a cached page as fresh again after a `304 Not Modified`."""
+        now = time.time()
+        with self._lock:
+            with self._db:
+                self._db.execute(
+                    "UPDATE entries SET fetched_at = ?, accessed_at = ? WHERE url = ?",
+                    (now, now, url),
+                )
+
+    def _evict(self) -> None:
+        (total_size,) = self._db.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM entries"
+        ).fetchone()
+        if total_size <= self.max_size:
+            return
+
+        evicted = []
+        for url, size in self._db.execute(
+            "SELECT url, size FROM entries ORDER BY accessed_at"
+        ):
+            if total_size <= self.max_size:
+                break
+            evicted.append(url)
+            total_size -= size
+
+        with self._db:
+            self._db.executemany(
+                "DELETE FROM entries WHERE url = ?", [(url,) for url in evicted]
+            )
+        for url in evicted:
+            try:
+                os.remove(self._body_path(url).as_posix())
+            except FileNotFoundError:
+                pass
+
+    def close(self) -> None:
+        self._db.close()
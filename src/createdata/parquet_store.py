@@ -0,0 +1,247 @@
+import copy
+import os
+import re
+import shutil
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pa = pq = None
+
+PART_FILE = re.compile(r"part-(\d+)\.parquet$")
+# Rows of a part file written at a time, `read_row_groups` reads as many
+ROW_GROUP_SIZE = 10000
+
+
+def _arrow_type(dtype: Any) -> "pa.DataType":
+    if dtype in ("int64", "Int64"):
+        return pa.int64()
+    if dtype == "float64":
+        return pa.float64()
+    if dtype == "bool":
+        return pa.bool_()
+    return pa.string()
+
+
+class ParquetStore:
+    """
+    Append-only table kept as parquet files under `path`.
+
+    Every `append` adds a new batch of files, one per partition when
+    `partition_by` is given, rows that are already stored are never
+    rewritten. `read` returns the newest batch first, the rows of a batch in
+    the order they were appended, and can be limited to some columns or
+    partitions. Columns are stored with the explicit `dtypes`, missing text
+    comes back as NaN just like from `pd.read_csv`.
+
+    A batch only becomes visible once all of its files are written, files
+    of a batch that was interrupted are cleaned up by the next `append`.
+    Reading never changes the files, a `write` that was interrupted is
+    finished or undone by the next `append` or `write`.
+    """
+
+    def __init__(
+        self,
+        path: Path,
+        dtypes: Dict[str, Any],
+        partition_by: Optional[Callable[[pd.DataFrame], pd.Series]] = None,
+    ):
+        if pa is None:
+            raise ImportError(
+                "pyarrow is required for parquet storage, install it with `pip install pyarrow`"
+            )
+
+        self.path = Path(path)
+        self.dtypes = dtypes
+        self.partition_by = partition_by
+        self.schema = pa.schema(
+            [(column, _arrow_type(dtype)) for column, dtype in dtypes.items()]
+        )
+        self._committed_batch_path = self.path / "_committed_batch"
+
+    def exists(self) -> bool:
+        return (self._stored_path() / "_committed_batch").exists()
+
+    def _committed_batch(self) -> int:
+        committed_batch_path = self._stored_path() / "_committed_batch"
+        if not committed_batch_path.exists():
+            return 0
+        return int(committed_batch_path.read_text())
+
+    def _commit_batch(self, batch: int) -> None:
+        tmp_path = self._committed_batch_path.with_suffix(".tmp")
+        tmp_path.write_text(str(batch))
+        os.replace(tmp_path.as_posix(), self._committed_batch_path.as_posix())
+
+    def _part_files(self) -> List[Tuple[int, Path]]:
+        """(batch, file) of every part file, including uncommitted ones."""
+        part_files = []
+        for part_file in self._stored_path().glob("**/part-*.parquet"):
+            match = PART_FILE.search(part_file.name)
+            if match is not None:
+                part_files.append((int(match.group(1)), part_file))
+        return part_files
+
+    def partitions(self) -> List[str]:
+        """The keys of the stored partitions, none without `partition_by`."""
+        committed_batch = self._committed_batch()
+        stored_path = self._stored_path()
+        return sorted(
+            {
+                part_file.parent.name.split("=", 1)[-1]
+                for batch, part_file in self._part_files()
+                if batch <= committed_batch and part_file.parent != stored_path
+            }
+        )
+
+    def append(self, frame: pd.DataFrame) -> None:
+        self._recover()
+        self.path.mkdir(parents=True, exist_ok=True)
+
+        batch = self._committed_batch()
+        for part_batch, part_file in self._part_files():
+            if part_batch > batch:
+                # left behind by an append that didn't finish
+                part_file.unlink()
+        batch += 1
+
+        frame = frame[list(self.dtypes)].astype(self.dtypes)
+        if self.partition_by is None:
+            partitions = [(self.path, frame)]
+        else:
+            keys = self.partition_by(frame)
+            partitions = [
+                (self.path / f"{keys.name}={key}", partition)
+                for key, partition in frame.groupby(keys, sort=False)
+            ]
+
+        for directory, partition in partitions:
+            directory.mkdir(exist_ok=True)
+            table = pa.Table.from_pandas(
+                partition, schema=self.schema, preserve_index=False
+            )
+            pq.write_table(
+                table,
+                (directory / f"part-{batch:06d}.parquet").as_posix(),
+                row_group_size=ROW_GROUP_SIZE,
+            )
+
+        self._commit_batch(batch)
+
+    def _sibling(self, suffix: str) -> Path:
+        return self.path.with_name(f"{self.path.name}.{suffix}")
+
+    def _stored_path(self) -> Path:
+        """
+        Where the table is stored, `path` unless a `write` was interrupted
+        while swapping the new table in, see `_recover`.
+        """
+        new_path, old_path = self._sibling("new"), self._sibling("old")
+        if not self.path.exists():
+            if (new_path / "_committed_batch").exists():
+                return new_path
+            if old_path.exists():
+                return old_path
+        return self.path
+
+    def _recover(self) -> None:
+        """Finishes or undoes a `write` that was interrupted."""
+        stored_path = self._stored_path()
+        if stored_path != self.path:
+            os.replace(stored_path.as_posix(), self.path.as_posix())
+        for path in [self._sibling("new"), self._sibling("old")]:
+            if path.exists():
+                shutil.rmtree(path.as_posix())
+
+    def write(self, frame: pd.DataFrame) -> None:
+        """
+        Replaces everything stored with `frame`. The new table is written
+        next to the stored one and swapped in once it is complete, the stored
+        one is kept until then.
+        """
+        self._recover()
+        # a copy of this store, so that subclasses append the same way
+        new_store = copy.copy(self)
+        new_store.path = self._sibling("new")
+        new_store._committed_batch_path = new_store.path / "_committed_batch"
+        new_store.append(frame)
+        if self.path.exists():
+            os.replace(self.path.as_posix(), self._sibling("old").as_posix())
+        os.replace(new_store.path.as_posix(), self.path.as_posix())
+        shutil.rmtree(self._sibling("old").as_posix(), ignore_errors=True)
+
+    def _committed_part_files(
+        self, partitions: Optional[Iterable] = None
+    ) -> List[Tuple[int, Path]]:
+        """(batch, file) of the part files `read` reads, in the order it reads them."""
+        if partitions is not None:
+            partitions = {str(partition) for partition in partitions}
+
+        committed_batch = self._committed_batch()
+        return sorted(
+            (
+                (batch, part_file)
+                for batch, part_file in self._part_files()
+                if batch <= committed_batch
+                and (
+                    partitions is None
+                    or part_file.parent.name.split("=", 1)[-1] in partitions
+                )
+            ),
+            key=lambda part: (-part[0], part[1].as_posix()),
+        )
+
+    def _to_frame(self, frames: List[pd.DataFrame], columns: List[str]) -> pd.DataFrame:
+        if not frames:
+            return pd.DataFrame(
+                {column: pd.Series(dtype=self.dtypes[column]) for column in columns}
+            )
+
+        frame = pd.concat(frames, ignore_index=True).astype(
+            {column: self.dtypes[column] for column in columns}
+        )
+        for column in frame.select_dtypes(include=object):
+            values = frame[column].to_numpy(copy=True)
+            values[pd.isna(values)] = np.NaN
+            frame[column] = values
+        return frame
+
+    def read(
+        self,
+        columns: Optional[List[str]] = None,
+        partitions: Optional[Iterable] = None,
+    ) -> pd.DataFrame:
+        columns = list(self.dtypes) if columns is None else columns
+        frames = [
+            pq.read_table(part_file.as_posix(), columns=columns).to_pandas()
+            for _, part_file in self._committed_part_files(partitions)
+        ]
+        return self._to_frame(frames, columns)
+
+    def read_row_groups(
+        self,
+        columns: Optional[List[str]] = None,
+        partitions: Optional[Iterable] = None,
+    ) -> Iterator[pd.DataFrame]:
+        """
+        The rows of `ParquetStore.read`, in the same order, a row group at a
+        time, so that the rows of a partition don't have to fit in memory.
+        """
+        columns = list(self.dtypes) if columns is None else columns
+        for _, part_file in self._committed_part_files(partitions):
+            parquet_file = pq.ParquetFile(part_file.as_posix())
+            for row_group in range(parquet_file.num_row_groups):
+                yield self._to_frame(
+                    [
+                        parquet_file.read_row_group(
+                            row_group, columns=columns
+                        ).to_pandas()
+                    ],
+                    columns,
+                )
@@ -1,32 +1,291 @@
-import math
+import os
+import pickle
+import shutil
+from pathlib import Path
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 
+from src.createdata.ages import age_in_years
+from src.createdata.conversions import (
+    clock_to_seconds,
+    contains,
+    first_match,
+    landed_and_attempted,
+    percent_to_fraction,
+    total_time_fought,
+    winner_corner,
+)
+from src.createdata.fight_records import FightRecordStore
+from src.createdata.fighter_history import FighterHistory, fight_keys
+from src.createdata.fighter_index import FighterIndex
 from src.createdata.preprocess_fighter_data import FighterDetailProcessor
+from src.createdata.schema import (
+    COMPARED_COLUMNS,
+    apply_schema,
+    fits,
+    memory_usage_mb,
+    peak_rss_mb,
+)
+from src.createdata.scrape_fighter_details import FighterDetailsStore
 
 from src.createdata.data_files_path import (  # isort:skip
     FIGHTER_DETAILS,
+    FIGHTER_HISTORY_PICKLE,
+    FIGHTER_INDEX_PICKLE,
     PREPROCESSED_DATA,
+    PREPROCESSING_APPEND_PICKLE,
+    PREPROCESSED_DATA_PARQUET,
     TOTAL_EVENT_AND_FIGHTS,
     UFC_DATA,
+    UFC_DATA_PARQUET,
 )
 
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - optional dependency
+    pq = None
+
+# Columns one-hot encoded in the preprocessed data
+ONE_HOT_COLUMNS = ["weight_class", "B_Stance", "R_Stance"]
+
 
 class Preprocessor:
-    def __init__(self):
+    def __init__(self, report_memory=False):
+        """
+        With `report_memory=True` the memory used by the frames and the peak
+        memory of the process are recorded after every step and printed at
+        the end, measuring the frames takes time.
+        """
         self.FIGHTER_DETAILS_PATH = FIGHTER_DETAILS
         self.TOTAL_EVENT_AND_FIGHTS_PATH = TOTAL_EVENT_AND_FIGHTS
         self.PREPROCESSED_DATA_PATH = PREPROCESSED_DATA
+        self.PREPROCESSED_DATA_PARQUET_PATH = PREPROCESSED_DATA_PARQUET
         self.UFC_DATA_PATH = UFC_DATA
+        self.UFC_DATA_PARQUET_PATH = UFC_DATA_PARQUET
+        self.FIGHTER_HISTORY_PATH = FIGHTER_HISTORY_PICKLE
+        self.PREPROCESSING_APPEND_PATH = PREPROCESSING_APPEND_PICKLE
+        self.FIGHTER_INDEX_PATH = FIGHTER_INDEX_PICKLE
+        self.fight_records = FightRecordStore()
+        self.fighter_records = FighterDetailsStore()
         self.fights = None
         self.fighter_details = None
         self.store = None
-
-    def process_raw_data(self):
+        # True when the fights come from the parsed fight records rather than
+        # total_fight_data.csv, their strike counts, percentages and times
+        # don't have to be converted then.
+        self.typed = False
+        self.history = None
+        self.fighter_index = None
+        self.report_memory = report_memory
+        # (step, MB used by the fights, MB used by the store, peak RSS in MB)
+        self.memory_report = []
+
+    def process_raw_data(self, incremental=False):
+        """
+        With `incremental=True` only the fights added since the last run are
+        preprocessed, starting from the fighter history saved by that run,
+        and their rows are appended to the files it saved, see
+        `_append_new_rows`. Everything is preprocessed again when there is no
+        earlier run, when older fights were added or when the rows of the
+        new fights don't fit the saved files.
+
+        The csv files are written in full as newest first, rows appended
+        afterwards come at the end, newest last.
+        """
         print("Reading Files")
         self.fights, self.fighter_details = self._read_files()
+        self._record_memory("read files")
+        if incremental:
+            self._finish_append()
+            previous_data = self._take_new_fights()
+            if previous_data is not None:
+                if self.fights.empty:
+                    print("No new fights to preprocess at the moment!\n")
+                    return
+                if self._append_new_rows(previous_data):
+                    print("Successfully preprocessed and appended ufc data!\n")
+                    self._print_memory_report()
+                    return
+                print(
+                    "The new fights don't fit the saved data, preprocessing all fights"
+                )
+                self.fights, self.fighter_details = self._read_files()
+
+        self._start_rebuild()
+        self.history = FighterHistory()
+        self._create_data()
+        self._record_memory("fighter features")
+        apply_schema(self.store)
+        self._save(
+            filepath=self.UFC_DATA_PATH, parquet_filepath=self.UFC_DATA_PARQUET_PATH
+        )
+        self._record_memory("ufc data")
+
+        print("Fill NaNs")
+        self._fill_nas()
+        print("Dropping Non Essential Columns")
+        self._drop_non_essential_cols()
+        apply_schema(self.store)
+        self._save(
+            filepath=self.PREPROCESSED_DATA_PATH,
+            parquet_filepath=self.PREPROCESSED_DATA_PARQUET_PATH,
+        )
+        # saved last, the data is preprocessed again until it is saved
+        self.history.save(self.FIGHTER_HISTORY_PATH)
+        self._record_memory("preprocessed data")
+        print("Successfully preprocessed and saved ufc data!\n")
+        self._print_memory_report()
+
+    def _start_rebuild(self):
+        """
+        Forgets the earlier run, so that a rebuild that is interrupted is
+        started over by the next incremental run.
+        """
+        for path in [self.PREPROCESSING_APPEND_PATH, self.FIGHTER_HISTORY_PATH]:
+            if path.exists():
+                path.unlink()
+
+    def _outputs(self) -> Dict[str, tuple]:
+        """The csv file and the parquet directory of the data and of the preprocessed data."""
+        return {
+            "data": (self.UFC_DATA_PATH, self.UFC_DATA_PARQUET_PATH),
+            "preprocessed": (
+                self.PREPROCESSED_DATA_PATH,
+                self.PREPROCESSED_DATA_PARQUET_PATH,
+            ),
+        }
+
+    @staticmethod
+    def _parquet_parts(parquet_filepath: Path) -> List[Path]:
+        """The parts of a parquet directory, none for a single parquet file."""
+        return sorted(parquet_filepath.glob("part-*.parquet"))
+
+    def _append_new_rows(self, previous_data: pd.DataFrame) -> bool:
+        """
+        Appends the rows of the new fights to the data and the preprocessed
+        data, False when they don't fit the saved files: other columns,
+        values the dtypes of the saved parquet can't hold or values to one-hot
+        encode that have no column.
+
+        The NaNs of the new rows are filled with the medians of all the
+        data, the rows saved before keep the medians they were filled with.
+        """
+        self._create_data()
+        self._record_memory("fighter features")
+        apply_schema(self.store)
+        data_rows = self._like_saved(self.store, *self._outputs()["data"])
+        if data_rows is None:
+            return False
+
+        print("Fill NaNs")
+        all_data = pd.concat([previous_data, self.store], ignore_index=True)
+        self._fill_reach_with_height(all_data)
+        self._fill_nas(all_data.median())
+        print("Dropping Non Essential Columns")
+        one_hot_categories = self._saved_one_hot_categories()
+        kept = self.store[self.store["Winner"] != "Draw"]
+        for column, categories in one_hot_categories.items():
+            if not set(kept[column].dropna()) <= set(categories):
+                return False
+        self._drop_non_essential_cols(one_hot_categories)
+        apply_schema(self.store)
+        preprocessed_rows = self._like_saved(
+            self.store, *self._outputs()["preprocessed"]
+        )
+        if preprocessed_rows is None:
+            return False
+
+        self._commit_append({"data": data_rows, "preprocessed": preprocessed_rows})
+        self._record_memory("preprocessed data")
+        return True
+
+    def _like_saved(
+        self, rows: pd.DataFrame, filepath: Path, parquet_filepath: Path
+    ) -> Optional[pd.DataFrame]:
+        """
+        The rows with the columns of the saved csv file, in its order, and
+        the dtypes of the saved parquet, None when they don't fit them.
+        """
+        columns = list(pd.read_csv(filepath, nrows=0).columns)
+        if sorted(columns) != sorted(rows.columns):
+            return None
+
+        parts = self._parquet_parts(parquet_filepath)
+        dtypes = pq.read_schema(parts[0].as_posix()).empty_table().to_pandas().dtypes
+        rows = rows[columns].copy()
+        for column, dtype in dtypes.items():
+            if rows[column].dtype == dtype:
+                continue
+            if pd.api.types.is_categorical_dtype(dtype):
+                rows[column] = rows[column].astype("category")
+            elif dtype == object:
+                rows[column] = rows[column].astype(object)
+            elif fits(rows[column], dtype.name):
+                rows[column] = rows[column].astype(dtype)
+            else:
+                return None
+        return rows
+
+    def _saved_one_hot_categories(self) -> Dict[str, List[str]]:
+        """The values of the one-hot columns of the saved preprocessed data."""
+        columns = pd.read_csv(self.PREPROCESSED_DATA_PATH, nrows=0).columns
+        return {
+            column: [
+                name[len(column) + 1 :]
+                for name in columns
+                if name.startswith(column + "_")
+            ]
+            for column in ONE_HOT_COLUMNS
+        }
 
+    def _commit_append(self, rows: Dict[str, pd.DataFrame]):
+        """
+        Appends the rows to the outputs they are for and saves the history.
+
+        The rows, the sizes of the csv files and the history are saved
+        first, in one file written at once. Once it is saved the append is
+        done over from it by `_finish_append` until it completes, so the
+        files and the history are never left out of step by a crash.
+        """
+        append = {
+            "history": self.history,
+            "rows": {
+                name: (
+                    output_rows,
+                    os.path.getsize(self._outputs()[name][0].as_posix()),
+                    len(self._parquet_parts(self._outputs()[name][1])),
+                )
+                for name, output_rows in rows.items()
+            },
+        }
+        tmp_path = self.PREPROCESSING_APPEND_PATH.with_suffix(".tmp")
+        with open(tmp_path.as_posix(), "wb") as f:
+            pickle.dump(append, f)
+        os.replace(tmp_path.as_posix(), self.PREPROCESSING_APPEND_PATH.as_posix())
+        self._finish_append()
+
+    def _finish_append(self):
+        """Does the append saved by `_commit_append`, if any, over again."""
+        if not self.PREPROCESSING_APPEND_PATH.exists():
+            return
+
+        with open(self.PREPROCESSING_APPEND_PATH.as_posix(), "rb") as f:
+            append = pickle.load(f)
+        for name, (rows, size, part) in append["rows"].items():
+            filepath, parquet_filepath = self._outputs()[name]
+            # drops whatever an interrupted append wrote
+            with open(filepath.as_posix(), "r+b") as f:
+                f.truncate(size)
+            with open(filepath.as_posix(), "a", newline="") as f:
+                rows.to_csv(f, header=False, index=False)
+            rows.to_parquet(parquet_filepath / f"part-{part:06d}.parquet", index=False)
+        append["history"].save(self.FIGHTER_HISTORY_PATH)
+        self.PREPROCESSING_APPEND_PATH.unlink()
+
+    def _create_data(self):
+        """Makes the data saved as data.csv out of the fights."""
         print("Renaming Columns")
         self._rename_columns()
         self._replacing_winner_nans_draw()
@@ -38,35 +297,81 @@ class Preprocessor:
         self._convert_last_round_to_seconds()
         self._convert_CTRL_to_seconds()
         self._get_total_time_fought()
+        apply_schema(self.fights, skip=COMPARED_COLUMNS)
         self.store = self._store_compiled_fighter_data_in_another_DF()
         self._create_winner_feature()
         self._create_fighter_attributes()
         self._create_fighter_age()
-        self._save(filepath=self.UFC_DATA_PATH)
-
-        print("Fill NaNs")
-        self._fill_nas()
-        print("Dropping Non Essential Columns")
-        self._drop_non_essential_cols()
-        self._save(filepath=self.PREPROCESSED_DATA_PATH)
-        print("Successfully preprocessed and saved ufc data!\n")
 
     def _read_files(self):
-        try:
-            fights_df = pd.read_csv(self.TOTAL_EVENT_AND_FIGHTS_PATH, sep=";")
+        if self.fight_records.exists():
+            fights_df = self.fight_records.read()
+            self.typed = True
+        else:
+            try:
+                fights_df = pd.read_csv(self.TOTAL_EVENT_AND_FIGHTS_PATH, sep=";")
 
-        except Exception as e:
-            raise FileNotFoundError("Cannot find the data/total_fight_data.csv")
+            except Exception as e:
+                raise FileNotFoundError("Cannot find the data/total_fight_data.csv")
+
+        fighter_details_df = self._read_fighter_details()
+        return apply_schema(fights_df, skip=COMPARED_COLUMNS), fighter_details_df
+
+    def _read_fighter_details(self):
+        if self.fighter_records.exists():
+            return self.fighter_records.read()
 
         try:
-            fighter_details_df = pd.read_csv(
-                self.FIGHTER_DETAILS_PATH, index_col="fighter_name"
-            )
+            return pd.read_csv(self.FIGHTER_DETAILS_PATH, index_col="fighter_name")
 
         except Exception as e:
             raise FileNotFoundError("Cannot find the data/fighter_details.csv")
 
-        return fights_df, fighter_details_df
+    def _read_fighter_index(self):
+        """
+        The fighter IDs given when the fighters were scraped, or IDs for the
+        names of the fighter details when they were scraped without IDs.
+        """
+        if self.FIGHTER_INDEX_PATH.exists():
+            return FighterIndex.load(self.FIGHTER_INDEX_PATH)
+        return FighterIndex.from_names(self.fighter_details.index)
+
+    def _take_new_fights(self):
+        """
+        Keeps only the fights that weren't preprocessed yet and returns the
+        data saved for the others, or None when everything has to be
+        preprocessed again.
+        """
+        if not (
+            self.FIGHTER_HISTORY_PATH.exists()
+            and all(
+                filepath.exists() and self._parquet_parts(parquet_filepath)
+                for filepath, parquet_filepath in self._outputs().values()
+            )
+        ):
+            print("No earlier preprocessing found, preprocessing all fights")
+            return None
+
+        self.history = FighterHistory.load(self.FIGHTER_HISTORY_PATH)
+        is_new = [key not in self.history.fight_keys for key in fight_keys(self.fights)]
+        new_fights = self.fights[is_new]
+
+        dates = pd.to_datetime(new_fights["date"])
+        if (
+            self.history.latest_date is not None
+            and (dates < self.history.latest_date).any()
+        ):
+            print("Older fights were added, preprocessing all fights")
+            return None
+
+        self.fights = new_fights.reset_index(drop=True)
+        return pd.concat(
+            [
+                pd.read_parquet(part)
+                for part in self._parquet_parts(self.UFC_DATA_PARQUET_PATH)
+            ],
+            ignore_index=True,
+        )
 
     def _rename_columns(self):
         columns = [
@@ -93,13 +398,17 @@ class Preprocessor:
         attempt_suffix = "_att"
         landed_suffix = "_landed"
 
+        if self.typed:
+            # already split, only moved to where the csv path puts them
+            for column in columns:
+                for suffix in [attempt_suffix, landed_suffix]:
+                    self.fights[column + suffix] = self.fights.pop(column + suffix)
+            return
+
         for column in columns:
-            self.fights[column + attempt_suffix] = self.fights[column].apply(
-                lambda X: int(X.split("of")[1])
-            )
-            self.fights[column + landed_suffix] = self.fights[column].apply(
-                lambda X: int(X.split("of")[0])
-            )
+            landed, attempted = landed_and_attempted(self.fights[column])
+            self.fights[column + attempt_suffix] = attempted
+            self.fights[column + landed_suffix] = landed
 
         self.fights.drop(columns, axis=1, inplace=True)
 
@@ -109,50 +418,38 @@ class Preprocessor:
     def _convert_percentages_to_fractions(self):
         pct_columns = ["R_SIG_STR_pct", "B_SIG_STR_pct", "R_TD_pct", "B_TD_pct"]
 
-        def pct_to_frac(X):
-            if X != "---":
-                return float(X.replace("%", "")) / 100
-            else:
-                # if '---' means it's taking pct of `0 of 0`.
-                # Taking a call here to consider 0 landed of 0 attempted as 0 percentage
-                return 0
-
+        # if '---' means it's taking pct of `0 of 0`.
+        # Taking a call here to consider 0 landed of 0 attempted as 0 percentage
         for column in pct_columns:
-            self.fights[column] = self.fights[column].apply(pct_to_frac)
+            if self.typed:
+                self.fights[column] = self.fights[column].fillna(0)
+            else:
+                self.fights[column] = percent_to_fraction(self.fights[column], "---")
 
     def _create_title_bout_feature(self):
-        self.fights["title_bout"] = self.fights["Fight_type"].apply(
-            lambda X: True if "Title Bout" in X else False
-        )
+        self.fights["title_bout"] = contains(self.fights["Fight_type"], "Title Bout")
 
     def _create_weight_classes(self):
-        def make_weight_class(X):
-            weight_classes = [
-                "Women's Strawweight",
-                "Women's Bantamweight",
-                "Women's Featherweight",
-                "Women's Flyweight",
-                "Lightweight",
-                "Welterweight",
-                "Middleweight",
-                "Light Heavyweight",
-                "Heavyweight",
-                "Featherweight",
-                "Bantamweight",
-                "Flyweight",
-                "Open Weight",
-            ]
-
-            for weight_class in weight_classes:
-                if weight_class in X:
-                    return weight_class
-
-            if X == "Catch Weight Bout" or "Catchweight Bout":
-                return "Catch Weight"
-            else:
-                return "Open Weight"
+        weight_classes = [
+            "Women's Strawweight",
+            "Women's Bantamweight",
+            "Women's Featherweight",
+            "Women's Flyweight",
+            "Lightweight",
+            "Welterweight",
+            "Middleweight",
+            "Light Heavyweight",
+            "Heavyweight",
+            "Featherweight",
+            "Bantamweight",
+            "Flyweight",
+            "Open Weight",
+        ]
 
-        self.fights["weight_class"] = self.fights["Fight_type"].apply(make_weight_class)
+        # Fights of none of these classes are catch weight bouts
+        self.fights["weight_class"] = first_match(
+            self.fights["Fight_type"], weight_classes, "Catch Weight"
+        )
 
         renamed_weight_classes = {
             "Flyweight": "Flyweight",
@@ -171,94 +468,54 @@ class Preprocessor:
             "Open Weight": "OpenWeight",
         }
 
-        self.fights["weight_class"] = self.fights["weight_class"].apply(
-            lambda weight: renamed_weight_classes[weight]
+        self.fights["weight_class"] = self.fights["weight_class"].map(
+            renamed_weight_classes
         )
 
     def _convert_last_round_to_seconds(self):
+        if self.typed:
+            self.fights["last_round_time"] = self.fights["last_round_time"].astype(
+                "int64"
+            )
+            return
+
         # Converting to seconds
-        self.fights["last_round_time"] = self.fights["last_round_time"].apply(
-            lambda X: int(X.split(":")[0]) * 60 + int(X.split(":")[1])
+        self.fights["last_round_time"] = clock_to_seconds(
+            self.fights["last_round_time"]
         )
 
     def _convert_CTRL_to_seconds(self):
         # Converting to seconds
         CTRL_columns = ["R_CTRL", "B_CTRL"]
 
-        def conv_to_sec(X):
-            if X != "--":
-                return int(X.split(":")[0]) * 60 + int(X.split(":")[1])
-            else:
-                # if '--' means there was no time spent on the ground.
-                # Taking a call here to consider this as 0 seconds
-                return 0
-
+        # if '--' means there was no time spent on the ground.
+        # Taking a call here to consider this as 0 seconds
         for column in CTRL_columns:
-            self.fights[column + "_time(seconds)"] = self.fights[column].apply(
-                conv_to_sec
-            )
+            if self.typed:
+                self.fights[column + "_time(seconds)"] = (
+                    self.fights[column].fillna(0).astype("int64")
+                )
+            else:
+                self.fights[column + "_time(seconds)"] = clock_to_seconds(
+                    self.fights[column], "--"
+                )
 
         # drop original columns
         self.fights.drop(["R_CTRL", "B_CTRL"], axis=1, inplace=True)
 
     def _get_total_time_fought(self):
-        # '1 Rnd + 2OT (15-3-3)' and '1 Rnd + 2OT (24-3-3)' is not included because it has 3 uneven timed rounds.
-        # We'll have to deal with it separately
-        time_in_first_round = {
-            "3 Rnd (5-5-5)": 5 * 60,
-            "5 Rnd (5-5-5-5-5)": 5 * 60,
-            "1 Rnd + OT (12-3)": 12 * 60,
-            "No Time Limit": 1,
-            "3 Rnd + OT (5-5-5-5)": 5 * 60,
-            "1 Rnd (20)": 1 * 20,
-            "2 Rnd (5-5)": 5 * 60,
-            "1 Rnd (15)": 15 * 60,
-            "1 Rnd (10)": 10 * 60,
-            "1 Rnd (12)": 12 * 60,
-            "1 Rnd + OT (30-5)": 30 * 60,
-            "1 Rnd (18)": 18 * 60,
-            "1 Rnd + OT (15-3)": 15 * 60,
-            "1 Rnd (30)": 30 * 60,
-            "1 Rnd + OT (31-5)": 31 * 5,
-            "1 Rnd + OT (27-3)": 27 * 60,
-            "1 Rnd + OT (30-3)": 30 * 60,
-        }
-
-        exception_format_time = {
-            "1 Rnd + 2OT (15-3-3)": [15 * 60, 3 * 60],
-            "1 Rnd + 2OT (24-3-3)": [24 * 60, 3 * 60],
-        }
-
-        def get_total_time(row):
-            if row["Format"] in time_in_first_round.keys():
-                return (row["last_round"] - 1) * time_in_first_round[
-                    row["Format"]
-                ] + row["last_round_time"]
-
-            elif row["Format"] in exception_format_time.keys():
-
-                if (row["last_round"] - 1) >= 2:
-                    return (
-                        exception_format_time[row["Format"]][0]
-                        + (row["last_round"] - 2)
-                        * exception_format_time[row["Format"]][1]
-                        + row["last_round_time"]
-                    )
-                else:
-                    return (row["last_round"] - 1) * exception_format_time[
-                        row["Format"]
-                    ][0] + row["last_round_time"]
-
-        self.fights["total_time_fought(seconds)"] = self.fights.apply(
-            get_total_time, axis=1
+        self.fights["total_time_fought(seconds)"] = total_time_fought(
+            self.fights["Format"],
+            self.fights["last_round"],
+            self.fights["last_round_time"],
         )
         self.fights.drop(
             ["Format", "Fight_type", "last_round_time"], axis=1, inplace=True
         )
 
     def _store_compiled_fighter_data_in_another_DF(self):
-        store = self.fights.copy()
-        store.drop(
+        # `drop` makes the copy, the fights are not copied twice
+        return self.fights.drop(
             [
                 "R_KD",
                 "B_KD",
@@ -313,27 +570,22 @@ class Preprocessor:
                 "total_time_fought(seconds)",
             ],
             axis=1,
-            inplace=True,
         )
-        return store
 
     def _create_winner_feature(self):
-        def get_renamed_winner(row):
-            if row["R_fighter"] == row["Winner"]:
-                return "Red"
-
-            elif row["B_fighter"] == row["Winner"]:
-                return "Blue"
-
-            elif row["Winner"] == "Draw":
-                return "Draw"
-
-        self.store["Winner"] = self.store[["R_fighter", "B_fighter", "Winner"]].apply(
-            get_renamed_winner, axis=1
+        self.store["Winner"] = winner_corner(
+            self.store["R_fighter"], self.store["B_fighter"], self.store["Winner"]
         )
 
     def _create_fighter_attributes(self):
-        frame = FighterDetailProcessor(self.fights, self.fighter_details).frame
+        if self.fighter_index is None:
+            self.fighter_index = self._read_fighter_index()
+        frame = FighterDetailProcessor(
+            self.fights,
+            self.fighter_details,
+            history=self.history,
+            fighter_index=self.fighter_index,
+        ).frame
         self.store = self.store.join(frame, how="outer")
 
     def _create_fighter_age(self):
@@ -341,48 +593,71 @@ class Preprocessor:
         self.store["B_DOB"] = pd.to_datetime(self.store["B_DOB"])
         self.store["date"] = pd.to_datetime(self.store["date"])
 
-        def get_age(row):
-            B_age = (row["date"] - row["B_DOB"]).days
-            R_age = (row["date"] - row["R_DOB"]).days
-
-            if np.isnan(B_age) != True:
-                B_age = math.floor(B_age / 365.25)
-
-            if np.isnan(R_age) != True:
-                R_age = math.floor(R_age / 365.25)
-
-            return pd.Series([B_age, R_age], index=["B_age", "R_age"])
-
-        self.store[["B_age", "R_age"]] = self.store[["date", "R_DOB", "B_DOB"]].apply(
-            get_age, axis=1
-        )
+        self.store["B_age"] = age_in_years(self.store["date"], self.store["B_DOB"])
+        self.store["R_age"] = age_in_years(self.store["date"], self.store["R_DOB"])
         self.store.drop(["R_DOB", "B_DOB"], axis=1, inplace=True)
 
-    def _save(self, filepath):
+    def _save(self, filepath, parquet_filepath):
+        """
+        Writes the store to the csv file and as the first part of the parquet
+        directory, which later runs append parts to.
+        """
         self.store.to_csv(filepath, index=False)
-
-    def _fill_nas(self):
-        self.store["R_Reach_cms"].fillna(self.store["R_Height_cms"], inplace=True)
-        self.store["B_Reach_cms"].fillna(self.store["B_Height_cms"], inplace=True)
-        self.store.fillna(self.store.median(), inplace=True)
-
-        self.store["R_Stance"].fillna("Orthodox", inplace=True)
-        self.store["B_Stance"].fillna("Orthodox", inplace=True)
-
-    def _drop_non_essential_cols(self):
+        self._clear_parquet(parquet_filepath)
+        self.store.to_parquet(parquet_filepath / "part-000000.parquet", index=False)
+
+    @staticmethod
+    def _clear_parquet(parquet_filepath: Path):
+        """Makes the parquet directory empty, a parquet file is replaced by it."""
+        if parquet_filepath.is_dir():
+            shutil.rmtree(parquet_filepath.as_posix())
+        elif parquet_filepath.exists():
+            parquet_filepath.unlink()
+        parquet_filepath.mkdir(parents=True)
+
+    def _fill_nas(self, medians=None):
+        """
+        `medians` are those of the columns after filling the reaches, the
+        medians of the store by default.
+        """
+        self._fill_reach_with_height(self.store)
+        if medians is None:
+            medians = self.store.median()
+        self.store.fillna(medians, inplace=True)
+
+        for column in ["R_Stance", "B_Stance"]:
+            # as text, "Orthodox" may not be one of the categories
+            self.store[column] = self.store[column].astype(object).fillna("Orthodox")
+
+    @staticmethod
+    def _fill_reach_with_height(store):
+        store["R_Reach_cms"].fillna(store["R_Height_cms"], inplace=True)
+        store["B_Reach_cms"].fillna(store["B_Height_cms"], inplace=True)
+
+    def _drop_non_essential_cols(self, one_hot_categories=None):
+        """
+        `one_hot_categories` has the values to one-hot encode of every
+        column, the values found in the store by default.
+        """
         self.store.drop(self.store.index[self.store["Winner"] == "Draw"], inplace=True)
+        one_hot_columns = self.store[ONE_HOT_COLUMNS].copy()
+        for column in one_hot_columns:
+            if one_hot_categories is not None:
+                one_hot_columns[column] = pd.Categorical(
+                    one_hot_columns[column], categories=one_hot_categories[column]
+                )
+            elif one_hot_columns[column].dtype == "category":
+                # one-hot encodes the values left, not every category
+                one_hot_columns[column] = one_hot_columns[
+                    column
+                ].cat.remove_unused_categories()
         self.store = pd.concat(
-            [
-                self.store,
-                pd.get_dummies(self.store[["weight_class", "B_Stance", "R_Stance"]]),
-            ],
+            [self.store, pd.get_dummies(one_hot_columns)],
             axis=1,
         )
         self.store.drop(
-            columns=[
-                "weight_class",
-                "B_Stance",
-                "R_Stance",
+            columns=ONE_HOT_COLUMNS
+            + [
                 "Referee",
                 "location",
                 "date",
@@ -391,3 +666,23 @@ class Preprocessor:
             ],
             inplace=True,
         )
+
+    def _record_memory(self, step):
+        if not self.report_memory:
+            return
+        self.memory_report.append(
+            (
+                step,
+                0.0 if self.fights is None else memory_usage_mb(self.fights),
+                0.0 if self.store is None else memory_usage_mb(self.store),
+                peak_rss_mb(),
+            )
+        )
+
+    def _print_memory_report(self):
+        if not self.report_memory:
+            return
+        print(f"{'step':<20} {'fights':>10} {'store':>10} {'peak RSS':>10}")
+        for step, fights_mb, store_mb, peak_mb in self.memory_report:
+            peak = "n/a" if peak_mb is None else f"{peak_mb:.1f}MB"
+            print(f"{step:<20} {fights_mb:>8.2f}MB {store_mb:>8.2f}MB {peak:>10}")
@@ -4,9 +4,57 @@ import numpy as np
 import pandas as pd
 from tqdm import tqdm
 
+from src.createdata.fighter_history import (
+    NUMERICAL_COLUMNS,
+    RESULT_STATS,
+    WIN_BY_COLUMNS,
+    FighterHistory,
+    vectorized_features,
+)
+from src.createdata.fighter_index import FighterIndex, ProfileTable
+from src.createdata.fighter_kernels import kernel_features
+
+# How `FighterDetailProcessor` computes the features of the fighters
+METHODS = ["single_pass", "vectorized", "kernel", "parallel", "loop"]
+
 
 class FighterDetailProcessor:
-    def __init__(self, fights, fighter_details):
+    def __init__(
+        self,
+        fights,
+        fighter_details,
+        method="single_pass",
+        max_workers=None,
+        history=None,
+        fighter_index=None,
+    ):
+        """
+        `method` is "single_pass" to compute the features of the fighters in
+        one pass over the fights, "vectorized" to compute them with grouped
+        pandas operations, "kernel" to compute them with the numba (or NumPy)
+        kernels of `fighter_kernels`, "parallel" to run those kernels on
+        `max_workers` processes (all cores by default), or "loop" for the
+        original per fighter loop. All of them give the same features, the
+        loop takes quadratic time.
+
+        The single pass continues from the states in `history`, a
+        `FighterHistory`, when one is given.
+
+        The details of the fighters are joined to their fights by the IDs
+        of `fighter_index`, a `FighterIndex` of the names of the details by
+        default.
+        """
+        if method not in METHODS:
+            raise ValueError(f"Unknown method {method!r}, expected one of {METHODS}")
+
+        self.method = method
+        self.max_workers = max_workers
+        self.history = history if history is not None else FighterHistory()
+        self.fighter_index = (
+            fighter_index
+            if fighter_index is not None
+            else FighterIndex.from_names(fighter_details.index)
+        )
         self.fights = fights
         self.fighter_details = fighter_details
         self._one_hot_encode_win()
@@ -33,6 +81,20 @@ class FighterDetailProcessor:
         return list(set(red_fighters) | set(blue_fighters))
 
     def _calculate_fighter_data(self):
+        if self.method == "single_pass":
+            return self.history.process(self.fights)
+        if self.method == "vectorized":
+            print("Creating Fighter Level Features")
+            return vectorized_features(self.fights)
+        if self.method == "kernel":
+            print("Creating Fighter Level Features")
+            return kernel_features(self.fights)
+        if self.method == "parallel":
+            print("Creating Fighter Level Features")
+            return kernel_features(self.fights, max_workers=self.max_workers)
+        return self._calculate_fighter_data_in_loop()
+
+    def _calculate_fighter_data_in_loop(self):
 
         temp_blue_frame = pd.DataFrame()
         temp_red_frame = pd.DataFrame()
@@ -41,76 +103,6 @@ class FighterDetailProcessor:
         self.red = self.fights.groupby("R_fighter")
         self.blue = self.fights.groupby("B_fighter")
 
-        result_stats = [
-            "current_win_streak",
-            "current_lose_streak",
-            "longest_win_streak",
-            "wins",
-            "losses",
-            "draw",
-        ]
-
-        win_by_columns = [
-            "win_by_Decision - Majority",
-            "win_by_Decision - Split",
-            "win_by_Decision - Unanimous",
-            "win_by_KO/TKO",
-            "win_by_Submission",
-            "win_by_TKO - Doctor's Stoppage",
-        ]
-
-        Numerical_columns = [
-            "hero_KD",
-            "opp_KD",
-            "hero_SIG_STR_pct",
-            "opp_SIG_STR_pct",
-            "hero_TD_pct",
-            "opp_TD_pct",
-            "hero_SUB_ATT",
-            "opp_SUB_ATT",
-            "hero_REV",
-            "opp_REV",
-            "hero_SIG_STR._att",
-            "hero_SIG_STR._landed",
-            "opp_SIG_STR._att",
-            "opp_SIG_STR._landed",
-            "hero_TOTAL_STR._att",
-            "hero_TOTAL_STR._landed",
-            "opp_TOTAL_STR._att",
-            "opp_TOTAL_STR._landed",
-            "hero_TD_att",
-            "hero_TD_landed",
-            "opp_TD_att",
-            "opp_TD_landed",
-            "hero_HEAD_att",
-            "hero_HEAD_landed",
-            "opp_HEAD_att",
-            "opp_HEAD_landed",
-            "hero_BODY_att",
-            "hero_BODY_landed",
-            "opp_BODY_att",
-            "opp_BODY_landed",
-            "hero_LEG_att",
-            "hero_LEG_landed",
-            "opp_LEG_att",
-            "opp_LEG_landed",
-            "hero_DISTANCE_att",
-            "hero_DISTANCE_landed",
-            "opp_DISTANCE_att",
-            "opp_DISTANCE_landed",
-            "hero_CLINCH_att",
-            "hero_CLINCH_landed",
-            "opp_CLINCH_att",
-            "opp_CLINCH_landed",
-            "hero_GROUND_att",
-            "hero_GROUND_landed",
-            "opp_GROUND_att",
-            "opp_GROUND_landed",
-            "hero_CTRL_time(seconds)",
-            "opp_CTRL_time(seconds)",
-            "total_time_fought(seconds)",
-        ]
-
         print("Creating Fighter Level Features")
         for fighter_name in tqdm(fighters):
             fighter_red = self._get_fighter_red(fighter_name)
@@ -134,7 +126,7 @@ class FighterDetailProcessor:
 
                 fighter_slice = fighter[(i + 1) :].sort_index(ascending=False)
                 s = (
-                    fighter_slice[Numerical_columns]
+                    fighter_slice[NUMERICAL_COLUMNS]
                     .ewm(span=3, adjust=False)
                     .mean()
                     .tail(1)
@@ -149,12 +141,12 @@ class FighterDetailProcessor:
                 ]["title_bout"].count()
                 s["hero_fighter"] = fighter_name
                 results = self._get_result_stats(list(fighter_slice["Winner"]))
-                for result_stat, result in zip(result_stats, results):
+                for result_stat, result in zip(RESULT_STATS, results):
                     s[result_stat] = result
                 win_by_results = fighter_slice[fighter_slice["Winner"] == "hero"][
-                    win_by_columns
+                    WIN_BY_COLUMNS
                 ].sum()
-                for win_by_column, win_by_result in zip(win_by_columns, win_by_results):
+                for win_by_column, win_by_result in zip(WIN_BY_COLUMNS, win_by_results):
                     s[win_by_column] = win_by_result
 
                 s.index = [index]
@@ -295,33 +287,28 @@ class FighterDetailProcessor:
             )
 
     def _merge_frames(self):
-
-        self.fighter_details.reset_index(inplace=True)
-        self.temp_red_frame.reset_index(inplace=True)
-        self.temp_blue_frame.reset_index(inplace=True)
-
-        self.temp_blue_frame = self.temp_blue_frame.merge(
-            self.fighter_details,
-            left_on="hero_fighter",
-            right_on="fighter_name",
-            how="left",
+        # details of unknown fighters are added to the index, in memory only
+        details_ids = np.array(
+            [self.fighter_index.add(name) for name in self.fighter_details.index],
+            dtype="int64",
         )
-        self.temp_blue_frame.set_index("index", inplace=True)
-
-        self.temp_red_frame = self.temp_red_frame.merge(
-            self.fighter_details,
-            left_on="hero_fighter",
-            right_on="fighter_name",
-            how="left",
+        profiles = ProfileTable(
+            self.fighter_details, details_ids, len(self.fighter_index)
         )
-        self.temp_red_frame.set_index("index", inplace=True)
 
-        self.temp_blue_frame.drop("fighter_name", axis=1, inplace=True)
-        self.temp_red_frame.drop("fighter_name", axis=1, inplace=True)
-
-        blue_frame = self.temp_blue_frame.add_prefix("B_")
-        red_frame = self.temp_red_frame.add_prefix("R_")
+        frames = []
+        for temp_frame, prefix in [
+            (self.temp_blue_frame, "B_"),
+            (self.temp_red_frame, "R_"),
+        ]:
+            temp_frame = temp_frame.rename_axis("index")
+            details = profiles.gather(
+                self.fighter_index.ids(temp_frame["hero_fighter"]), temp_frame.index
+            )
+            frames.append(pd.concat([temp_frame, details], axis=1).add_prefix(prefix))
+        self.temp_blue_frame, self.temp_red_frame = frames
 
+        blue_frame, red_frame = frames
         return blue_frame.join(red_frame, how="outer")
 
     def _rename_columns(self):
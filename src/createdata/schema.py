@@ -0,0 +1,115 @@
+import re
+import sys
+import warnings
+from typing import Iterable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+try:
+    import resource
+except ImportError:  # pragma: no cover - not available on Windows
+    resource = None
+
+CATEGORY = "category"
+
+# The narrowest dtype of the columns `Preprocessor` works with, by pattern of
+# their names, the first pattern that matches a column is used. Columns that
+# match none keep their dtype, like the averages of the fighters which need
+# float64.
+DTYPE_SCHEMA: List[Tuple[str, str]] = [
+    # text repeated over many rows
+    (r"^[RB]_fighter$", CATEGORY),
+    (r"^(Referee|location|weight_class|Winner)$", CATEGORY),
+    (r"^[RB]_Stance$", CATEGORY),
+    (r"^title_bout$", "bool"),
+    # counts of a single fight
+    (r"^[RB]_(KD|SUB_ATT|REV)$", "int16"),
+    (r"^[RB]_[A-Z_.]+_(att|landed)$", "int16"),
+    (r"^[RB]_CTRL_time\(seconds\)$", "int16"),
+    (r"^last_round$", "int8"),
+    (r"^total_time_fought\(seconds\)$", "int32"),
+    # counts over the earlier fights of a fighter
+    (
+        r"^[RB]_(total_rounds_fought|total_title_bouts|current_win_streak"
+        r"|current_lose_streak|longest_win_streak|wins|losses|draw)$",
+        "int16",
+    ),
+    # whole numbers, floats for their NaNs
+    (r"^[RB]_win_by_", "float32"),
+    (r"^[RB]_(age|Weight_lbs)$", "float32"),
+    # one-hot encoded columns
+    (r"^(weight_class|[RB]_Stance)_", "uint8"),
+]
+
+# Columns of the fights that are compared with each other, which categoricals
+# with different categories can't be, they stay text until the store is made
+COMPARED_COLUMNS = ["R_fighter", "B_fighter", "Winner"]
+
+_COMPILED_SCHEMA = [(re.compile(pattern), dtype) for pattern, dtype in DTYPE_SCHEMA]
+
+
+def schema_dtype(column: str):
+    """The dtype `DTYPE_SCHEMA` declares for `column`, None if it declares none."""
+    for pattern, dtype in _COMPILED_SCHEMA:
+        if pattern.search(column):
+            return dtype
+    return None
+
+
+def fits(values: pd.Series, dtype: str) -> bool:
+    """
+    True when `values` can be stored as `dtype` without changing any of
+    them, the data is never rounded or clipped.
+    """
+    if dtype == CATEGORY:
+        return values.dtype == object
+    if dtype == "bool":
+        return values.dtype == bool
+
+    if not pd.api.types.is_numeric_dtype(values) or pd.api.types.is_bool_dtype(values):
+        return False
+    if np.dtype(dtype).kind in "iu":
+        if values.isna().any():
+            return False
+        limits = np.iinfo(dtype)
+        return values.empty or (
+            limits.min <= values.min() and values.max() <= limits.max
+        )
+
+    # floats only when every value is exactly the same in the narrower type
+    values = values.astype("float64")
+    return values.astype(dtype).astype("float64").equals(values)
+
+
+def apply_schema(frame: pd.DataFrame, skip: Iterable[str] = ()) -> pd.DataFrame:
+    """
+    Converts the columns of `frame`, except those in `skip`, to the dtypes of
+    `DTYPE_SCHEMA`, in place, and returns it. Columns whose values don't fit
+    their dtype are kept as they are with a warning, the schema has to be
+    widened for them.
+    """
+    for column in frame.columns.difference(skip, sort=False):
+        dtype = schema_dtype(column)
+        if dtype is None or frame[column].dtype == dtype:
+            continue
+        if fits(frame[column], dtype):
+            frame[column] = frame[column].astype(dtype)
+        else:
+            warnings.warn(
+                f"{column} doesn't fit in {dtype}, it is kept as {frame[column].dtype}"
+            )
+    return frame
+
+
+def memory_usage_mb(frame: pd.DataFrame) -> float:
+    return frame.memory_usage(index=True, deep=True).sum() / 2 ** 20
+
+
+def peak_rss_mb() -> Optional[float]:
+    """The peak resident memory of this process so far, None where unknown."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # bytes on macOS, kilobytes everywhere else
+    return peak / 2 ** 20 if sys.platform == "darwin" else peak / 2 ** 10
@@ -1,11 +1,24 @@
+import asyncio
+import json
 import os
-from typing import Dict, List
-
-import pandas as pd
-from bs4 import BeautifulSoup
-
+from collections import deque
+from functools import partial
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from src.createdata.async_fetcher import AsyncFetcher
+from src.createdata.fetcher import Fetcher, get_default_fetcher
+from src.createdata.fight_records import (
+    EventInfo,
+    FightRecord,
+    FightRecordStore,
+    read_legacy_csv,
+    to_frame,
+    write_legacy_csv,
+)
+from src.createdata.parsers import Bs4Parser, PageParser, ParsePool
 from src.createdata.scrape_fight_links import UFCLinks
-from src.createdata.utils import make_soup, print_progress
+from src.createdata.utils import print_progress
+from src.createdata.work_journal import DONE, FAILED, WorkJournal
 
 from src.createdata.data_files_path import (  # isort:skip
     NEW_EVENT_AND_FIGHTS,
@@ -14,7 +27,16 @@ from src.createdata.data_files_path import (  # isort:skip
 
 
 class FightDataScraper:
-    def __init__(self):
+    def __init__(
+        self,
+        fetcher: Optional[Fetcher] = None,
+        async_fetcher: Optional[AsyncFetcher] = None,
+        journal: Optional[WorkJournal] = None,
+        parser: Optional[PageParser] = None,
+        parse_pool: Optional[ParsePool] = None,
+        fight_records: Optional[FightRecordStore] = None,
+        export_csv: bool = True,
+    ):
         self.HEADER: str = "R_fighter;B_fighter;R_KD;B_KD;R_SIG_STR.;B_SIG_STR.\
 ;R_SIG_STR_pct;B_SIG_STR_pct;R_TOTAL_STR.;B_TOTAL_STR.;R_TD;B_TD;R_TD_pct\
 ;B_TD_pct;R_SUB_ATT;B_SUB_ATT;R_REV;B_REV;R_CTRL;B_CTRL;R_HEAD;B_HEAD;R_BODY\
@@ -23,199 +45,350 @@ class FightDataScraper:
 
         self.NEW_EVENT_AND_FIGHTS_PATH = NEW_EVENT_AND_FIGHTS
         self.TOTAL_EVENT_AND_FIGHTS_PATH = TOTAL_EVENT_AND_FIGHTS
+        self.fetcher = fetcher or get_default_fetcher()
+        self.async_fetcher = async_fetcher
+        self.journal = journal or WorkJournal()
+        self.parser = parser or Bs4Parser()
+        self.parse_pool = parse_pool
+        self.fight_records = fight_records or FightRecordStore()
+        # total_fight_data.csv is rewritten from the fight records after
+        # every update, turn off when only the parquet data is used
+        self.export_csv = export_csv
+
+    def create_fight_data_csv(self, use_async: bool = False) -> None:
+        if (
+            not self.fight_records.exists()
+            and self.TOTAL_EVENT_AND_FIGHTS_PATH.exists()
+        ):
+            # scraped before the fight records were stored as parquet
+            print("Converting total fight data to parquet")
+            self.fight_records.write(
+                to_frame(read_legacy_csv(self.TOTAL_EVENT_AND_FIGHTS_PATH))
+            )
 
-    def create_fight_data_csv(self) -> None:
         print("Scraping links!")
 
-        ufc_links = UFCLinks()
+        ufc_links = UFCLinks(fetcher=self.fetcher, parser=self.parser)
         new_events_and_fight_links, all_events_and_fight_links = (
             ufc_links.get_event_and_fight_links()
         )
         print("Successfully scraped and saved event and fight links!\n")
-        print("Now, scraping event and fight data!\n")
 
-        if not new_events_and_fight_links:
-            if self.TOTAL_EVENT_AND_FIGHTS_PATH.exists():
-                print("No new fight data to scrape at the moment!")
-                return
-            else:
-                self._scrape_raw_fight_data(
-                    all_events_and_fight_links,
-                    filepath=self.TOTAL_EVENT_AND_FIGHTS_PATH,
-                )
+        # The events have to be in the journal before they are saved as past
+        # event links, otherwise an interrupted run would forget about them.
+        if self.fight_records.exists():
+            self.journal.register(new_events_and_fight_links)
         else:
-            self._scrape_raw_fight_data(
-                new_events_and_fight_links, filepath=self.NEW_EVENT_AND_FIGHTS_PATH
-            )
+            self.journal.reset_committed()
+            self.journal.register(all_events_and_fight_links)
+        ufc_links.save_past_event_links()
 
-            new_event_and_fights_data = pd.read_csv(self.NEW_EVENT_AND_FIGHTS_PATH)
-            old_event_and_fights_data = pd.read_csv(self.TOTAL_EVENT_AND_FIGHTS_PATH)
+        print("Now, scraping event and fight data!\n")
+        event_and_fight_links = self.journal.get_outstanding()
+        if not event_and_fight_links:
+            print("No new fight data to scrape at the moment!")
+            if self.export_csv and not self.TOTAL_EVENT_AND_FIGHTS_PATH.exists():
+                self._export_csv()
+            return
+
+        written_fights = self._scrape_raw_fight_data(
+            event_and_fight_links,
+            filepath=self.NEW_EVENT_AND_FIGHTS_PATH,
+            use_async=use_async,
+        )
 
-            assert len(new_event_and_fights_data.columns) == len(
-                old_event_and_fights_data.columns
-            )
+        # Only the new fights are written, the stored ones stay as they are
+        self.fight_records.append_new(to_frame(record for _, record in written_fights))
+        self.journal.mark_committed(fight for fight, _ in written_fights)
 
-            new_event_and_fights_data = new_event_and_fights_data[
-                list(old_event_and_fights_data.columns)
-            ]
+        os.remove(self.NEW_EVENT_AND_FIGHTS_PATH)
+        print("Removed new event and fight files")
 
-            latest_total_fight_data = new_event_and_fights_data.append(
-                old_event_and_fights_data, ignore_index=True
-            )
-            latest_total_fight_data.to_csv(self.TOTAL_EVENT_AND_FIGHTS_PATH, index=None)
+        if self.export_csv:
+            self._export_csv()
 
-            os.remove(self.NEW_EVENT_AND_FIGHTS_PATH)
-            print("Removed new event and fight files")
+        failed = self.journal.count_failed()
+        if failed:
+            print(f"{failed} pages could not be scraped, retrying them on the next run")
 
         print("Successfully scraped and saved ufc fight data!\n")
 
+    def _export_csv(self) -> None:
+        print("Exporting total fight data to csv")
+        write_legacy_csv(
+            self.fight_records.read(), self.TOTAL_EVENT_AND_FIGHTS_PATH, self.HEADER
+        )
+
     def _scrape_raw_fight_data(
-        self, event_and_fight_links: Dict[str, List[str]], filepath
-    ):
+        self,
+        event_and_fight_links: Dict[str, List[str]],
+        filepath,
+        use_async: bool = False,
+    ) -> List[Tuple[str, FightRecord]]:
+        """
+        Scrapes whatever the journal does not have yet and writes the fight
+        rows of `event_and_fight_links` to `filepath`. Returns the urls and
+        records of the fights that were written.
+        """
         if filepath.exists():
             print("file already exists. Overwriting!")
 
-        total_stats = FightDataScraper._get_total_fight_stats(event_and_fight_links)
+        written_fights = []
+
         with open(filepath.as_posix(), "wb") as file:
             file.write(bytes(self.HEADER, encoding="ascii", errors="ignore"))
-            file.write(bytes(total_stats, encoding="ascii", errors="ignore"))
+
+            def write_event(event_stats: List[Tuple[str, FightRecord]]) -> None:
+                for fight, record in event_stats:
+                    file.write(
+                        bytes(record.to_row() + "\n", encoding="ascii", errors="ignore")
+                    )
+                    written_fights.append((fight, record))
+                # flush after every event so that a crash only loses the
+                # event that was being scraped
+                file.flush()
+
+            if use_async:
+                if self.async_fetcher is None:
+                    self.async_fetcher = AsyncFetcher()
+                asyncio.run(
+                    FightDataScraper._awrite_total_fight_stats(
+                        event_and_fight_links,
+                        self.async_fetcher,
+                        self.parser,
+                        self.journal,
+                        write_event,
+                        self.parse_pool,
+                    )
+                )
+            else:
+                for event_stats in FightDataScraper._get_total_fight_stats(
+                    event_and_fight_links,
+                    self.fetcher,
+                    self.parser,
+                    self.journal,
+                    self.parse_pool,
+                ):
+                    write_event(event_stats)
+
+        return written_fights
+
+    @classmethod
+    def _fetch_page(
+        cls, fetcher: Fetcher, link: str, is_event: bool
+    ) -> Tuple[bool, Optional[bytes], Optional[str]]:
+        try:
+            return is_event, fetcher.fetch(link), None
+        except Exception as e:
+            return is_event, None, repr(e)
+
+    @classmethod
+    def _parse_page(
+        cls, parser: PageParser, fetched: Tuple[bool, Optional[bytes], Optional[str]]
+    ) -> Tuple[str, str]:
+        """
+        Turns the output of `_fetch_page` into the `(status, row_or_error)`
+        the journal stores. Runs in the parse pool's worker processes when
+        there is one.
+        """
+        is_event, page, error = fetched
+        if page is None:
+            return FAILED, error
+        try:
+            if is_event:
+                return DONE, json.dumps(parser.parse_event_info(page))
+            return DONE, json.dumps(parser.parse_fight(page))
+        except Exception as e:
+            return FAILED, repr(e)
+
+    @classmethod
+    def _scrape_event_or_fight(
+        cls, fetcher: Fetcher, parser: PageParser, link: str, is_event: bool
+    ) -> Tuple[str, str]:
+        return FightDataScraper._parse_page(
+            parser, FightDataScraper._fetch_page(fetcher, link, is_event)
+        )
+
+    @classmethod
+    def _get_unfinished(
+        cls, journal: WorkJournal, event: str, fights: List[str]
+    ) -> Tuple[bool, List[str]]:
+        status = journal.get_status([event] + fights)
+        return (
+            status[event][0] != DONE,
+            [fight for fight in fights if status[fight][0] != DONE],
+        )
 
     @classmethod
-    def _get_total_fight_stats(cls, event_and_fight_links: Dict[str, List[str]]) -> str:
-        total_stats = ""
+    def _record_event(
+        cls, journal: WorkJournal, event: str, results: Dict[str, Tuple[str, str]]
+    ) -> List[Tuple[str, FightRecord]]:
+        """
+        Saves the scraped pages of an event to the journal and returns the
+        `(fight url, fight record)` pairs that are ready to be written.
+        """
+        journal.record(results)
+
+        event_status, event_info = journal.get_status([event])[event]
+        if event_status != DONE:
+            return []
+
+        event_info = EventInfo(*json.loads(event_info))
+        return [
+            (fight, FightRecord(*json.loads(row)).with_event(event_info))
+            for fight, row in journal.get_uncommitted_rows(event)
+        ]
 
+    @classmethod
+    def _get_total_fight_stats(
+        cls,
+        event_and_fight_links: Dict[str, List[str]],
+        fetcher: Fetcher,
+        parser: PageParser,
+        journal: WorkJournal,
+        parse_pool: Optional[ParsePool] = None,
+    ) -> Iterator[List[Tuple[str, FightRecord]]]:
+        """
+        Yields the `(fight url, fight stats row)` pairs of one event at a time,
+        in the order of `event_and_fight_links`. Pages the journal already has
+        are not fetched again. Without a `parse_pool` the pages are parsed on
+        the fetch threads.
+        """
         l = len(event_and_fight_links)
         print("Scraping all fight data: ")
         print_progress(0, l, prefix="Progress:", suffix="Complete")
 
-        for index, (event, fights) in enumerate(event_and_fight_links.items()):
-            event_soup = make_soup(event)
-            event_info = FightDataScraper._get_event_info(event_soup)
+        unfinished = {
+            event: FightDataScraper._get_unfinished(journal, event, fights)
+            for event, fights in event_and_fight_links.items()
+        }
+
+        # Event pages and fight pages are queued as one flat stream so that the
+        # worker pool stays busy across event boundaries. Results come back in
+        # submission order, i.e. each event page is followed by its fights.
+        links = (
+            (link, is_event)
+            for event, (fetch_event, fights) in unfinished.items()
+            for link, is_event in [(event, True)] * fetch_event
+            + [(fight, False) for fight in fights]
+        )
+        if parse_pool is None:
+            results = fetcher.map(
+                lambda job: FightDataScraper._scrape_event_or_fight(
+                    fetcher, parser, *job
+                ),
+                links,
+            )
+        else:
+            pages = fetcher.map(
+                lambda job: FightDataScraper._fetch_page(fetcher, *job), links
+            )
+            results = parse_pool.map(
+                partial(FightDataScraper._parse_page, parser), pages
+            )
 
-            for fight in fights:
-                try:
-                    fight_soup = make_soup(fight)
-                    fight_stats = FightDataScraper._get_fight_stats(fight_soup)
-                    fight_details = FightDataScraper._get_fight_details(fight_soup)
-                    result_data = FightDataScraper._get_fight_result_data(fight_soup)
-                except Exception as e:
-                    continue
-
-                total_fight_stats = (
-                    fight_stats
-                    + ";"
-                    + fight_details
-                    + ";"
-                    + event_info
-                    + ";"
-                    + result_data
-                )
+        for index, (event, (fetch_event, fights)) in enumerate(unfinished.items()):
+            event_results = {event: next(results)} if fetch_event else {}
+            event_results.update((fight, next(results)) for fight in fights)
 
-                if total_stats == "":
-                    total_stats = total_fight_stats
-                else:
-                    total_stats = total_stats + "\n" + total_fight_stats
+            yield FightDataScraper._record_event(journal, event, event_results)
 
             print_progress(index + 1, l, prefix="Progress:", suffix="Complete")
 
-        return total_stats
-
     @classmethod
-    def _get_fight_stats(cls, fight_soup: BeautifulSoup) -> str:
-        tables = fight_soup.findAll("tbody")
-        total_fight_data = [tables[0], tables[2]]
-        fight_stats = []
-        for table in total_fight_data:
-            row = table.find("tr")
-            stats = ""
-            for data in row.findAll("td"):
-                if stats == "":
-                    stats = data.text
-                else:
-                    stats = stats + "," + data.text
-            fight_stats.append(
-                stats.replace("  ", "")
-                .replace("\n\n", "")
-                .replace("\n", ",")
-                .replace(", ", ",")
-                .replace(" ,", ",")
+    async def _aget_total_fight_stats(
+        cls,
+        event_and_fight_links: Dict[str, List[str]],
+        fetcher: AsyncFetcher,
+        parser: PageParser,
+        journal: WorkJournal,
+        parse_pool: Optional[ParsePool] = None,
+    ) -> AsyncIterator[List[Tuple[str, FightRecord]]]:
+        """
+        asyncio version of `_get_total_fight_stats`. Only a window of events
+        is scheduled at a time so that finished events waiting for an earlier,
+        slower one do not pile up in memory.
+        """
+
+        async def parse_page(is_event: bool, page: bytes) -> Tuple[str, str]:
+            if parse_pool is None:
+                return FightDataScraper._parse_page(parser, (is_event, page, None))
+            return await asyncio.get_event_loop().run_in_executor(
+                parse_pool.executor,
+                partial(FightDataScraper._parse_page, parser),
+                (is_event, page, None),
             )
 
-        fight_stats[1] = ";".join(fight_stats[1].split(",")[6:])
-        fight_stats[0] = ";".join(fight_stats[0].split(","))
-        fight_stats = ";".join(fight_stats)
-        return fight_stats
-
-    @classmethod
-    def _get_fight_details(cls, fight_soup: BeautifulSoup) -> str:
-        columns = ""
-        for div in fight_soup.findAll("div", {"class": "b-fight-details__content"}):
-            for col in div.findAll("p", {"class": "b-fight-details__text"}):
-                if columns == "":
-                    columns = col.text
+        async def scrape_fight(fight: str, event_limiter: asyncio.Semaphore):
+            try:
+                async with event_limiter:
+                    fight_page = await fetcher.fetch(fight)
+            except Exception as e:
+                return fight, (FAILED, repr(e))
+            # parse as soon as the page arrives instead of waiting for the
+            # rest of the event
+            return fight, await parse_page(False, fight_page)
+
+        async def scrape_event(event: str, fetch_event: bool, fights: List[str]):
+            event_limiter = fetcher.event_limiter()
+            fight_tasks = [
+                asyncio.ensure_future(scrape_fight(fight, event_limiter))
+                for fight in fights
+            ]
+            event_results = {}
+            if fetch_event:
+                try:
+                    event_page = await fetcher.fetch(event)
+                except Exception as e:
+                    event_results[event] = (FAILED, repr(e))
                 else:
-                    columns = columns + "," + (col.text)
-
-        columns = (
-            columns.replace("  ", "")
-            .replace("\n\n\n\n", ",")
-            .replace("\n", "")
-            .replace(", ", ",")
-            .replace(" ,", ",")
-            .replace("Method: ", "")
-            .replace("Round:", "")
-            .replace("Time:", "")
-            .replace("Time format:", "")
-            .replace("Referee:", "")
-        )
-
-        fight_details = ";".join(columns.split(",")[:5])
-
-        return fight_details
+                    event_results[event] = await parse_page(True, event_page)
+            event_results.update(await asyncio.gather(*fight_tasks))
+            return event, event_results
 
-    @classmethod
-    def _get_event_info(cls, event_soup: BeautifulSoup) -> str:
-        event_info = ""
-        for info in event_soup.findAll("li", {"class": "b-list__box-list-item"}):
-            if event_info == "":
-                event_info = info.text
-            else:
-                event_info = event_info + ";" + info.text
-
-        event_info = ";".join(
-            event_info.replace("Date:", "")
-            .replace("Location:", "")
-            .replace("Attendance:", "")
-            .replace("\n", "")
-            .replace("  ", "")
-            .split(";")[:2]
-        )
+        l = len(event_and_fight_links)
+        print("Scraping all fight data: ")
+        print_progress(0, l, prefix="Progress:", suffix="Complete")
 
-        return event_info
+        window = 2 * max(1, fetcher.max_in_flight // fetcher.max_in_flight_per_event)
+        events = iter(event_and_fight_links.items())
+        event_tasks = deque()
+
+        async with fetcher:
+            try:
+                for index in range(l):
+                    while len(event_tasks) < window:
+                        try:
+                            event, fights = next(events)
+                        except StopIteration:
+                            break
+                        fetch_event, fights = FightDataScraper._get_unfinished(
+                            journal, event, fights
+                        )
+                        event_tasks.append(
+                            asyncio.ensure_future(
+                                scrape_event(event, fetch_event, fights)
+                            )
+                        )
+
+                    event, event_results = await event_tasks.popleft()
+                    yield FightDataScraper._record_event(journal, event, event_results)
+                    print_progress(index + 1, l, prefix="Progress:", suffix="Complete")
+            finally:
+                for event_task in event_tasks:
+                    event_task.cancel()
 
     @classmethod
-    def _get_fight_result_data(cls, fight_soup: BeautifulSoup) -> str:
-        winner = ""
-        for div in fight_soup.findAll("div", {"class": "b-fight-details__person"}):
-            if (
-                div.find(
-                    "i",
-                    {
-                        "class": "b-fight-details__person-status b-fight-details__person-status_style_green"
-                    },
-                )
-                is not None
-            ):
-                winner = (
-                    div.find("h3", {"class": "b-fight-details__person-name"})
-                    .text.replace(" \n", "")
-                    .replace("\n", "")
-                )
-
-        fight_type = (
-            fight_soup.find("i", {"class": "b-fight-details__fight-title"})
-            .text.replace("  ", "")
-            .replace("\n", "")
-        )
-
-        return fight_type + ";" + winner
+    async def _awrite_total_fight_stats(
+        cls,
+        event_and_fight_links: Dict[str, List[str]],
+        fetcher: AsyncFetcher,
+        parser: PageParser,
+        journal: WorkJournal,
+        write_event: Callable[[List[Tuple[str, FightRecord]]], None],
+        parse_pool: Optional[ParsePool] = None,
+    ) -> None:
+        async for event_stats in FightDataScraper._aget_total_fight_stats(
+            event_and_fight_links, fetcher, parser, journal, parse_pool
+        ):
+            write_event(event_stats)
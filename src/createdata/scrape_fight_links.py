@@ -1,7 +1,9 @@
 import pickle
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Tuple
 
-from src.createdata.utils import make_soup, print_progress
+from src.createdata.fetcher import Fetcher, get_default_fetcher
+from src.createdata.parsers import Bs4Parser, PageParser
+from src.createdata.utils import print_progress
 
 from src.createdata.data_files_path import (  # isort:skip
     EVENT_AND_FIGHT_LINKS_PICKLE,
@@ -11,38 +13,52 @@ from src.createdata.data_files_path import (  # isort:skip
 
 class UFCLinks:
     def __init__(
-        self, all_events_url="http://ufcstats.com/statistics/events/completed?page=all"
+        self,
+        all_events_url="http://ufcstats.com/statistics/events/completed?page=all",
+        fetcher: Optional[Fetcher] = None,
+        parser: Optional[PageParser] = None,
     ):
         self.all_events_url = all_events_url
+        self.fetcher = fetcher or get_default_fetcher()
+        self.parser = parser or Bs4Parser()
         self.PAST_EVENT_LINKS_PICKLE_PATH = PAST_EVENT_LINKS_PICKLE
         self.EVENT_AND_FIGHT_LINKS_PICKLE_PATH = EVENT_AND_FIGHT_LINKS_PICKLE
         self.new_event_links, self.all_event_links = self._get_updated_event_links()
 
     def _get_updated_event_links(self) -> Tuple[List[str], List[str]]:
-        all_event_links = []
-        soup = make_soup(self.all_events_url)
-
-        for link in soup.findAll("td", {"class": "b-statistics__table-col"}):
-            for href in link.findAll("a"):
-                foo = href.get("href")
-                all_event_links.append(foo)
+        soup = self.fetcher.soup(self.all_events_url)
+        event_links = (
+            href.get("href")
+            for link in soup.findAll("td", {"class": "b-statistics__table-col"})
+            for href in link.findAll("a")
+        )
 
         if not self.PAST_EVENT_LINKS_PICKLE_PATH.exists():
             # if no past event links are present, then there are no new event links
-            new_event_links = []
-        else:
-            # get past event links
-            with open(self.PAST_EVENT_LINKS_PICKLE_PATH.as_posix(), "rb") as pickle_in:
-                past_event_links = pickle.load(pickle_in)
-
-            # Find links of the newer events
-            new_event_links = list(set(all_event_links) - set(past_event_links))
-
-        # dump all_event_links as PAST_EVENT_LINKS
+            return [], list(event_links)
+
+        # get past event links
+        with open(self.PAST_EVENT_LINKS_PICKLE_PATH.as_posix(), "rb") as pickle_in:
+            past_event_links = pickle.load(pickle_in)
+
+        # The completed events are listed newest first, so the newer events are
+        # the ones before the first event we already know about.
+        known_event_links = set(past_event_links)
+        new_event_links = []
+        for link in event_links:
+            if link in known_event_links:
+                break
+            new_event_links.append(link)
+
+        return new_event_links, new_event_links + past_event_links
+
+    def save_past_event_links(self) -> None:
+        """
+        Dumps all_event_links as PAST_EVENT_LINKS. Callers do this only once
+        the new events are safely recorded, see `FightDataScraper`.
+        """
         with open(self.PAST_EVENT_LINKS_PICKLE_PATH.as_posix(), "wb") as f:
-            pickle.dump(all_event_links, f)
-
-        return new_event_links, all_event_links
+            pickle.dump(self.all_event_links, f)
 
     def get_event_and_fight_links(self) -> (Dict, Dict):
         def get_fight_links(event_links: List[str]) -> Dict[str, List[str]]:
@@ -52,17 +68,13 @@ class UFCLinks:
             print("Scraping event and fight links: ")
             print_progress(0, l, prefix="Progress:", suffix="Complete")
 
-            for index, link in enumerate(event_links):
-                event_fights = []
-                soup = make_soup(link)
-                for row in soup.findAll(
-                    "tr",
-                    {
-                        "class": "b-fight-details__table-row b-fight-details__table-row__hover js-fight-details-click"
-                    },
-                ):
-                    href = row.get("data-link")
-                    event_fights.append(href)
+            fight_links = self.fetcher.map(
+                lambda link: self.parser.parse_event_fight_links(
+                    self.fetcher.fetch(link)
+                ),
+                event_links,
+            )
+            for index, (link, event_fights) in enumerate(zip(event_links, fight_links)):
                 event_and_fight_links[link] = event_fights
 
                 print_progress(index + 1, l, prefix="Progress:", suffix="Complete")
@@ -71,17 +83,28 @@ class UFCLinks:
 
         new_events_and_fight_links = {}
         if self.EVENT_AND_FIGHT_LINKS_PICKLE_PATH.exists():
-            if not self.new_event_links:
-                with open(
-                    self.EVENT_AND_FIGHT_LINKS_PICKLE_PATH.as_posix(), "rb"
-                ) as pickle_in:
-                    all_events_and_fight_links = pickle.load(pickle_in)
+            with open(
+                self.EVENT_AND_FIGHT_LINKS_PICKLE_PATH.as_posix(), "rb"
+            ) as pickle_in:
+                all_events_and_fight_links = pickle.load(pickle_in)
 
+            if not self.new_event_links:
                 return new_events_and_fight_links, all_events_and_fight_links
-            else:
-                new_events_and_fight_links = get_fight_links(self.new_event_links)
 
-        all_events_and_fight_links = get_fight_links(self.all_event_links)
+            # Only the new event pages are fetched, the links of the older
+            # events are taken from the stored mapping.
+            new_events_and_fight_links = get_fight_links(self.new_event_links)
+            all_events_and_fight_links = {
+                **new_events_and_fight_links,
+                **{
+                    event: fights
+                    for event, fights in all_events_and_fight_links.items()
+                    if event not in new_events_and_fight_links
+                },
+            }
+        else:
+            all_events_and_fight_links = get_fight_links(self.all_event_links)
+
         with open(self.EVENT_AND_FIGHT_LINKS_PICKLE_PATH.as_posix(), "wb") as f:
             pickle.dump(all_events_and_fight_links, f)
 
@@ -1,20 +1,69 @@
 import pickle
-from typing import Dict, List
+from pathlib import Path
+from typing import Dict, List, Optional
 
 import numpy as np
 import pandas as pd
 
-from src.createdata.utils import make_soup, print_progress
+from src.createdata.fetcher import Fetcher, get_default_fetcher
+from src.createdata.fighter_index import FighterIndex
+from src.createdata.parquet_store import ParquetStore
+from src.createdata.parsers import Bs4Parser, PageParser, ParsePool
+from src.createdata.utils import print_progress
 
 from src.createdata.data_files_path import (  # isort:skip
     FIGHTER_DETAILS,
+    FIGHTER_DETAILS_RECORDS,
+    FIGHTER_INDEX_PICKLE,
     PAST_FIGHTER_LINKS_PICKLE,
     SCRAPED_FIGHTER_DATA_DICT_PICKLE,
 )
 
+# The dtypes `pd.read_csv` gives the columns of fighter_details.csv
+FIGHTER_DETAILS_DTYPES = {
+    "fighter_name": object,
+    "Height": object,
+    "Weight": object,
+    "Reach": object,
+    "Stance": object,
+    "DOB": object,
+    "SLpM": "float64",
+    "Str_Acc": object,
+    "SApM": "float64",
+    "Str_Def": object,
+    "TD_Avg": "float64",
+    "TD_Acc": object,
+    "TD_Def": object,
+    "Sub_Avg": "float64",
+}
+
+
+class FighterDetailsStore(ParquetStore):
+    """The fighter details as parquet, new fighters are appended."""
+
+    def __init__(self, path: Path = FIGHTER_DETAILS_RECORDS):
+        super().__init__(path, FIGHTER_DETAILS_DTYPES)
+
+    def read(self, columns: Optional[List[str]] = None, partitions=None):
+        """Reads the fighter details indexed by fighter_name, newest first."""
+        columns = list(FIGHTER_DETAILS_DTYPES) if columns is None else columns
+        if "fighter_name" not in columns:
+            columns = ["fighter_name"] + columns
+        return super().read(columns, partitions).set_index("fighter_name")
+
+    def append(self, fighter_details: pd.DataFrame) -> None:
+        super().append(fighter_details.rename_axis("fighter_name").reset_index())
+
 
 class FighterDetailsScraper:
-    def __init__(self):
+    def __init__(
+        self,
+        fetcher: Optional[Fetcher] = None,
+        parser: Optional[PageParser] = None,
+        parse_pool: Optional[ParsePool] = None,
+        fighter_records: Optional[FighterDetailsStore] = None,
+        fighter_index: Optional[FighterIndex] = None,
+    ):
         self.HEADER = [
             "Height",
             "Weight",
@@ -37,6 +86,22 @@ class FighterDetailsScraper:
         self.new_fighters_exists = False
         self.new_fighter_links: Dict[str, List[str]] = {}
         self.all_fighter_links: Dict[str, List[str]] = {}
+        self.fetcher = fetcher or get_default_fetcher()
+        self.parser = parser or Bs4Parser()
+        self.parse_pool = parse_pool
+        self.fighter_records = fighter_records or FighterDetailsStore()
+        self.FIGHTER_INDEX_PATH = FIGHTER_INDEX_PICKLE
+        # Without a saved index the fighters scraped before were only told
+        # apart by their names, `_get_updated_fighter_links` gives them IDs
+        self.fighter_index_is_new = fighter_index is None and not (
+            self.FIGHTER_INDEX_PATH.exists()
+        )
+        if fighter_index is not None:
+            self.fighter_index = fighter_index
+        elif self.fighter_index_is_new:
+            self.fighter_index = FighterIndex()
+        else:
+            self.fighter_index = FighterIndex.load(self.FIGHTER_INDEX_PATH)
 
     def _get_fighter_group_urls(self) -> List[str]:
         alphas = [chr(i) for i in range(ord("a"), ord("a") + 26)]
@@ -54,8 +119,8 @@ class FighterDetailsScraper:
         print("Scraping all fighter names and links: ")
         print_progress(0, l, prefix="Progress:", suffix="Complete")
 
-        for index, fighter_group_url in enumerate(self.fighter_group_urls):
-            soup = make_soup(fighter_group_url)
+        soups = self.fetcher.map(self.fetcher.soup, self.fighter_group_urls)
+        for index, soup in enumerate(soups):
             table = soup.find("tbody")
             names = table.findAll(
                 "a", {"class": "b-link b-link_style_black"}, href=True
@@ -67,10 +132,20 @@ class FighterDetailsScraper:
                     else:
                         fighter_name = fighter_name + " " + name.text
                 else:
+                    # fighters sharing a name all get an ID, only the last
+                    # one is kept here
+                    self.fighter_index.add(fighter_name, name["href"])
                     fighter_name_and_link[fighter_name] = name["href"]
                     fighter_name = ""
             print_progress(index + 1, l, prefix="Progress:", suffix="Complete")
 
+        collisions = self.fighter_index.collisions()
+        if collisions:
+            print(
+                f"{len(collisions)} names are shared by more than one fighter, "
+                "the fights of a name are matched to one of them"
+            )
+
         return fighter_name_and_link
 
     def _get_updated_fighter_links(self):
@@ -100,6 +175,12 @@ class FighterDetailsScraper:
         with open(self.PAST_FIGHTER_LINKS_PICKLE_PATH.as_posix(), "wb") as f:
             pickle.dump(all_fighter_links, f)
 
+        if self.fighter_index_is_new:
+            # the details scraped so far are those of these links
+            for name, link in all_fighter_links.items():
+                self.fighter_index.resolve(name, link)
+        self.fighter_index.save(self.FIGHTER_INDEX_PATH)
+
         return new_fighter_links, all_fighter_links
 
     def _get_fighter_name_and_details(
@@ -111,37 +192,14 @@ class FighterDetailsScraper:
         print("Scraping all fighter data: ")
         print_progress(0, l, prefix="Progress:", suffix="Complete")
 
-        for index, (fighter_name, fighter_url) in enumerate(
-            fighter_name_and_link.items()
+        pages = self.fetcher.map(self.fetcher.fetch, fighter_name_and_link.values())
+        if self.parse_pool is None:
+            details = map(self.parser.parse_fighter_details, pages)
+        else:
+            details = self.parse_pool.map(self.parser.parse_fighter_details, pages)
+        for index, (fighter_name, data) in enumerate(
+            zip(fighter_name_and_link.keys(), details)
         ):
-            another_soup = make_soup(fighter_url)
-            divs = another_soup.findAll(
-                "li",
-                {"class": "b-list__box-list-item b-list__box-list-item_type_block"},
-            )
-            data = []
-            for i, div in enumerate(divs):
-                if i == 9:
-                    # An empty string is scraped here, let's not append that
-                    continue
-                data.append(
-                    div.text.replace("  ", "")
-                    .replace("\n", "")
-                    .replace("Height:", "")
-                    .replace("Weight:", "")
-                    .replace("Reach:", "")
-                    .replace("STANCE:", "")
-                    .replace("DOB:", "")
-                    .replace("SLpM:", "")
-                    .replace("Str. Acc.:", "")
-                    .replace("SApM:", "")
-                    .replace("Str. Def:", "")
-                    .replace("TD Avg.:", "")
-                    .replace("TD Acc.:", "")
-                    .replace("TD Def.:", "")
-                    .replace("Sub. Avg.:", "")
-                )
-
             fighter_name_and_details[fighter_name] = data
             print_progress(index + 1, l, prefix="Progress:", suffix="Complete")
 
@@ -152,6 +210,11 @@ class FighterDetailsScraper:
 
         [fighter_name_and_details.pop(name) for name in fighters_with_no_data]
 
+        # the fights of these names go to the fighters whose details these are
+        for name in fighter_name_and_details:
+            self.fighter_index.resolve(name, fighter_name_and_link[name])
+        self.fighter_index.save(self.FIGHTER_INDEX_PATH)
+
         if not fighter_name_and_details:
             print("No new fighter data to scrape at the moment!")
             return
@@ -177,6 +240,11 @@ class FighterDetailsScraper:
         return df
 
     def create_fighter_data_csv(self) -> None:
+        if not self.fighter_records.exists() and self.FIGHTER_DETAILS_PATH.exists():
+            # scraped before the fighter details were stored as parquet
+            self.fighter_records.write(
+                pd.read_csv(self.FIGHTER_DETAILS_PATH, index_col="fighter_name")
+            )
 
         print("Getting fighter urls \n")
         self.fighter_group_urls = self._get_fighter_group_urls()
@@ -192,10 +260,12 @@ class FighterDetailsScraper:
             else:
                 self._get_fighter_name_and_details(self.all_fighter_links)
                 fighter_details_df = self._fighter_details_to_df()
+                self.fighter_records.write(fighter_details_df)
         else:
             self._get_fighter_name_and_details(self.new_fighter_links)
             if self.new_fighters_exists:
                 new_fighter_details_df = self._fighter_details_to_df()
+                self.fighter_records.append(new_fighter_details_df)
             else:
                 return
 
@@ -1,13 +1,12 @@
 import sys
 
-import requests
 from bs4 import BeautifulSoup
 
+from src.createdata.fetcher import get_default_fetcher
+
 
 def make_soup(url: str) -> BeautifulSoup:
-    source_code = requests.get(url, allow_redirects=False)
-    plain_text = source_code.text.encode("ascii", "replace")
-    return BeautifulSoup(plain_text, "html.parser")
+    return get_default_fetcher().soup(url)
 
 
 def print_progress(
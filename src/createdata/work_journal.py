@@ -0,0 +1,184 @@
+import sqlite3
+import time
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from src.createdata.data_files_path import SCRAPE_JOURNAL
+
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+
+# Bumped whenever the format of the stored rows changes
+ROW_FORMAT_VERSION = 2
+
+
+class WorkJournal:
+    """
+    Durable record of the event and fight pages a scrape has to go through.
+
+    Every URL is stored with its status (pending, done or failed) and, once
+    done, the data parsed from it. Fight rows additionally remember whether
+    they have been committed to the stored fight data, so an interrupted run
+    can be picked up again without fetching anything twice and a failed page
+    is retried on every run until it succeeds.
+    """
+
+    def __init__(self, path: Path = SCRAPE_JOURNAL):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path.as_posix())
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        with self._db:
+            self._db.execute(
+                """CREATE TABLE IF NOT EXISTS work (
+                    url TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    event_url TEXT,
+                    batch INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    status TEXT NOT NULL,
+                    row TEXT,
+                    error TEXT,
+                    committed INTEGER NOT NULL DEFAULT 0,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            self._db.execute(
+                "CREATE INDEX IF NOT EXISTS work_event_url ON work (event_url)"
+            )
+
+            (row_format_version,) = self._db.execute("PRAGMA user_version").fetchone()
+            if row_format_version != ROW_FORMAT_VERSION:
+                # Rows stored in an older format are scraped again. Committed
+                # fights are already stored, their rows aren't needed, and
+                # neither is the row of an event whose fights are all stored.
+                self._db.execute(
+                    """UPDATE work SET status = ?, row = NULL
+                    WHERE status = ? AND (
+                        (kind = 'fight' AND committed = 0)
+                        OR (kind = 'event' AND EXISTS (
+                            SELECT 1 FROM work f
+                            WHERE f.event_url = work.url AND f.committed = 0
+                        ))
+                    )""",
+                    (PENDING, DONE),
+                )
+                self._db.execute(f"PRAGMA user_version = {ROW_FORMAT_VERSION}")
+
+    def register(self, event_and_fight_links: Dict[str, List[str]]) -> None:
+        """
+        Adds events and their fights as pending. URLs the journal already
+        knows keep their status. Events registered later are newer than
+        earlier ones, `batch` keeps track of that for ordering.
+        """
+        now = time.time()
+        with self._db:
+            (batch,) = self._db.execute(
+                "SELECT COALESCE(MAX(batch), 0) + 1 FROM work"
+            ).fetchone()
+            for event_position, (event, fights) in enumerate(
+                event_and_fight_links.items()
+            ):
+                self._db.execute(
+                    "INSERT OR IGNORE INTO work (url, kind, event_url, batch, position, status, updated_at) "
+                    "VALUES (?, 'event', NULL, ?, ?, ?, ?)",
+                    (event, batch, event_position, PENDING, now),
+                )
+                self._db.executemany(
+                    "INSERT OR IGNORE INTO work (url, kind, event_url, batch, position, status, updated_at) "
+                    "VALUES (?, 'fight', ?, ?, ?, ?, ?)",
+                    [
+                        (fight, event, batch, fight_position, PENDING, now)
+                        for fight_position, fight in enumerate(fights)
+                    ],
+                )
+
+    def reset_committed(self) -> None:
+        """Forgets which rows were written out, e.g. when the data is rebuilt."""
+        with self._db:
+            self._db.execute("UPDATE work SET committed = 0")
+
+    def get_outstanding(self) -> Dict[str, List[str]]:
+        """
+        Returns the events, newest first, that still have work left: the event
+        page itself or one of its fights is not done, or a done fight has not
+        been committed yet.
+        """
+        events = self._db.execute(
+            """SELECT e.url FROM work e
+            WHERE e.kind = 'event' AND (
+                e.status != ? OR EXISTS (
+                    SELECT 1 FROM work f
+                    WHERE f.event_url = e.url AND (f.status != ? OR f.committed = 0)
+                )
+            )
+            ORDER BY e.batch DESC, e.position""",
+            (DONE, DONE),
+        ).fetchall()
+        return {event: self.get_fights(event) for (event,) in events}
+
+    def get_fights(self, event_url: str) -> List[str]:
+        return [
+            url
+            for (url,) in self._db.execute(
+                "SELECT url FROM work WHERE event_url = ? ORDER BY position",
+                (event_url,),
+            )
+        ]
+
+    def get_status(self, urls: Iterable[str]) -> Dict[str, Tuple[str, Optional[str]]]:
+        """Returns `url -> (status, row)` for the given urls."""
+        status = {}
+        for url in urls:
+            row = self._db.execute(
+                "SELECT status, row FROM work WHERE url = ?", (url,)
+            ).fetchone()
+            if row is not None:
+                status[url] = row
+        return status
+
+    def record(self, results: Dict[str, Tuple[str, str]]) -> None:
+        """
+        Stores `url -> (status, row_or_error)` for a batch of pages in a
+        single transaction.
+        """
+        now = time.time()
+        with self._db:
+            self._db.executemany(
+                "UPDATE work SET status = ?, row = ?, error = ?, updated_at = ? WHERE url = ?",
+                [
+                    (
+                        status,
+                        value if status == DONE else None,
+                        value if status == FAILED else None,
+                        now,
+                        url,
+                    )
+                    for url, (status, value) in results.items()
+                ],
+            )
+
+    def get_uncommitted_rows(self, event_url: str) -> List[Tuple[str, str]]:
+        """Returns `(url, row)` of the done, uncommitted fights of an event."""
+        return self._db.execute(
+            "SELECT url, row FROM work WHERE event_url = ? AND status = ? AND committed = 0 "
+            "ORDER BY position",
+            (event_url, DONE),
+        ).fetchall()
+
+    def mark_committed(self, urls: Iterable[str]) -> None:
+        with self._db:
+            self._db.executemany(
+                "UPDATE work SET committed = 1 WHERE url = ?", [(url,) for url in urls]
+            )
+
+    def count_failed(self) -> int:
+        (failed,) = self._db.execute(
+            "SELECT COUNT(*) FROM work WHERE status = ?", (FAILED,)
+        ).fetchone()
+        return failed
+
+    def close(self) -> None:
+        self._db.close()
@@ -0,0 +1,6 @@
+import sys
+from pathlib import Path
+
+# the modules of the app import each other by name, as when run from src/app
+APP_PATH = Path(__file__).resolve().parent.parent / "src" / "app"
+sys.path.insert(0, APP_PATH.as_posix())
@@ -0,0 +1,55 @@
+"""
+Saves a few pages of ufcstats.com, as the scrapers fetch them, for the
+parser tests: the latest completed event, its first fights and the fighters
+of those fights. Run it from the root of the repository:
+
+    python -m tests.fixtures.save_pages [N_FIGHTS]
+"""
+
+import sys
+from pathlib import Path
+from typing import List
+
+from bs4 import BeautifulSoup
+
+from src.createdata.fetcher import Fetcher
+from src.createdata.parsers import Bs4Parser
+
+ALL_EVENTS_URL = "http://ufcstats.com/statistics/events/completed"
+UFCSTATS_PAGES = Path(__file__).parent / "pages" / "ufcstats"
+
+
+def save(fetcher: Fetcher, url: str, kind: str) -> bytes:
+    page = fetcher.fetch(url)
+    path = UFCSTATS_PAGES / kind / (url.rstrip("/").rsplit("/", 1)[-1] + ".html")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(page)
+    print(f"Saved {url} to {path}")
+    return page
+
+
+def fighter_links(fight_page: bytes) -> List[str]:
+    soup = BeautifulSoup(fight_page, "html.parser")
+    return [
+        link.get("href")
+        for link in soup.findAll("a", {"class": "b-fight-details__person-link"})
+    ]
+
+
+def main(n_fights: int = 3) -> None:
+    fetcher = Fetcher(max_workers=1, requests_per_second=1.0)
+    events = fetcher.soup(ALL_EVENTS_URL)
+    event_link = next(
+        href.get("href")
+        for link in events.findAll("td", {"class": "b-statistics__table-col"})
+        for href in link.findAll("a")
+    )
+    event_page = save(fetcher, event_link, "event-details")
+    for fight_link in Bs4Parser().parse_event_fight_links(event_page)[:n_fights]:
+        fight_page = save(fetcher, fight_link, "fight-details")
+        for fighter_link in fighter_links(fight_page):
+            save(fetcher, fighter_link, "fighter-details")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,120 @@
+import importlib
+import os
+import pickle
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from bout_features import WEIGHT_CLASS_COLUMNS
+
+pytest.importorskip("dash")
+pytest.importorskip("flask")
+pytest.importorskip("sklearn")
+xgboost = pytest.importorskip("xgboost")
+
+from sklearn.preprocessing import StandardScaler  # isort:skip
+
+FIGHTERS = ["Conor McGregor", "Khabib Nurmagomedov", "Tony Ferguson"]
+STATS = ["SLpM", "Height_cms", "current_win_streak"]
+
+
+def write_app_data(app_data):
+    """A small model and the files app.py loads, in `app_data`."""
+    app_data.mkdir()
+    rng = np.random.RandomState(0)
+    fighter_df = pd.DataFrame(
+        rng.uniform(0, 10, (len(FIGHTERS), len(STATS))),
+        index=pd.Index(FIGHTERS, name="index"),
+        columns=STATS,
+    )
+    fighter_df["DOB"] = pd.to_datetime(["1988-07-14", "1988-09-20", np.NaN])
+    fighter_df.to_csv(app_data / "latest_fighter_stats.csv")
+    pd.DataFrame(
+        {"fighter": FIGHTERS, "weight_class": ["Lightweight"] * len(FIGHTERS)}
+    ).to_csv(app_data / "weight_classes.csv", index=False)
+
+    fighter_cols = STATS + ["age"]
+    cols = (
+        [f"R_{col}" for col in fighter_cols]
+        + [f"B_{col}" for col in fighter_cols]
+        + list(WEIGHT_CLASS_COLUMNS.values())
+        + ["title_bout", "no_of_rounds"]
+    )
+    features = rng.uniform(0, 10, (50, len(cols)))
+    # the scaler is fit on the numerical columns, all but title_bout
+    scaler = StandardScaler().fit(
+        pd.DataFrame(features, columns=cols).drop(columns=["title_bout"])
+    )
+    model = xgboost.XGBClassifier(n_estimators=5).fit(
+        features, rng.randint(0, 2, len(features))
+    )
+    for name, obj in [
+        ("model.sav", model),
+        ("cols.list", cols),
+        ("standard.scaler", scaler),
+    ]:
+        with open(app_data / name, "wb") as f:
+            pickle.dump(obj, f)
+
+
+@pytest.fixture(scope="module")
+def client(tmp_path_factory):
+    # app.py reads app_data from the directory it is run in
+    app_path = tmp_path_factory.mktemp("app")
+    write_app_data(app_path / "app_data")
+    cwd = os.getcwd()
+    os.chdir(app_path)
+    try:
+        app = importlib.import_module("app")
+    finally:
+        os.chdir(cwd)
+    return app.server.test_client()
+
+
+def bout(**changes):
+    bout = {
+        "red": "Khabib Nurmagomedov",
+        "blue": "Conor McGregor",
+        "weightclass": "Lightweight",
+        "no_of_rounds": 5,
+        "title_bout": True,
+    }
+    bout.update(changes)
+    return bout
+
+
+def test_predicts_every_bout(client):
+    bouts = [bout(), bout(red="Tony Ferguson", no_of_rounds=3, title_bout=False)]
+    response = client.post("/api/predict", json={"bouts": bouts})
+    assert response.status_code == 200
+    predictions = response.get_json()["predictions"]
+    assert len(predictions) == len(bouts)
+    for prediction in predictions:
+        assert prediction["red_proba"] + prediction["blue_proba"] == pytest.approx(1)
+
+
+@pytest.mark.parametrize(
+    "payload",
+    [
+        None,
+        ["bouts"],
+        {"bouts": []},
+        {"bouts": [bout(blue=None)]},
+        {"bouts": [["Khabib Nurmagomedov", "Conor McGregor"]]},
+        {"bouts": [bout(red=["Khabib Nurmagomedov"])]},
+        {"bouts": [bout(blue={"name": "Conor McGregor"})]},
+        {"bouts": [bout(weightclass=["Lightweight"])]},
+        {"bouts": [bout(red="Nobody")]},
+        {"bouts": [bout(blue="Khabib Nurmagomedov")]},
+        {"bouts": [bout(weightclass="Cruiserweight")]},
+        {"bouts": [bout(no_of_rounds=4)]},
+        {"bouts": [bout(no_of_rounds=True)]},
+        {"bouts": [bout(no_of_rounds="5")]},
+        {"bouts": [bout(title_bout="yes")]},
+    ],
+)
+def test_rejects_invalid_bouts(client, payload):
+    response = client.post("/api/predict", json=payload)
+    assert response.status_code == 400
+    assert "error" in response.get_json()
@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+
+from bout_features import WEIGHT_CLASS_COLUMNS, BoutFeatures, get_age, normalize
+
+FIGHTERS = ["Conor McGregor", "Khabib Nurmagomedov", "Tony Ferguson", "Nate Diaz"]
+STATS = ["SLpM", "Height_cms", "current_win_streak"]
+BOUTS = [
+    ("Conor McGregor", "Khabib Nurmagomedov", "Lightweight", 5, True),
+    ("Tony Ferguson", "Conor McGregor", "Welterweight", 3, False),
+    ("Nate Diaz", "Tony Ferguson", "Lightweight", 3, False),
+    ("Khabib Nurmagomedov", "Nate Diaz", "Catch Weight", 5, False),
+]
+
+
+class ColumnScaler:
+    """Scales every column on its own, like the StandardScaler of the app."""
+
+    def __init__(self, n_columns: int):
+        rng = np.random.RandomState(1)
+        self.mean_ = rng.uniform(-5, 5, n_columns)
+        self.scale_ = rng.uniform(0.5, 3, n_columns)
+
+    def transform(self, values) -> np.ndarray:
+        return (np.asarray(values, dtype="float64") - self.mean_) / self.scale_
+
+
+def make_fighter_df() -> pd.DataFrame:
+    rng = np.random.RandomState(0)
+    fighter_df = pd.DataFrame(
+        rng.uniform(0, 10, (len(FIGHTERS), len(STATS))),
+        index=pd.Index(FIGHTERS, name="index"),
+        columns=STATS,
+    )
+    fighter_df["DOB"] = pd.to_datetime(
+        ["1988-07-14", "1988-09-20", np.NaN, "1985-04-16"]
+    )
+    return fighter_df
+
+
+def make_cols() -> list:
+    fighter_cols = STATS + ["age"]
+    cols = (
+        [f"R_{col}" for col in fighter_cols]
+        + [f"B_{col}" for col in fighter_cols]
+        + list(WEIGHT_CLASS_COLUMNS.values())
+        + ["title_bout", "no_of_rounds"]
+    )
+    # the features are put in `cols` order, whatever it is
+    return list(np.random.RandomState(2).permutation(cols))
+
+
+def old_features(fighter_df, cols, scaler, red, blue, weightclass, rounds, title):
+    """The model input the prediction callback made before `BoutFeatures`."""
+    df = fighter_df.copy()
+
+    cols_dict = {
+        WEIGHT_CLASS_COLUMNS[k]: (1 if weightclass == k else 0)
+        for k in WEIGHT_CLASS_COLUMNS.keys()
+    }
+    cols_dict.update({"title_bout": title, "no_of_rounds": rounds})
+    extra_cols = pd.DataFrame([list(cols_dict.values())], columns=cols_dict.keys())
+    df["age"] = get_age(df["DOB"], pd.to_datetime("today").normalize())
+    df.drop(columns=["DOB"], inplace=True)
+    r = df.loc[[red]].add_prefix("R_").reset_index(drop=True)
+    b = df.loc[[blue]].add_prefix("B_").reset_index(drop=True)
+    final = pd.concat([r, b, extra_cols], axis=1)[cols]
+    return np.array(normalize(final, scaler)).astype("float32")
+
+
+def test_features_are_those_of_the_old_prediction_path():
+    fighter_df, cols = make_fighter_df(), make_cols()
+    # every column but title_bout is scaled
+    scaler = ColumnScaler(len(cols) - 1)
+    bout_features = BoutFeatures(fighter_df, cols, scaler)
+
+    features = bout_features.features(
+        [bout_features.fighter_ids[red] for red, *_ in BOUTS],
+        [bout_features.fighter_ids[blue] for _, blue, *_ in BOUTS],
+        [weightclass for _, _, weightclass, _, _ in BOUTS],
+        [rounds for *_, rounds, _ in BOUTS],
+        [title for *_, title in BOUTS],
+    )
+
+    expected = np.concatenate(
+        [old_features(fighter_df, cols, scaler, *bout) for bout in BOUTS]
+    )
+    np.testing.assert_array_equal(features, expected)
@@ -0,0 +1,167 @@
+import random
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from src.createdata.fight_records import (
+    CLOCK,
+    COUNT,
+    LANDED_OF_ATTEMPTED,
+    LEGACY_COLUMNS,
+    PERCENT,
+    FightRecordStore,
+)
+from src.createdata.fighter_history import WIN_BY_COLUMNS
+from src.createdata.preprocess import Preprocessor
+from src.createdata.preprocess_fighter_data import METHODS, FighterDetailProcessor
+from src.createdata.scrape_fighter_details import FighterDetailsStore
+
+FIGHTERS = [f"Fighter {i}" for i in range(14)]
+# fighters without details
+UNKNOWN_FIGHTERS = FIGHTERS[-2:]
+# every kind of win, the loop expects all of them in the fights
+WIN_BYS = [column[len("win_by_") :] for column in WIN_BY_COLUMNS]
+DATES = pd.date_range("2015-01-01", periods=20, freq="45D")
+
+
+def _value(rng, column, kind):
+    if kind == COUNT:
+        return str(rng.randint(1, 5) if column == "last_round" else rng.randint(0, 3))
+    if kind == LANDED_OF_ATTEMPTED:
+        attempted = rng.randint(0, 80)
+        return f"{rng.randint(0, attempted)} of {attempted}"
+    if kind == PERCENT:
+        return rng.choice(["---", f"{rng.randint(0, 100)}%"])
+    if kind == CLOCK:
+        if column == "last_round_time":
+            return f"{rng.randint(0, 4)}:{rng.randint(0, 59):02d}"
+        return rng.choice(["--", f"{rng.randint(0, 4)}:{rng.randint(0, 59):02d}"])
+    return {
+        "win_by": rng.choice(WIN_BYS),
+        "Format": "3 Rnd (5-5-5)",
+        "Referee": rng.choice(["Herb Dean", "Marc Goddard"]),
+        "location": "Las Vegas, Nevada, USA",
+        "Fight_type": rng.choice(["Lightweight Bout", "UFC Lightweight Title Bout"]),
+    }[column]
+
+
+def make_fights(n_fights=90, seed=0):
+    """Fights laid out like total_fight_data.csv, newest first."""
+    rng = random.Random(seed)
+    rows = []
+    for _ in range(n_fights):
+        # few dates for many fights, fighters often fight twice on one date
+        date = rng.choice(DATES)
+        red, blue = rng.sample(FIGHTERS, 2)
+        row = {
+            column: _value(rng, column, kind)
+            for column, kind in LEGACY_COLUMNS
+            if column not in ("R_fighter", "B_fighter", "date", "Winner")
+        }
+        row.update(
+            R_fighter=red,
+            B_fighter=blue,
+            date=date.strftime("%B %d, %Y"),
+            Winner=rng.choice([red, blue, red, blue, np.NaN]),
+        )
+        rows.append((date, row))
+    rows.sort(key=lambda date_and_row: date_and_row[0], reverse=True)
+    return pd.DataFrame(
+        [row for _, row in rows], columns=[column for column, _ in LEGACY_COLUMNS]
+    )
+
+
+def make_fighter_details(seed=0):
+    rng = random.Random(seed)
+    return pd.DataFrame(
+        [
+            {
+                "Height": rng.choice([np.NaN, "5' 9\"", "6' 1\""]),
+                "Weight": rng.choice(["155 lbs.", "170 lbs."]),
+                "Reach": rng.choice([np.NaN, '70"', '74"']),
+                "Stance": rng.choice([np.NaN, "Orthodox", "Southpaw"]),
+                "DOB": rng.choice([np.NaN, "Jul 19, 1988", "Mar 02, 1991"]),
+                "SLpM": 3.29,
+                "Str_Acc": "38%",
+                "SApM": 2.2,
+                "Str_Def": "55%",
+                "TD_Avg": 1.5,
+                "TD_Acc": "40%",
+                "TD_Def": "60%",
+                "Sub_Avg": 0.5,
+            }
+            for _ in FIGHTERS
+        ],
+        index=pd.Index(FIGHTERS, name="fighter_name"),
+    ).drop(UNKNOWN_FIGHTERS)
+
+
+@pytest.fixture(scope="module")
+def fights_and_details(tmp_path_factory):
+    """The fights and details `Preprocessor` gives `FighterDetailProcessor`."""
+    data_path = tmp_path_factory.mktemp("data")
+    make_fights().to_csv(data_path / "total_fight_data.csv", sep=";", index=False)
+    make_fighter_details().to_csv(data_path / "fighter_details.csv")
+
+    preprocessor = Preprocessor()
+    preprocessor.TOTAL_EVENT_AND_FIGHTS_PATH = data_path / "total_fight_data.csv"
+    preprocessor.FIGHTER_DETAILS_PATH = data_path / "fighter_details.csv"
+    # neither is stored as parquet, the csv files are read
+    preprocessor.fight_records = FightRecordStore(data_path / "total_fight_data")
+    preprocessor.fighter_records = FighterDetailsStore(data_path / "fighter_details")
+
+    preprocessor.fights, preprocessor.fighter_details = preprocessor._read_files()
+    preprocessor._rename_columns()
+    preprocessor._replacing_winner_nans_draw()
+    preprocessor._convert_percentages_to_fractions()
+    preprocessor._create_title_bout_feature()
+    preprocessor._create_weight_classes()
+    preprocessor._convert_last_round_to_seconds()
+    preprocessor._convert_CTRL_to_seconds()
+    preprocessor._get_total_time_fought()
+    return preprocessor.fights, preprocessor.fighter_details
+
+
+def fighter_features(fights_and_details, method):
+    fights, fighter_details = fights_and_details
+    with warnings.catch_warnings():
+        # DataFrame.append of the loop
+        warnings.simplefilter("ignore", FutureWarning)
+        return FighterDetailProcessor(
+            fights.copy(), fighter_details.copy(), method=method, max_workers=2
+        ).frame
+
+
+def test_fixture_has_the_hard_cases(fights_and_details):
+    fights, fighter_details = fights_and_details
+    assert (fights["Winner"] == "Draw").any()
+    assert not set(UNKNOWN_FIGHTERS) & set(fighter_details.index)
+    fights_on_a_date = (
+        pd.concat(
+            [
+                fights[["date", corner + "_fighter"]].set_axis(
+                    ["date", "fighter"], axis=1
+                )
+                for corner in ["R", "B"]
+            ]
+        )
+        .groupby(["date", "fighter"])
+        .size()
+    )
+    assert (fights_on_a_date > 1).any()
+
+
+@pytest.fixture(scope="module")
+def loop_features(fights_and_details):
+    return fighter_features(fights_and_details, "loop")
+
+
+@pytest.mark.parametrize("method", [m for m in METHODS if m != "loop"])
+def test_methods_give_the_features_of_the_loop(
+    fights_and_details, loop_features, method
+):
+    pd.testing.assert_frame_equal(
+        fighter_features(fights_and_details, method), loop_features, check_exact=True
+    )
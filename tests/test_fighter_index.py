@@ -0,0 +1,69 @@
+import numpy as np
+import pandas as pd
+
+from src.createdata.fighter_index import MISSING_ID, FighterIndex, ProfileTable
+
+FIRST_LINK = "http://ufcstats.com/fighter-details/1"
+SECOND_LINK = "http://ufcstats.com/fighter-details/2"
+
+
+def test_fighters_sharing_a_name_get_an_id_each():
+    fighter_index = FighterIndex()
+    first = fighter_index.add("Michael McDonald", FIRST_LINK)
+    second = fighter_index.add("Michael McDonald", SECOND_LINK)
+
+    assert (first, second) == (0, 1)
+    assert fighter_index.add("Michael McDonald", SECOND_LINK) == second
+    assert fighter_index.collisions() == {"Michael McDonald": [first, second]}
+    # the name goes to the first fighter until it is resolved to another one
+    assert fighter_index.add("Michael McDonald") == first
+    assert fighter_index.resolve("Michael McDonald", SECOND_LINK) == second
+    assert fighter_index.add("Michael McDonald") == second
+    assert list(fighter_index.ids(["Michael McDonald"])) == [second]
+
+
+def test_a_link_is_given_to_the_fighter_known_by_name():
+    fighter_index = FighterIndex.from_names(["Conor McGregor"])
+    assert fighter_index.add("Conor McGregor", FIRST_LINK) == 0
+    assert fighter_index.links == [FIRST_LINK]
+    assert fighter_index.collisions() == {}
+
+
+def test_ids_are_kept_by_save_and_load(tmp_path):
+    fighter_index = FighterIndex.from_names(["Conor McGregor", "Nate Diaz"])
+    fighter_index.add("Michael McDonald", FIRST_LINK)
+    fighter_index.add("Michael McDonald", SECOND_LINK)
+    fighter_index.save(tmp_path / "fighter_index.pickle")
+
+    loaded = FighterIndex.load(tmp_path / "fighter_index.pickle")
+    assert loaded.names == fighter_index.names
+    assert loaded.links == fighter_index.links
+    names = ["Nate Diaz", "Conor McGregor", "Michael McDonald"]
+    assert list(loaded.ids(names)) == [1, 0, 2]
+    assert loaded.add("Michael McDonald", SECOND_LINK) == 3
+    # new fighters get the IDs after the saved ones
+    assert loaded.add("Tony Ferguson") == 4
+
+
+def test_gather_gives_nans_to_missing_ids():
+    fighter_index = FighterIndex.from_names(
+        ["Conor McGregor", "Nate Diaz", "Tony Ferguson"]
+    )
+    details = pd.DataFrame(
+        {"Height": [175.26, 182.88], "Stance": ["Southpaw", "Orthodox"]},
+        index=["Nate Diaz", "Conor McGregor"],
+    )
+    table = ProfileTable(details, fighter_index.ids(details.index), len(fighter_index))
+
+    ids = fighter_index.ids(["Conor McGregor", "Khabib Nurmagomedov", "Tony Ferguson"])
+    assert list(ids) == [0, MISSING_ID, 2]
+    gathered = table.gather(ids)
+    pd.testing.assert_frame_equal(
+        gathered,
+        pd.DataFrame(
+            {
+                "Height": [182.88, np.NaN, np.NaN],
+                "Stance": ["Orthodox", np.NaN, np.NaN],
+            }
+        ),
+    )
@@ -0,0 +1,133 @@
+import time
+
+import pytest
+
+from image_cache import PLACEHOLDER_IMAGE_URL, FighterImageCache
+
+TTL = 0.2
+
+
+class StubLookup:
+    """Finds the image of the fighters in `images`, counting the searches."""
+
+    def __init__(self, images):
+        self.images = images
+        self.calls = []
+
+    def __call__(self, fighter):
+        self.calls.append(fighter)
+        image = self.images[fighter]
+        if isinstance(image, Exception):
+            raise image
+        return image
+
+
+@pytest.fixture
+def lookup():
+    return StubLookup(
+        {
+            "Conor McGregor": "https://images.test/conor.png",
+            "Nobody": None,
+            "Quota": RuntimeError("Daily limit exceeded"),
+        }
+    )
+
+
+@pytest.fixture
+def cache_path(tmp_path):
+    return tmp_path / "fighter_images.sqlite3"
+
+
+@pytest.fixture
+def image_cache(lookup, cache_path):
+    image_cache = FighterImageCache(
+        lookup, cache_path, ttl=TTL, negative_ttl=TTL, failure_ttl=TTL
+    )
+    yield image_cache
+    image_cache.close()
+
+
+def test_miss_serves_the_placeholder_and_queues_one_lookup(image_cache, lookup):
+    assert image_cache.get("Conor McGregor") == PLACEHOLDER_IMAGE_URL
+    assert image_cache.get("Conor McGregor") == PLACEHOLDER_IMAGE_URL
+    assert lookup.calls == []
+
+    image_cache.run_queued(block=False)
+    assert lookup.calls == ["Conor McGregor"]
+    assert image_cache.get("Conor McGregor") == "https://images.test/conor.png"
+
+
+@pytest.mark.parametrize(
+    "fighter, url",
+    [
+        ("Conor McGregor", "https://images.test/conor.png"),
+        ("Nobody", PLACEHOLDER_IMAGE_URL),
+    ],
+)
+def test_entries_are_looked_up_again_once_expired(image_cache, lookup, fighter, url):
+    image_cache.refresh(fighter)
+    for _ in range(3):
+        assert image_cache.get(fighter) == url
+        image_cache.run_queued(block=False)
+    assert lookup.calls == [fighter]
+
+    time.sleep(TTL)
+    image_cache.get(fighter)
+    image_cache.run_queued(block=False)
+    assert lookup.calls == [fighter, fighter]
+
+
+def test_stale_url_is_served_while_it_is_refreshed(image_cache, lookup):
+    image_cache.refresh("Conor McGregor")
+    time.sleep(TTL)
+    lookup.images["Conor McGregor"] = "https://images.test/conor-2.png"
+
+    assert image_cache.get("Conor McGregor") == "https://images.test/conor.png"
+    image_cache.run_queued(block=False)
+    assert image_cache.get("Conor McGregor") == "https://images.test/conor-2.png"
+
+
+def test_failed_lookup_is_not_cached_and_backs_off(image_cache, lookup):
+    assert image_cache.get("Quota") == PLACEHOLDER_IMAGE_URL
+    image_cache.run_queued(block=False)
+    assert lookup.calls == ["Quota"]
+
+    # not retried before `failure_ttl`
+    assert image_cache.get("Quota") == PLACEHOLDER_IMAGE_URL
+    assert image_cache.warm(["Quota"]) == 0
+    image_cache.run_queued(block=False)
+    assert lookup.calls == ["Quota"]
+
+    time.sleep(TTL)
+    lookup.images["Quota"] = "https://images.test/quota.png"
+    assert image_cache.get("Quota") == PLACEHOLDER_IMAGE_URL
+    image_cache.run_queued(block=False)
+    assert lookup.calls == ["Quota", "Quota"]
+    assert image_cache.get("Quota") == "https://images.test/quota.png"
+
+
+def test_failed_refresh_keeps_the_stale_url(image_cache, lookup):
+    image_cache.refresh("Conor McGregor")
+    time.sleep(TTL)
+    lookup.images["Conor McGregor"] = RuntimeError("Daily limit exceeded")
+
+    image_cache.get("Conor McGregor")
+    image_cache.run_queued(block=False)
+    assert image_cache.get("Conor McGregor") == "https://images.test/conor.png"
+    image_cache.run_queued(block=False)
+    assert lookup.calls == ["Conor McGregor", "Conor McGregor"]
+
+
+def test_entries_survive_reopening_the_cache(image_cache, lookup, cache_path):
+    image_cache.warm(["Conor McGregor", "Nobody", "Quota"])
+    image_cache.run_queued(block=False)
+    image_cache.close()
+
+    reopened = FighterImageCache(lookup, cache_path, ttl=60, negative_ttl=60)
+    try:
+        assert reopened.get("Conor McGregor") == "https://images.test/conor.png"
+        assert reopened.get("Nobody") == PLACEHOLDER_IMAGE_URL
+        assert reopened.get("Quota") == PLACEHOLDER_IMAGE_URL
+        assert reopened.warm(["Conor McGregor", "Nobody", "Quota"]) == 0
+    finally:
+        reopened.close()
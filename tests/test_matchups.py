@@ -0,0 +1,74 @@
+import inspect
+
+import numpy as np
+import pytest
+
+from matchups import red_win_probability
+
+xgboost = pytest.importorskip("xgboost")
+
+
+def fit_model(early_stopping):
+    rng = np.random.RandomState(0)
+    features = rng.uniform(0, 1, (400, 6)).astype("float32")
+    # noisy labels, so that early stopping stops early
+    labels = (features[:, 0] + rng.normal(0, 0.5, len(features)) > 0.5).astype(int)
+    if not early_stopping:
+        return xgboost.XGBClassifier(n_estimators=30).fit(features, labels), features
+
+    eval_set = [(features[300:], labels[300:])]
+    if "early_stopping_rounds" in inspect.signature(xgboost.XGBClassifier).parameters:
+        model = xgboost.XGBClassifier(n_estimators=200, early_stopping_rounds=3)
+        model.fit(features[:300], labels[:300], eval_set=eval_set, verbose=False)
+    else:
+        # xgboost < 1.6 takes early_stopping_rounds in fit
+        model = xgboost.XGBClassifier(n_estimators=200)
+        model.fit(
+            features[:300],
+            labels[:300],
+            eval_set=eval_set,
+            early_stopping_rounds=3,
+            verbose=False,
+        )
+    assert model.best_iteration < 199
+    return model, features
+
+
+@pytest.mark.parametrize("early_stopping", [False, True])
+def test_red_win_probability_is_that_of_predict_proba(early_stopping):
+    model, features = fit_model(early_stopping)
+    probabilities = red_win_probability(model)(features)
+    assert probabilities.shape == (len(features),)
+    np.testing.assert_allclose(
+        probabilities, model.predict_proba(features)[:, 1], rtol=1e-6
+    )
+
+
+class OldBooster:
+    """A booster of xgboost 1.1 to 1.3, whose inplace_predict has no iteration_range."""
+
+    def inplace_predict(self, data, predict_type="value", missing=np.nan):
+        raise AssertionError("inplace_predict can't be limited to the best iteration")
+
+    def predict(self, data, ntree_limit=0):
+        self.ntree_limit = ntree_limit
+        return np.full(data.num_row(), 0.25, dtype="float32")
+
+
+class OldModel:
+    best_ntree_limit = 7
+
+    def __init__(self):
+        self.booster = OldBooster()
+
+    def get_booster(self):
+        return self.booster
+
+
+def test_red_win_probability_without_iteration_range():
+    model = OldModel()
+    features = np.zeros((3, 6), dtype="float32")
+    np.testing.assert_array_equal(
+        red_win_probability(model)(features), np.full(3, 0.25, dtype="float32")
+    )
+    assert model.booster.ntree_limit == 7
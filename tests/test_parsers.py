@@ -0,0 +1,39 @@
+from pathlib import Path
+
+import pytest
+
+from src.createdata.parsers import Bs4Parser, LxmlParser, PageParser
+
+PAGES = Path(__file__).parent / "fixtures" / "pages"
+# Pages made after the markup of ufcstats.com, and pages saved from it by
+# tests/fixtures/save_pages.py
+SOURCES = ["synthetic", "ufcstats"]
+
+
+def pages(source, kind):
+    return sorted(PAGES.joinpath(source, kind).glob("*.html"))
+
+
+@pytest.mark.parametrize("source", SOURCES)
+@pytest.mark.parametrize(
+    "method, kind",
+    [
+        ("parse_event_fight_links", "event-details"),
+        ("parse_event_info", "event-details"),
+        ("parse_fight", "fight-details"),
+        ("parse_fighter_details", "fighter-details"),
+    ],
+)
+def test_lxml_parser_gives_the_rows_of_bs4_parser(source, method, kind):
+    if not pages(source, kind):
+        pytest.skip(f"No {source} {kind} pages, see tests/fixtures/save_pages.py")
+    for path in pages(source, kind):
+        page = path.read_bytes()
+        assert getattr(LxmlParser(), method)(page) == getattr(Bs4Parser(), method)(
+            page
+        ), path.name
+
+
+def test_page_parser_is_abstract():
+    with pytest.raises(TypeError):
+        PageParser()